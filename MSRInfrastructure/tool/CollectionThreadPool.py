@@ -1,8 +1,14 @@
 import time
-from typing import List
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from typing import Dict, List, Optional, Tuple
 from src.DataAcquisition.GitHubAPIService.TokenManager import TokenManager
+from src.DataAcquisition.GitHubAPIService.TokenManagerBroker import TokenManagerBroker
 from src.RepositoryCollector import RepositoryCollector
+from src.RepositoryScheduler import RepositoryScheduler
 from src.DataAcquisition.GitHubAPIService.GitHubClientFactory import GitHubClientFactory
+from src.DataInsertion.DatabaseConnection import DatabaseConnection
 from queue import Queue
 from src.Utility.Logger import MSRLogger
 from src.Utility.Utility import read_config, read_repo_list, extract_repo_url_owner_and_name
@@ -12,7 +18,10 @@ class CollectionThreadPool:
     """
     The CollectionThreadPool is responsible for starting and stopping RepositoryCollector threads. It allows
     for a maximum number of number_threads to run at the same time. This variable is configurable in the
-    MSRInfrastructure/config.json file.
+    MSRInfrastructure/config.json file. Collectors run on a thread pool executor, and the next repository starts as
+    soon as a collector finishes. The outcome of every collector (duration or exception) is reported to the pool.
+    In the process worker mode, every collector runs in a worker process instead of a thread, and all workers share
+    the TokenManager of a manager process (TokenManagerBroker).
     """
 
     def __init__(self):
@@ -44,50 +53,188 @@ class CollectionThreadPool:
         self.pull_request_file_content = config.get("pull_request_file_content", None)
         if self.pull_request_file_content is None:
             self.logger.exception("Configuration file corruption, please define .pull_request_file_content.")
-        # Create a new instance if TokenManager
-        self.token_manager = TokenManager()
-        # Initialize thread pool
-        self.thread_pool: List[RepositoryCollector] = []
+        # Load config value if CSV files stay open with buffered writers during collection (DEFAULT: False)
+        self.csv_writer_pool = config.get("csv_writer_pool", False)
+        # Load config values for the deduplication backend and its memory budget (DEFAULT: memory, 64 MB)
+        self.deduplication_backend = config.get("deduplication_backend", "memory")
+        self.deduplication_memory_budget_mb = config.get("deduplication_memory_budget_mb", 64)
+        # Load config value for the compression of the CSV staging files (DEFAULT: none)
+        self.csv_compression = config.get("csv_compression", "none")
+        # Load config value if finished collection phases are inserted during the collection (DEFAULT: False)
+        self.pipelined_insertion = config.get("pipelined_insertion", False)
+        # Load config value if the collection progress is checkpointed to resume after a restart (DEFAULT: False)
+        self.checkpoints = config.get("checkpoints", False)
+        # Load config value for the database insertion backend (DEFAULT: load_csv)
+        self.insertion_backend = config.get("insertion_backend", "load_csv")
+        # Load config value if collected repositories are refreshed incrementally (DEFAULT: False)
+        self.incremental_collection = config.get("incremental_collection", False)
+        # Load config values if GraphQL phases are collected concurrently and the query limit (DEFAULT: False, 4)
+        self.graph_ql_async_engine = config.get("graphql_async_engine", False)
+        self.graph_ql_max_in_flight = config.get("graphql_max_in_flight", 4)
+        # Load config value if partially collected nodes are completed with GraphQL instead of REST (DEFAULT: False)
+        self.graph_ql_follow_up_queries = config.get("graphql_follow_up_queries", False)
+        # Load config value if the GraphQL and REST client of a collector run at the same time (DEFAULT: False)
+        self.concurrent_api_clients = config.get("concurrent_api_clients", False)
+        # Load config value if independent collection phases of a repository run at the same time (DEFAULT: False)
+        self.phase_parallelism = config.get("phase_parallelism", False)
+        # Load config value for the order in which repositories are collected (DEFAULT: fifo)
+        self.repository_scheduling = config.get("repository_scheduling", "fifo")
+        if self.repository_scheduling not in ["fifo", "budget"]:
+            raise Exception(f"[CollectionThreadPool] Unknown repository_scheduling {self.repository_scheduling}")
+        # Load config value if collectors run in threads or processes (DEFAULT: thread)
+        self.collection_workers = config.get("collection_workers", "thread")
+        if self.collection_workers not in ["thread", "process"]:
+            raise Exception(f"[CollectionThreadPool] Unknown collection_workers {self.collection_workers}")
+        if self.collection_workers == "process" and self.insertion_backend == "bulk_import":
+            # The bulk import bundle writes mergeable nodes only once per process
+            self.logger.warning("Process workers are disabled with the bulk_import backend")
+            self.collection_workers = "thread"
+        # Create a new instance if TokenManager (shared by all worker processes through the manager process)
+        self.token_broker: Optional[TokenManagerBroker] = None
+        if self.collection_workers == "process":
+            self.token_broker = TokenManagerBroker()
+            self.token_broker.start()
+            self.token_manager = self.token_broker.TokenManager()
+        else:
+            self.token_manager = TokenManager()
+        # Create the budget-aware scheduler that replaces the repository queue order
+        self.scheduler: Optional[RepositoryScheduler] = None
+        if self.repository_scheduling == "budget":
+            self.scheduler = RepositoryScheduler(self.token_manager, list(self.repository_queue.queue),
+                                                 self.pull_request_file_content, self.number_threads)
+        # Outcomes of all finished collectors
+        self.collected_repositories: List[Tuple[str, str]] = []
+        self.failed_repositories: Dict[Tuple[str, str], BaseException] = {}
 
     def start(self):
         """
-        Starts the thread pool loop that checks every 15 seconds if a RepositoryCollector finished and if this is the
-        case starts a new instance with the next repository in line. This method never starts more the number_threads
-        threads at the same time.
+        Starts the thread pool loop that starts a RepositoryCollector with the next repository in line whenever a
+        worker is free and waits for the next collector to finish otherwise. This method never starts more than
+        number_threads collectors at the same time.
         """
-        while self.repository_queue.qsize() > 0 or len(self.thread_pool) > 0:
-            if len(self.thread_pool) < self.number_threads and self.repository_queue.qsize() > 0:
-                # If the number of thread in the pool is smaller than the maximum number of threads and the repository
-                # list at least contains one new repository initialize a new thread
-                next_repository = self.repository_queue.get()
-                self.logger.info(f"Initializing new thread for repository {next_repository}")
-                self._start_instance(next_repository[0], next_repository[1])
-            else:
-                # If the maximum number of threads is currently or the repository list is empty
-                # wait 15 seconds and try again
-                time.sleep(15)
-                # Remove all stopped threads from the thread pool
-                updated_thread_pool = []
-                for thread in self.thread_pool:
-                    if not thread.is_alive():
-                        thread.join()
-                    else:
-                        updated_thread_pool.append(thread)
-                self.thread_pool = updated_thread_pool
+        if self.scheduler is not None:
+            # Size all repositories before the first collection starts
+            self.scheduler.estimate()
+        running: Dict[Future, Tuple[str, str]] = {}
+        collector_options = self._get_collector_options()
+        with self._create_executor() as executor:
+            while self._has_next_repository() or len(running) > 0:
+                # Start new collectors until all workers are busy or no repository can start now
+                while len(running) < self.number_threads:
+                    next_repository = self._get_next_repository()
+                    if next_repository is None:
+                        break
+                    self.logger.info(f"Initializing new thread for repository {next_repository}")
+                    running[executor.submit(collect_repository, next_repository[0], next_repository[1],
+                                            self.token_manager, collector_options)] = next_repository
+                if len(running) == 0:
+                    # Only happens if a repository needs more than the budget of all tokens
+                    raise Exception("[CollectionThreadPool] No pending repository fits into the token budget")
+                # Wait until at least one collector finished
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._report_outcome(running.pop(future), future)
+        self.logger.info(f"Collected {len(self.collected_repositories)} repositories, "
+                         f"{len(self.failed_repositories)} failed")
+        for (repo_owner, repo_name), exception in self.failed_repositories.items():
+            self.logger.info(f"Failed repository {repo_owner}/{repo_name}: {exception}")
+        # Close the Neo4J connection pool shared by all repository insertions
+        DatabaseConnection.close()
+        # Stop the manager process of the TokenManager
+        if self.token_broker is not None:
+            self.token_broker.shutdown()
 
-    def _start_instance(self, repo_owner: str, repo_name: str):
+    def _create_executor(self) -> Executor:
         """
-        Starts a new instance of RepositoryCollector to collect the next repository in a dedicated thread.
+        Creates the executor of the configured worker mode with number_threads workers
         """
-        # Start the thread
-        collector = RepositoryCollector(
-            repository_owner=repo_owner,
-            repository_name=repo_name,
-            github_client_factory=GitHubClientFactory(repo_owner, repo_name, self.token_manager),
+        if self.collection_workers == "process":
+            # Spawned processes do not inherit the locks and threads of the parent process
+            return ProcessPoolExecutor(max_workers=self.number_threads, mp_context=get_context("spawn"),
+                                       initializer=initialize_worker_process)
+        return ThreadPoolExecutor(max_workers=self.number_threads, thread_name_prefix="RepositoryCollector")
+
+    def _report_outcome(self, repository: Tuple[str, str], future: Future):
+        """
+        Records the outcome of a finished collector and releases its token budget
+        """
+        if self.scheduler is not None:
+            self.scheduler.finish(repository[0], repository[1])
+        exception = future.exception()
+        if exception is None:
+            self.logger.info(f"Finished repository {repository[0]}/{repository[1]} in {future.result():.0f} seconds")
+            self.collected_repositories.append(repository)
+        else:
+            self.logger.error(f"Collection of repository {repository[0]}/{repository[1]} failed {exception}",
+                              exc_info=exception)
+            self.failed_repositories[repository] = exception
+
+    def _has_next_repository(self) -> bool:
+        """
+        Returns True if at least one repository was not started yet
+        """
+        if self.scheduler is not None:
+            return self.scheduler.has_next()
+        return self.repository_queue.qsize() > 0
+
+    def _get_next_repository(self) -> Optional[Tuple[str, str]]:
+        """
+        Returns the next repository to collect
+        :return: (repository owner, repository name) or None if no repository can start now
+        """
+        if self.scheduler is not None:
+            return self.scheduler.next_repository()
+        if self.repository_queue.qsize() > 0:
+            return self.repository_queue.get()
+        return None
+
+    def _get_collector_options(self) -> dict:
+        """
+        Returns the configured options of all RepositoryCollector instances (picklable for worker processes)
+        """
+        return dict(
             deploy=self.deploy,
             commit_data=self.commit_content,
-            pull_request_data=self.pull_request_file_content
+            pull_request_data=self.pull_request_file_content,
+            csv_writer_pool=self.csv_writer_pool,
+            deduplication_backend=self.deduplication_backend,
+            deduplication_memory_budget_mb=self.deduplication_memory_budget_mb,
+            csv_compression=self.csv_compression,
+            pipelined_insertion=self.pipelined_insertion,
+            checkpoints=self.checkpoints,
+            insertion_backend=self.insertion_backend,
+            incremental_collection=self.incremental_collection,
+            graph_ql_async_engine=self.graph_ql_async_engine,
+            graph_ql_max_in_flight=self.graph_ql_max_in_flight,
+            graph_ql_follow_up_queries=self.graph_ql_follow_up_queries,
+            phase_parallelism=self.phase_parallelism,
+            concurrent_api_clients=self.concurrent_api_clients
         )
-        collector.start()
-        # Append thread to the thread pool
-        self.thread_pool.append(collector)
+
+
+def collect_repository(repo_owner: str, repo_name: str, token_manager: TokenManager, collector_options: dict) -> float:
+    """
+    Collects a repository with a new instance of RepositoryCollector in the calling worker thread or process.
+    Exceptions are raised to the future of the worker.
+    :param token_manager: TokenManager or its proxy of the TokenManagerBroker in worker processes
+    :param collector_options: options of CollectionThreadPool._get_collector_options
+    :return: duration of the collection in seconds
+    """
+    start = time.monotonic()
+    collector_options = collector_options.copy()
+    concurrent_api_clients = collector_options.pop("concurrent_api_clients")
+    RepositoryCollector(
+        repository_owner=repo_owner,
+        repository_name=repo_name,
+        github_client_factory=GitHubClientFactory(repo_owner, repo_name, token_manager, concurrent_api_clients),
+        **collector_options
+    ).run()
+    return time.monotonic() - start
+
+
+def initialize_worker_process():
+    """
+    Initializer of the worker processes. Worker processes collect multiple repositories with the same Neo4J connection
+    pool and close it when they exit.
+    """
+    Finalize(None, DatabaseConnection.close, exitpriority=10)
@@ -1,7 +1,11 @@
+import os
 import shutil
+from datetime import datetime
+from typing import Optional, List
 
 import magic
 from git import Repo, Commit
+from gitdb.exc import BadName, BadObject
 from src.Utility.Logger import MSRLogger
 
 import src.RepositoryCollector as RepositoryCollector
@@ -12,7 +16,7 @@ class CloningService:
     This service is responsible for offering data retrieval by cloning a repository into the local file system.
     """
 
-    def __init__(self, repo: RepositoryCollector, content: bool):
+    def __init__(self, repo: RepositoryCollector, content: bool, incremental: bool = False):
         # Initialize default values
         self.logger = MSRLogger.get_logger(self.__class__.__name__)
         self.content: bool = content
@@ -20,6 +24,8 @@ class CloningService:
         self.repo_url = "https://github.com/" + self.repo.get_repo_owner() + "/" + self.repo.get_repo_name() + ".git"
         self.clone_path = "/repo_clone/" if self.repo.is_deployment() else "./dev_data/repo_clone/"
         self.clone_repo_path = self.clone_path + self.repo.get_repo_owner() + "-" + self.repo.get_repo_name()
+        self.incremental: bool = incremental  # If an existing clone is fetched and kept after the collection
+        self.excluded_commits: List[str] = []  # Exclusions ('^<sha>') of all commits collected by a previous run
         # Initialize the cloning process
         self.repository: Repo = self.repository_factory()
 
@@ -99,13 +105,9 @@ class CloningService:
         :return: (remote_branch_name: str, head_commit_sha: str, branch_commits: [])
         """
         for remote_branch in self.get_remote_branches():
-            head_commit_sha = ""
-            first_iteration = True
+            head_commit_sha = remote_branch.commit.hexsha
             branch_commits = []
-            for commit in self.repository.iter_commits(remote_branch):
-                if first_iteration:
-                    head_commit_sha = commit.hexsha
-                    first_iteration = False
+            for commit in self.repository.iter_commits([remote_branch] + self.excluded_commits):
                 branch_commits.append(commit.hexsha)
             yield remote_branch, head_commit_sha, branch_commits
 
@@ -125,7 +127,7 @@ class CloningService:
         """
         commit_sha_set = set()
         for remote_branch in self.get_remote_branches():
-            for commit in self.repository.iter_commits(remote_branch):
+            for commit in self.repository.iter_commits([remote_branch] + self.excluded_commits):
                 if commit in commit_sha_set:
                     continue
                 commit_sha_set.add(commit)
@@ -140,14 +142,49 @@ class CloningService:
             if branch.is_remote():
                 yield branch
 
+    def get_earliest_commit_time(self) -> Optional[datetime]:
+        """
+        Returns the earliest commit time of all collected commits or None if there is no commit (e.g., no new commits
+        since the previous collection)
+        """
+        earliest_commit_time = None
+        for commit in self.get_commits_objects():
+            if earliest_commit_time is None or commit.committed_datetime < earliest_commit_time:
+                earliest_commit_time = commit.committed_datetime
+        return earliest_commit_time
+
+    def exclude_known_commits(self, head_commit_shas: [str]):
+        """
+        Excludes all commits reachable from the branch heads of a previous collection. Heads that the fetched
+        repository no longer contains (e.g., force pushed branches) are ignored.
+        :param head_commit_shas: Head commit hashes of the previously collected branches
+        """
+        self.excluded_commits = []
+        for head_commit_sha in set(head_commit_shas):
+            try:
+                self.repository.commit(head_commit_sha)
+            except (BadName, BadObject, ValueError) as e:
+                self.logger.warning(f"{self.repo_url} Previously collected head {head_commit_sha} is not part of the "
+                                    f"repository anymore, its history is collected again {e}")
+                continue
+            self.excluded_commits.append("^" + head_commit_sha)
+
     def repository_factory(self) -> Repo:
+        if self.incremental and os.path.isdir(self.clone_repo_path + "/.git"):
+            # Only fetch the new commits and branches into the clone of the previous collection
+            self.logger.info(f"Fetching repository from {self.repo_url}")
+            repository = Repo(self.clone_repo_path)
+            repository.remotes.origin.fetch(prune=True)
+            return repository
         self.logger.info(f"Cloning repository from {self.repo_url}")
         return Repo.clone_from(self.repo_url, self.clone_repo_path)
 
     def clean_up(self):
         """
-        Deletes the cloned repository and all its content
+        Deletes the cloned repository and all its content. The clone is kept for the next incremental collection.
         """
+        if self.incremental:
+            return
         shutil.rmtree(path=self.clone_repo_path)
 
     @staticmethod
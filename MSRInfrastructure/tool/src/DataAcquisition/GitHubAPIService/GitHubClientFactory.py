@@ -8,11 +8,17 @@ class GitHubClientFactory:
     """
     Interface to orchestrate the creation of GitHub REST and GraphQL wrapper classes. Ensures that clients
     are properly destroyed after use next to proper initialization in advance to usage.
+    By default, only the last accessed client is running. With concurrent_clients, both clients keep their token
+    until destroy_client, as the GraphQL and REST API have separate rate limits.
     """
 
-    def __init__(self, repo_owner: str, repo_name: str, token_manager: TokenManager):
+    def __init__(self, repo_owner: str, repo_name: str, token_manager: TokenManager, concurrent_clients: bool = False):
         self.repo_owner = repo_owner
         self.repo_name = repo_name
+        # Indicates if the GraphQL and REST client run at the same time
+        self.concurrent_clients = concurrent_clients
+        # Clients that are running in concurrent mode
+        self.running_clients = []
         # Indicates the last accessed API
         self.last_accessed_api: Optional[GITHUB_API_TYPE] = None
         # Indicates the value of the last accessed API
@@ -21,10 +27,25 @@ class GitHubClientFactory:
         self.GRAPHQL_API_CLIENT = GitHubGraphQLWrapper(token_manager, self.repo_owner, self.repo_name)
 
     def destroy_client(self):
-        if self.api_value is not None:
+        if self.concurrent_clients:
+            for client in self.running_clients:
+                client.destroy_client()
+            self.running_clients = []
+        elif self.api_value is not None:
             self.api_value.destroy_client()
 
+    def _get_concurrent_client(self, client):
+        """
+        Starts a client on first access and keeps it running next to the other client
+        """
+        if client not in self.running_clients:
+            client.start_client()
+            self.running_clients.append(client)
+        return client
+
     def get_rest_api(self) -> GitHubRESTWrapper:
+        if self.concurrent_clients:
+            return self._get_concurrent_client(self.REST_API_CLIENT)
         if self.last_accessed_api != GITHUB_API_TYPE.REST_API:
             # Destroy the old client
             if self.api_value is not None:
@@ -37,6 +58,8 @@ class GitHubClientFactory:
         return self.api_value
 
     def get_graphql_api(self) -> GitHubGraphQLWrapper:
+        if self.concurrent_clients:
+            return self._get_concurrent_client(self.GRAPHQL_API_CLIENT)
         if self.last_accessed_api != GITHUB_API_TYPE.GRAPH_QL_API:
             # Destroy the old client
             if self.api_value is not None:
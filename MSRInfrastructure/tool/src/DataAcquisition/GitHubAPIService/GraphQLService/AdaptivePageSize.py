@@ -0,0 +1,67 @@
+from typing import Optional
+from src.Utility.Utility import read_config
+
+
+class AdaptivePageSize:
+    """
+    AdaptivePageSize adjusts the page sizes (first: N) of the GraphQL query tree from the observed query cost,
+    query duration, and timeouts. Every GraphQLSecondaryRootNode scales its default page sizes (including nested
+    connections) with its own factor. Fast and cheap queries increase the factor, slow or expensive queries decrease
+    it proportionally, and timeouts halve it. The factor stays within the configured bounds.
+    """
+
+    _GROWTH = 1.25  # Factor increase after a fast and cheap query
+    _MIN_SHRINK = 0.5  # Lower bound of a single decrease after a slow or expensive query
+
+    def __init__(self, min_factor: float = 0.25, max_factor: float = 2.0, target_seconds: float = 4.0,
+                 max_cost: int = 50):
+        """
+        :param min_factor: Lower bound of the page size factor
+        :param max_factor: Upper bound of the page size factor
+        :param target_seconds: Query duration that queries should not exceed (GitHub stops queries after 10 seconds)
+        :param max_cost: Rate limit cost that queries should not exceed
+        """
+        self.min_factor: float = min(min_factor, 1.0)
+        self.max_factor: float = max(max_factor, 1.0)
+        self.target_seconds: float = target_seconds
+        self.max_cost: int = max_cost
+
+    @staticmethod
+    def from_config() -> Optional["AdaptivePageSize"]:
+        """
+        Creates the page size policy from the configuration
+        :return: AdaptivePageSize or None if adaptive page sizes are disabled (graphql_adaptive_page_size)
+        """
+        config = read_config()
+        if not config.get("graphql_adaptive_page_size", False):
+            return None
+        return AdaptivePageSize(
+            config.get("graphql_page_size_min_factor", 0.25),
+            config.get("graphql_page_size_max_factor", 2.0),
+            config.get("graphql_target_query_seconds", 4.0),
+            config.get("graphql_max_query_cost", 50)
+        )
+
+    def adjust(self, factor: float, seconds: float, cost: int) -> float:
+        """
+        Returns the page size factor of the next query after a successful query
+        :param factor: Page size factor of the query
+        :param seconds: Duration of the query
+        :param cost: Rate limit cost of the query
+        """
+        if seconds > self.target_seconds or cost > self.max_cost:
+            ratio = min(self.target_seconds / seconds if seconds > 0 else 1.0,
+                        self.max_cost / cost if cost > 0 else 1.0)
+            return max(self.min_factor, factor * max(AdaptivePageSize._MIN_SHRINK, ratio))
+        if seconds < self.target_seconds / 2 and cost * AdaptivePageSize._GROWTH <= self.max_cost:
+            return min(self.max_factor, factor * AdaptivePageSize._GROWTH)
+        return factor
+
+    def shrink(self, factor: float) -> Optional[float]:
+        """
+        Returns the page size factor of the next query after a timeout
+        :return: factor or None if the factor is already at the lower bound
+        """
+        if factor <= self.min_factor:
+            return None
+        return max(self.min_factor, factor / 2)
@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional
+from src.DataAcquisition.GitHubAPIService.GraphQLService.GraphQLQueryTree import GraphQLConnection, \
+    ISSUE_FIELDS, ISSUE_CONNECTIONS, PULL_REQUEST_FIELDS, PULL_REQUEST_CONNECTIONS, PULL_REQUEST_REVIEW_COMMENTS, \
+    get_node_query
+
+
+class FollowUpRoot:
+    """
+    Generates batched follow-up queries for nodes that the paginated GraphQL queries collected only partially (e.g.,
+    an issue with more than 100 comments). Instead of collecting every node on its own, one query requests a batch
+    of nodes with aliases (n<number>: issue(number: <number>) { ... }). The first round requests the complete nodes,
+    every further round only continues the connections that still have a next page with their cursors. A node is
+    returned as soon as all of its connections are complete.
+    """
+
+    def __init__(self, numbers: List[int], field: str, fields: str, connections: Dict[str, GraphQLConnection]):
+        """
+        :param numbers: Numbers of the nodes (max. one batch)
+        :param field: Repository field of a single node (e.g., issue)
+        :param fields: Node fields without paginated connections
+        :param connections: Paginated connections of the node
+        """
+        self._numbers: List[int] = list(numbers)
+        self._field: str = field
+        self._fields: str = fields
+        self._connections: Dict[str, GraphQLConnection] = connections
+        self._is_first_execution: bool = True
+        self._nodes: Dict[int, dict] = {}  # Number -> merged node of all incomplete nodes
+        self._queried_numbers: List[int] = []  # Numbers of the nodes with connections in the last query
+        self._review_aliases: Dict[str, dict] = {}  # Alias -> review of the last query (nested review comments)
+
+    def is_finished(self) -> bool:
+        """
+        Returns True if all nodes are complete
+        :return: bool
+        """
+        return not self._is_first_execution and len(self._nodes) == 0
+
+    def get_query_content(self) -> (str, str, bool):
+        """
+        Generates the next follow-up query
+        :return: (repository query content, top level query content, is_finished)
+        """
+        if self.is_finished():
+            return "", "", True
+        if self._is_first_execution:
+            node_query = get_node_query(self._fields, self._connections)
+            return "".join([
+                """
+        n{number}: {field}(number: {number}) !{node_query}
+        ?""".format(number=number, field=self._field, node_query=node_query)
+                for number in self._numbers
+            ]), "", False
+        repository_query = ""
+        self._queried_numbers = []
+        for number, node in self._nodes.items():
+            connection_query = "".join([
+                connection.get_query(node[name]["pageInfo"]["endCursor"])
+                for name, connection in self._connections.items() if self._has_next_page(node.get(name, None))
+            ])
+            if connection_query != "":
+                self._queried_numbers.append(number)
+                repository_query += """
+        n{number}: {field}(number: {number}) !{connection_query}
+        ?""".format(number=number, field=self._field, connection_query=connection_query)
+        self._review_aliases = {}
+        root_query = ""
+        for review in self._get_incomplete_reviews():
+            alias = f"r{len(self._review_aliases)}"
+            self._review_aliases[alias] = review
+            root_query += """
+    {alias}: node(id: "{id}") !
+        ... on PullRequestReview !
+            id{comments}
+        ?
+    ?""".format(alias=alias, id=review["id"],
+                comments=PULL_REQUEST_REVIEW_COMMENTS.get_query(review["comments"]["pageInfo"]["endCursor"]))
+        return repository_query, root_query, False
+
+    def parse_result(self, last_query_result: dict) -> List[dict]:
+        """
+        Merges the query result into the collected nodes
+        :return: List of nodes that are complete now (same format as the nodes of the paginated queries)
+        """
+        repository = last_query_result.get("repository", None) or {}
+        if self._is_first_execution:
+            self._is_first_execution = False
+            for number in self._numbers:
+                node = repository.get(f"n{number}", None)
+                # Nodes that do not exist anymore (e.g., deleted or transferred issues) are dropped
+                if node is not None:
+                    self._nodes[number] = node
+        else:
+            for number in self._queried_numbers:
+                self._merge(self._nodes[number], repository.get(f"n{number}", None))
+            for alias, review in self._review_aliases.items():
+                self._merge(review, last_query_result.get(alias, None))
+        complete_nodes = [number for number, node in self._nodes.items() if not self._is_incomplete(node)]
+        return [self._nodes.pop(number) for number in complete_nodes]
+
+    def _merge(self, node: dict, next_pages: Optional[dict]):
+        """
+        Appends the next pages of all connections to the node and updates their page info
+        """
+        if next_pages is None:
+            # The node disappeared in the meantime -> Keep the collected part
+            for connection in node.values():
+                if isinstance(connection, dict) and "pageInfo" in connection:
+                    connection["pageInfo"]["hasNextPage"] = False
+            return
+        for name, next_page in next_pages.items():
+            connection = node.get(name, None)
+            if not isinstance(next_page, dict) or not isinstance(connection, dict) or "nodes" not in connection:
+                continue
+            connection["nodes"].extend(next_page.get("nodes", []))
+            connection["pageInfo"] = next_page.get("pageInfo", {})
+
+    def _is_incomplete(self, node: dict) -> bool:
+        return any([self._has_next_page(node.get(name, None)) for name in self._connections.keys()]) or \
+            len(self._get_node_incomplete_reviews(node)) > 0
+
+    def _get_incomplete_reviews(self) -> List[dict]:
+        """
+        Returns all reviews of incomplete nodes whose comments have a next page
+        """
+        return [review for node in self._nodes.values() for review in self._get_node_incomplete_reviews(node)]
+
+    def _get_node_incomplete_reviews(self, node: dict) -> List[dict]:
+        """
+        Returns the nested nodes (pull request reviews) of a node whose comments have a next page
+        """
+        return []
+
+    @staticmethod
+    def _has_next_page(connection: Optional[dict]) -> bool:
+        if not isinstance(connection, dict):
+            return False
+        page_info = connection.get("pageInfo", None) or {}
+        return page_info.get("hasNextPage", False) is True and page_info.get("endCursor", None) is not None
+
+
+class IssueFollowUpRoot(FollowUpRoot):
+    """
+    Generates batched follow-up queries for partially collected issues
+    """
+
+    BATCH_SIZE = 30  # Same page size as IssueRootNodeGraphQL
+
+    def __init__(self, numbers: List[int]):
+        super().__init__(numbers, "issue", ISSUE_FIELDS, ISSUE_CONNECTIONS)
+
+
+class PullRequestFollowUpRoot(FollowUpRoot):
+    """
+    Generates batched follow-up queries for partially collected pull requests including the nested comments of their
+    reviews
+    """
+
+    BATCH_SIZE = 15  # Same page size as PullRequestRootNodeGraphQL
+
+    def __init__(self, numbers: List[int]):
+        super().__init__(numbers, "pullRequest", PULL_REQUEST_FIELDS, PULL_REQUEST_CONNECTIONS)
+
+    def _get_node_incomplete_reviews(self, node: dict) -> List[dict]:
+        # Review comments are only continued once all reviews are collected, as the reviews of the next pages
+        # contain their first comments page themselves
+        reviews = node.get("reviews", None)
+        if not isinstance(reviews, dict) or self._has_next_page(reviews):
+            return []
+        return [review for review in reviews.get("nodes", [])
+                if review is not None and self._has_next_page(review.get("comments", None))]
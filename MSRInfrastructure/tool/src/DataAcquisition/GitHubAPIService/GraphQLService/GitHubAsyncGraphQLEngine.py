@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from queue import Queue
+from typing import Dict, Optional
+from graphql import GraphQLSchema
+
+from gql import Client, gql
+from gql.transport.aiohttp import AIOHTTPTransport
+
+from src.DataAcquisition.GitHubAPIService.GraphQLService.GitHubGraphQLWrapper import GitHubGraphQLWrapper
+from src.DataAcquisition.GitHubAPIService.GraphQLService.GraphQLQueryTree import GraphQLRootNode
+from src.Utility.Logger import MSRLogger
+
+
+class GitHubAsyncGraphQLEngine:
+    """
+    GitHubAsyncGraphQLEngine pages multiple independent GraphQL cursors (streams) at the same time. Every stream is a
+    GraphQLRootNode (e.g., issues, pull requests, discussions) that an asyncio task advances page by page. At most
+    max_in_flight queries run at the same time on one aiohttp session with the token of the GitHubGraphQLWrapper.
+    Query results are handed to the consuming thread through a bounded queue, so the existing processors run
+    unchanged in the collector thread while the next pages are already requested. With adaptive page sizes, every
+    stream adjusts its page sizes from the duration and cost of its own queries and retries timeouts with smaller pages.
+    """
+
+    _MAX_ATTEMPTS = 5  # Attempts of a single query before the collection fails
+
+    # Queue item kinds
+    _RESULT = "result"
+    _STREAM_FINISHED = "stream_finished"
+    _FAILED = "failed"
+    _FINISHED = "finished"
+
+    def __init__(self, graphql_client: GitHubGraphQLWrapper, max_in_flight: int = 4, adaptive_page_size: bool = False):
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self.graphql_client: GitHubGraphQLWrapper = graphql_client
+        self.max_in_flight: int = max(1, max_in_flight)
+        self.adaptive_page_size: bool = adaptive_page_size  # If the root nodes adjust their page sizes
+        self.schema: Optional[GraphQLSchema] = GitHubGraphQLWrapper.load_schema()
+        self._results: Queue = Queue(maxsize=2 * self.max_in_flight)  # Bounds the number of unprocessed pages
+        self._client: Optional[Client] = None
+        self._session = None
+        self._session_token: Optional[str] = None  # Token of the open aiohttp session
+        self._stopped = threading.Event()  # Set if the consumer stops before all streams finished
+
+    def run(self, streams: Dict[str, GraphQLRootNode]):
+        """
+        Generator that pages all streams concurrently and returns their results in arrival order. Pages of the same
+        stream keep their order. After the last page of a stream, the stream is returned once more without a result.
+        :param streams: stream name -> GraphQLRootNode (optionally restored with set_state)
+        :return: (stream_name: str, query_result: dict | None, partially_collected_nodes: dict, state: dict)
+        """
+        if len(streams) == 0:
+            return
+        self._stopped.clear()
+        worker = threading.Thread(target=lambda: asyncio.run(self._run_streams(streams)), daemon=True)
+        worker.start()
+        finished = False
+        try:
+            while True:
+                kind, stream_name, query_result, partially_collected_nodes, state = self._results.get()
+                if kind == GitHubAsyncGraphQLEngine._FINISHED:
+                    finished = True
+                    return
+                if kind == GitHubAsyncGraphQLEngine._FAILED:
+                    raise Exception(f"[GitHubAsyncGraphQLEngine] Concurrent GraphQL collection failed: {query_result}")
+                yield stream_name, query_result, partially_collected_nodes, state
+        finally:
+            # Stop all streams and drain the queue to unblock them (e.g., the consumer failed)
+            self._stopped.set()
+            while not finished:
+                finished = self._results.get()[0] == GitHubAsyncGraphQLEngine._FINISHED
+            worker.join()
+
+    async def _run_streams(self, streams: Dict[str, GraphQLRootNode]):
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        session_lock = asyncio.Lock()
+        try:
+            await asyncio.gather(*[
+                self._run_stream(stream_name, root_node, in_flight, session_lock)
+                for stream_name, root_node in streams.items()
+            ])
+        except Exception as e:
+            self.logger.exception(f"{self.graphql_client.repo} Concurrent GraphQL collection failed {e}")
+            await loop.run_in_executor(None, self._results.put,
+                                       (GitHubAsyncGraphQLEngine._FAILED, "", str(e), None, None))
+        finally:
+            await self._close_session()
+            await loop.run_in_executor(None, self._results.put,
+                                       (GitHubAsyncGraphQLEngine._FINISHED, "", None, None, None))
+
+    async def _run_stream(self, stream_name: str, root_node: GraphQLRootNode, in_flight: asyncio.Semaphore,
+                          session_lock: asyncio.Lock):
+        """
+        Advances the cursors of a single stream until all of its nodes are collected
+        """
+        loop = asyncio.get_running_loop()
+        while not self._stopped.is_set():
+            query, is_query_finished = root_node.get_query_content()
+            if is_query_finished:
+                break
+            repository_query = self.graphql_client.get_repository_query(query)
+            try:
+                query_result, seconds = await self._execute(stream_name, repository_query, in_flight, session_lock,
+                                                            not self.adaptive_page_size)
+            except Exception as e:
+                if not self.adaptive_page_size or not GitHubGraphQLWrapper.is_timeout(e):
+                    raise
+                # Retry with smaller pages or with the same pages if they are already at the lower bound
+                if root_node.record_timeout():
+                    continue
+                query_result, seconds = await self._execute(stream_name, repository_query, in_flight, session_lock)
+            if self.adaptive_page_size:
+                root_node.record_query(seconds, query_result)
+            partially_collected_nodes = root_node.parse_result(query_result)
+            # Blocks while the consumer is behind, which pauses this stream only
+            await loop.run_in_executor(None, self._results.put, (
+                GitHubAsyncGraphQLEngine._RESULT, stream_name, query_result, partially_collected_nodes,
+                root_node.get_state()
+            ))
+        await loop.run_in_executor(None, self._results.put, (
+            GitHubAsyncGraphQLEngine._STREAM_FINISHED, stream_name, None, {}, root_node.get_state()
+        ))
+
+    async def _execute(self, stream_name: str, query: str, in_flight: asyncio.Semaphore,
+                       session_lock: asyncio.Lock, retry_timeouts: bool = True) -> (dict, float):
+        """
+        Executes a query on the shared session when the request pacer of the wrapper allows it. Failed queries back off
+        (secondary rate limit) or replace the client token and are retried.
+        :param retry_timeouts: If False, timeouts are raised to request smaller pages
+        :return: (query_result, duration of the query in seconds)
+        """
+        loop = asyncio.get_running_loop()
+        gql_code = gql(query)
+        for attempt in range(1, GitHubAsyncGraphQLEngine._MAX_ATTEMPTS + 1):
+            await self.graphql_client.pacer.wait_async()
+            async with session_lock:
+                session, token = await self._get_session()
+            try:
+                async with in_flight:
+                    start = time.monotonic()
+                    query_result = await session.execute(gql_code)
+                    seconds = time.monotonic() - start
+            except Exception as e:
+                self.logger.info(f"{self.graphql_client.repo} Exception occurred during graphql query execution "
+                                 f"({stream_name}, attempt {attempt}) {e}")
+                if attempt == GitHubAsyncGraphQLEngine._MAX_ATTEMPTS or \
+                        (not retry_timeouts and GitHubGraphQLWrapper.is_timeout(e)):
+                    raise
+                await loop.run_in_executor(None, self.graphql_client.handle_query_exception, e, token)
+                continue
+            # Token rotation blocks until a token is available and must not block the event loop
+            await loop.run_in_executor(None, self.graphql_client._process_rate_limit,
+                                       query_result.get("rateLimit", {}), token)
+            return query_result, seconds
+
+    async def _get_session(self):
+        """
+        Returns the open session and reconnects it if the wrapper rotated its token
+        :return: (session, token)
+        """
+        token = self.graphql_client.get_token()
+        if self._session is None or self._session_token != token:
+            await self._close_session()
+            transport = AIOHTTPTransport(
+                url="https://api.github.com/graphql",
+                headers={
+                    "Authorization": "bearer " + token
+                }
+            )
+            self._client = Client(transport=transport, schema=self.schema)
+            self._session = await self._client.connect_async(reconnecting=False)
+            self._session_token = token
+        return self._session, self._session_token
+
+    async def _close_session(self):
+        if self._client is not None:
+            await self._client.close_async()
+        self._client = None
+        self._session = None
+        self._session_token = None
@@ -1,13 +1,17 @@
 import os
+import threading
 import time
 
 from gql import Client, gql
 from gql.transport.requests import RequestsHTTPTransport
+from graphql import GraphQLSchema, build_ast_schema, parse
 from src.DataAcquisition.GitHubAPIService.TokenManager import TokenManager
+from src.DataAcquisition.GitHubAPIService.RequestPacer import RequestPacer
 from datetime import datetime
-from typing import Union
+from typing import Union, Optional
 from src.DataAcquisition.GitHubAPIService.GitHubAPIType import GITHUB_API_TYPE
 from src.Utility.Logger import MSRLogger
+from src.Utility.Utility import read_config
 
 # Inspired by gql 3 documentation https://gql.readthedocs.io/
 class GitHubGraphQLWrapper():
@@ -15,6 +19,11 @@ class GitHubGraphQLWrapper():
     A wrapper to query the GitHub GraphQL API.
     """
 
+    # The GitHub GraphQL schema is parsed and built once per process and shared by all clients
+    _schema: Optional[GraphQLSchema] = None
+    _schema_loaded = False
+    _schema_lock = threading.Lock()
+
     def __init__(self, token_manager: TokenManager, repo_owner: str, repo_name: str):
         self.token_manager: TokenManager = token_manager
         self.logger = MSRLogger.get_logger(self.__class__.__name__)
@@ -28,8 +37,11 @@ class GitHubGraphQLWrapper():
         self.running: bool = False
         self.github: Union[Client, None] = None
         self._remaining_token = 5000
+        self._last_query_seconds: float = 0.0  # Duration of the last successful query
         self._MIN_TOKEN_COUNT = 50
-        self._WAITING_TIME = 0.5
+        # Spaces queries based on the rate limit of the token
+        self.pacer = RequestPacer(token_manager, GITHUB_API_TYPE.GRAPH_QL_API, self.repo, self._MIN_TOKEN_COUNT)
+        self._lock = threading.RLock()  # Serializes token rotation of the synchronous client and the async engine
 
     def start_client(self):
         """
@@ -40,6 +52,7 @@ class GitHubGraphQLWrapper():
         self.running = True
         self.token = ""
         self.github = self._create_client()
+        self.pacer.reset()
 
     def _set_reuse_time(self, reuse_time: str):
         """
@@ -50,7 +63,7 @@ class GitHubGraphQLWrapper():
 
     def _create_client(self) -> Client:
         """
-        Creates a client and loads the schema to validate requests.
+        Creates a client with the shared schema to validate requests.
         :return: client: Client
         """
         self.token = self.token_manager.get_token(GITHUB_API_TYPE.GRAPH_QL_API)
@@ -61,10 +74,29 @@ class GitHubGraphQLWrapper():
                 "Authorization": "bearer " + self.token
             }
         )
-        # Read GitHub GraphQL Schema for query validation
-        with open(os.path.dirname(__file__) + "/GitHubGraphQLSchema/github-schema.graphql") as f:
-            schema = f.read()
-        return Client(transport=transport, schema=schema)
+        return Client(transport=transport, schema=GitHubGraphQLWrapper.load_schema())
+
+    @staticmethod
+    def load_schema() -> Optional[GraphQLSchema]:
+        """
+        Returns the process wide GitHub GraphQL Schema for query validation. The schema file is read, parsed, and built
+        on first use only.
+        :return: schema: GraphQLSchema or None if client side validation is disabled (graphql_validate_queries)
+        """
+        with GitHubGraphQLWrapper._schema_lock:
+            if not GitHubGraphQLWrapper._schema_loaded:
+                if read_config().get("graphql_validate_queries", True):
+                    with open(os.path.dirname(__file__) + "/GitHubGraphQLSchema/github-schema.graphql") as f:
+                        GitHubGraphQLWrapper._schema = build_ast_schema(parse(f.read()))
+                    MSRLogger.get_logger(GitHubGraphQLWrapper.__name__).info("GitHub GraphQL schema loaded")
+                GitHubGraphQLWrapper._schema_loaded = True
+            return GitHubGraphQLWrapper._schema
+
+    def get_token(self) -> str:
+        """
+        Returns the token of the running client
+        """
+        return self.token
 
     def destroy_client(self):
         """
@@ -85,58 +117,151 @@ class GitHubGraphQLWrapper():
             self.rate_limit_exceeded = False
             self.reuse_time = datetime.min
 
-    def _process_rate_limit(self, rate_limit: dict):
+    def _process_rate_limit(self, rate_limit: dict, token: Optional[str] = None):
         """
         Processes query rate limits.
         :param rate_limit: {"rateLimit": { "resetAt": "Y-M-DTH:M:SZ", "remaining": int} }
+        :param token: Token that executed the query. Rate limits of replaced tokens are ignored (concurrent queries).
         """
-        # Set the remaining token amount
-        self._remaining_token = rate_limit.get("remaining", 0)
+        with self._lock:
+            if token is not None and token != self.token:
+                return
+            # Set the remaining token amount
+            self._remaining_token = rate_limit.get("remaining", 0)
+            if rate_limit.get("resetAt", None) is not None:
+                self.token_manager.update_budget(self.token, GITHUB_API_TYPE.GRAPH_QL_API, self._remaining_token,
+                                                 rate_limit.get("limit", 5000), rate_limit.get("resetAt"))
+                self.pacer.update(
+                    self._remaining_token,
+                    rate_limit.get("limit", 5000),
+                    datetime.strptime(rate_limit.get("resetAt"), self.time_format),
+                    rate_limit.get("cost", 1)
+                )
 
-        # Threshold of _MIN_TOKEN_COUNT before marking token as rate_limit_exceeded
-        if self._remaining_token <= self._MIN_TOKEN_COUNT:
-            self.logger.info(f"{self.repo} Token count below {self._MIN_TOKEN_COUNT} for token: {self.token}")
-            self.rate_limit_exceeded = True
-            self._set_reuse_time(rate_limit.get("resetAt"))
+            # Threshold of _MIN_TOKEN_COUNT before marking token as rate_limit_exceeded
+            if self._remaining_token <= self._MIN_TOKEN_COUNT:
+                self.logger.info(f"{self.repo} Token count below {self._MIN_TOKEN_COUNT} for token: {self.token}")
+                self.rate_limit_exceeded = True
+                self._set_reuse_time(rate_limit.get("resetAt"))
 
-        # Reset client, create new client, and reset reuse time in case of rate limit exceeded
-        if self.rate_limit_exceeded:
-            self.logger.info(f"{self.repo} Rate limit exceeded -> acquiring new client")
+            # Reset client, create new client, and reset reuse time in case of rate limit exceeded
+            if self.rate_limit_exceeded:
+                self.logger.info(f"{self.repo} Rate limit exceeded -> acquiring new client")
+                self.destroy_client()
+                self.start_client()
+
+    def restart_client(self, token: Optional[str] = None):
+        """
+        Replaces the client after a failed query. Failures of replaced tokens are ignored (concurrent queries).
+        :param token: Token that executed the failed query
+        """
+        with self._lock:
+            if token is not None and token != self.token:
+                return
             self.destroy_client()
             self.start_client()
 
-    def execute(self, query: str):
+    def handle_query_exception(self, exception: Exception, token: Optional[str] = None):
+        """
+        Pauses all queries after secondary rate limit responses and replaces the client after other failures
+        :param exception: Exception of the failed query
+        :param token: Token that executed the failed query
+        """
+        if GitHubGraphQLWrapper.is_secondary_rate_limit(exception):
+            self.pacer.back_off()
+        elif GitHubGraphQLWrapper.is_timeout(exception):
+            # The query was too large for GitHub -> The token is not the cause
+            self.logger.info(f"{self.repo} GraphQL query timed out")
+        else:
+            self.restart_client(token)
+
+    @staticmethod
+    def is_secondary_rate_limit(exception: Exception) -> bool:
+        """
+        Determines if a query failed because of a secondary rate limit (HTTP 403/429)
+        """
+        return getattr(exception, "code", None) in [403, 429] or "secondary rate limit" in str(exception).lower()
+
+    @staticmethod
+    def is_timeout(exception: Exception) -> bool:
+        """
+        Determines if a query failed because GitHub stopped it (HTTP 502/504 or a timeout error in the response)
+        """
+        message = str(exception).lower()
+        return getattr(exception, "code", None) in [502, 504] or "timeout" in message or "timed out" in message
+
+    def execute(self, query: str, root_query: str = "", retry_timeouts: bool = True):
         """
         Execute a graphql query.
         :param query: query
+        :param root_query: additional query content next to repository { ... } (e.g., node(id: ...) aliases)
+        :param retry_timeouts: If False, timeouts are raised to request smaller pages (see AdaptivePageSize)
+        :return:
+        """
+        if not self.running:
+            self.logger.exception(f"{self.repo} Can not execute request -> client is not running")
+        query = self.get_repository_query(query, root_query)
+        gql_code = gql(query)
+        self.pacer.wait()
+        token = self.token
+        try:
+            start = time.monotonic()
+            query_result = self.github.execute(gql_code)
+            self._last_query_seconds = time.monotonic() - start
+        except Exception as e:
+            if not retry_timeouts and GitHubGraphQLWrapper.is_timeout(e):
+                raise
+            # TODO: Implement more robust query error handling
+            self.handle_query_exception(e, token)
+            query_result = self.execute_raw(query)
+            self.logger.info(f"{self.repo} Exception occurred during graphql query execution")
+        self._process_rate_limit(query_result.get("rateLimit", {}), token)
+        return query_result
+
+    def execute_once(self, query: str):
+        """
+        Execute a graphql query without retries. Failures are handled like in execute (back off or client restart)
+        and raised afterward, e.g., for repositories that do not exist.
+        :param query: query content inside repository { ... }
         :return:
         """
         if not self.running:
             self.logger.exception(f"{self.repo} Can not execute request -> client is not running")
-        query = '''
+        gql_code = gql(self.get_repository_query(query))
+        self.pacer.wait()
+        token = self.token
+        try:
+            query_result = self.github.execute(gql_code)
+        except Exception as e:
+            self.handle_query_exception(e, token)
+            raise
+        self._process_rate_limit(query_result.get("rateLimit", {}), token)
+        return query_result
+
+    def get_repository_query(self, query: str, root_query: str = "") -> str:
+        """
+        Embeds a query into the repository template that also requests the rate limit
+        :param query: query content inside repository { ... } ('!' and '?' replace curly brackets)
+        :param root_query: additional query content next to repository { ... } (e.g., node(id: ...) aliases)
+        :return: str
+        """
+        if query.strip() == "":
+            # A selection must not be empty
+            query = "id"
+        return '''
         !
             repository(owner: "{repo_owner}", name: "{repo_name}") !
                 {query}
-            ?
+            ?{root_query}
             rateLimit !
+                limit
                 remaining
                 cost
                 resetAt
             ?
         ?
-        '''.format(repo_owner=self.repo_owner, repo_name=self.repo_name, query=query).replace("!", "{").replace("?", "}")
-        gql_code = gql(query)
-        try:
-            query_result = self.github.execute(gql_code)
-            time.sleep(self._WAITING_TIME)
-        except Exception as e:
-            # TODO: Implement more robust query error handling
-            self.destroy_client()
-            self.start_client()
-            query_result = self.execute_raw(query)
-            self.logger.info(f"{self.repo} Exception occurred during graphql query execution")
-        self._process_rate_limit(query_result.get("rateLimit", {}))
-        return query_result
+        '''.format(repo_owner=self.repo_owner, repo_name=self.repo_name, query=query,
+                   root_query=root_query).replace("!", "{").replace("?", "}")
 
     def execute_raw(self, query: str):
         """
@@ -148,17 +273,22 @@ class GitHubGraphQLWrapper():
         if not self.running:
             self.logger.exception(f"{self.repo} Cannot execute request -> client is not running")
         gql_code = gql(query)
+        self.pacer.wait()
+        token = self.token
         try:
+            start = time.monotonic()
             query_result = self.github.execute(gql_code)
-            time.sleep(self._WAITING_TIME)
+            self._last_query_seconds = time.monotonic() - start
         except Exception as e:
             # TODO: Implement more robust query error handling
-            self.destroy_client()
-            self.start_client()
+            self.handle_query_exception(e, token)
             query_result = self.execute_raw(query)
             self.logger.info(f"{self.repo} Exception occurred during graphql query execution")
-        self._process_rate_limit(query_result.get("rateLimit", {}))
+        self._process_rate_limit(query_result.get("rateLimit", {}), token)
         return query_result
 
     def get_remaining_token(self):
         return self._remaining_token
+
+    def get_last_query_seconds(self) -> float:
+        return self._last_query_seconds
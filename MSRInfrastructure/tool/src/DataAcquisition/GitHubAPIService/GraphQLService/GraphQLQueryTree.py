@@ -1,5 +1,17 @@
 from abc import ABC, abstractmethod
+from typing import Optional, Dict
 from src.Utility.Utility import dict_search
+from src.DataAcquisition.GitHubAPIService.GraphQLService.AdaptivePageSize import AdaptivePageSize
+
+# GitHub accepts at most 100 nodes per connection page
+MAX_PAGE_SIZE = 100
+
+
+def scale_page_size(page_size: int, page_size_factor: float) -> int:
+    """
+    Scales a default page size with a page size factor (see AdaptivePageSize)
+    """
+    return max(1, min(MAX_PAGE_SIZE, round(page_size * page_size_factor)))
 
 
 class GraphQLSecondaryRootNode(ABC):
@@ -15,6 +27,8 @@ class GraphQLSecondaryRootNode(ABC):
         # IssueRootNode inherits this class and _has_next_page is true it means that there are more issues to collect
         self._cursor: str = ""  # The cursor is necessary to store as the GraphQL API requires it in the next request
         # to continue collecting more data where the last query stopped
+        self._page_size_factor: float = 1.0  # Scales all page sizes of the query (adaptive page sizes)
+        self._adaptive_page_size: Optional[AdaptivePageSize] = None  # Adjusts the factor, None -> default sizes
 
     @abstractmethod
     def get_query(self) -> str:
@@ -77,23 +91,107 @@ class GraphQLSecondaryRootNode(ABC):
     def set_first_execution(self, first_execution: bool):
         self._first_execution = first_execution
 
+    def get_page_size(self, page_size: int) -> int:
+        """
+        Returns the current size of a page with the given default size
+        """
+        return scale_page_size(page_size, self._page_size_factor)
+
+    def get_page_size_factor(self) -> float:
+        return self._page_size_factor
 
-class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
+    def set_adaptive_page_size(self, adaptive_page_size: Optional[AdaptivePageSize]):
+        self._adaptive_page_size = adaptive_page_size
+
+    def record_query(self, seconds: float, cost: int):
+        """
+        Adjusts the page sizes after a successful query
+        :param seconds: Duration of the query
+        :param cost: Rate limit cost of the query
+        """
+        if self._adaptive_page_size is not None:
+            self._page_size_factor = self._adaptive_page_size.adjust(self._page_size_factor, seconds, cost)
+
+    def record_timeout(self) -> bool:
+        """
+        Reduces the page sizes after a query timeout
+        :return: True if the page sizes are smaller now
+        """
+        if self._adaptive_page_size is None:
+            return False
+        page_size_factor = self._adaptive_page_size.shrink(self._page_size_factor)
+        if page_size_factor is None:
+            return False
+        self._page_size_factor = page_size_factor
+        return True
+
+    def get_state(self) -> dict:
+        """
+        Returns the cursor state to resume the query later
+        """
+        return {
+            "first_execution": self._first_execution,
+            "has_next_page": self._has_next_page,
+            "cursor": self._cursor,
+            "page_size_factor": self._page_size_factor
+        }
+
+    def set_state(self, state: dict):
+        """
+        Restores a cursor state returned by get_state
+        """
+        self._first_execution = state["first_execution"]
+        self._has_next_page = state["has_next_page"]
+        self._cursor = state["cursor"]
+        self._page_size_factor = state.get("page_size_factor", 1.0)
+
+
+class GraphQLConnection:
     """
-    Construct the pull request query
+    A paginated connection of a first layer node (e.g., the comments of an issue). The first page is part of the
+    node query, follow-up queries continue the connection with its cursor (see FollowUpQuery).
     """
 
-    def get_query(self) -> str:
-        query_arguments = "first: 15"
-        if not self.is_first_execution():
-            query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
+    def __init__(self, name: str, page_size: int, selection: str, arguments: str = "",
+                 nested: Optional[Dict[str, "GraphQLConnection"]] = None):
+        """
+        :param name: field name of the connection (e.g., comments)
+        :param page_size: default number of connection nodes per page (first: page_size)
+        :param selection: selection of the connection containing nodes and pageInfo ('!' and '?' replace brackets)
+        :param arguments: further connection arguments (e.g., itemTypes: [CLOSED_EVENT])
+        :param nested: connections inside the selection, placeholder name -> connection (e.g., {comments})
+        """
+        self.name: str = name
+        self.page_size: int = page_size
+        self.selection: str = selection
+        self.arguments: str = arguments
+        self.nested: Dict[str, GraphQLConnection] = {} if nested is None else nested
+
+    def get_query(self, cursor: Optional[str] = None, page_size_factor: float = 1.0) -> str:
+        """
+        Returns the connection query of the first page or of the page after the cursor
+        :param cursor: endCursor of the previous page
+        :param page_size_factor: scales the page size of this and all nested connections (see AdaptivePageSize)
+        """
+        query_arguments = f"first: {scale_page_size(self.page_size, page_size_factor)}"
+        if self.arguments != "":
+            query_arguments += ", " + self.arguments
+        if cursor is not None:
+            query_arguments += ", after:" + '\"' + cursor + '\"'
+        selection = self.selection
+        if len(self.nested) > 0:
+            selection = selection.format(**{
+                placeholder: connection.get_query(page_size_factor=page_size_factor)
+                for placeholder, connection in self.nested.items()
+            })
         return """
-        pullRequests({query_arguments}) !
-          pageInfo !
-            hasNextPage
-            endCursor
-          ?
-          nodes !
+            {name}({query_arguments}) !{selection}?""".format(
+            name=self.name, query_arguments=query_arguments, selection=selection
+        )
+
+
+# Fields of a pull request without paginated connections
+PULL_REQUEST_FIELDS = """
             id
             number
             mergedAt
@@ -102,6 +200,7 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
             isDraft
             locked
             createdAt
+            updatedAt
             activeLockReason
             state
             baseRepository !
@@ -153,8 +252,48 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                   name
                 ?
               ?
-            ?
-            assignees(first: 10) !
+            ?"""
+
+# Comments of a pull request review (nested connection of PULL_REQUEST_CONNECTIONS['reviews'])
+PULL_REQUEST_REVIEW_COMMENTS = GraphQLConnection("comments", 100, """
+                  nodes !
+                    id
+                    body
+                    createdAt
+                    diffHunk
+                    createdAt
+                    path
+                    startLine
+                    originalStartLine
+                    line
+                    originalLine
+                    author !
+                      ... on User !
+                        id
+                        login
+                        email
+                        name
+                      ?
+                    ?
+                    replyTo !
+                      id
+                    ?
+                    commit !
+                      oid
+                    ?
+                    originalCommit !
+                      oid
+                    ?
+                  ?
+                  pageInfo !
+                    hasNextPage
+                    endCursor
+                  ?
+                """)
+
+# Paginated connections of a pull request
+PULL_REQUEST_CONNECTIONS = {
+    "assignees": GraphQLConnection("assignees", 10, """
               nodes !
                 id
                 login
@@ -165,8 +304,8 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                 hasNextPage
                 endCursor
               ?
-            ?
-            comments(first: 50) !
+            """),
+    "comments": GraphQLConnection("comments", 50, """
               nodes !
                 id
                 body
@@ -184,8 +323,8 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                 hasNextPage
                 endCursor
               ?
-            ?
-            timelineItems(first: 100, itemTypes: [MERGED_EVENT, CLOSED_EVENT]) !
+            """),
+    "timelineItems": GraphQLConnection("timelineItems", 100, """
               nodes !
                 __typename
                 ... on MergedEvent !
@@ -220,8 +359,8 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                 hasNextPage
                 endCursor
               ?
-            ?
-            reviews(first: 100) !
+            """, "itemTypes: [MERGED_EVENT, CLOSED_EVENT]"),
+    "reviews": GraphQLConnection("reviews", 100, """
               nodes !
                 id
                 state
@@ -238,49 +377,14 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                 ?
                 commit !
                   oid
-                ?
-                comments(first: 100) !
-                  nodes !
-                    id
-                    body
-                    createdAt
-                    diffHunk
-                    createdAt
-                    path
-                    startLine
-                    originalStartLine
-                    line
-                    originalLine
-                    author !
-                      ... on User !
-                        id
-                        login
-                        email
-                        name
-                      ?
-                    ?
-                    replyTo !
-                      id
-                    ?
-                    commit !
-                      oid
-                    ?
-                    originalCommit !
-                      oid
-                    ?
-                  ?
-                  pageInfo !
-                    hasNextPage
-                    endCursor
-                  ?
-                ?
+                ?{comments}
               ?
               pageInfo !
                 hasNextPage
                 endCursor
               ?
-            ?
-            labels(first: 10) !
+            """, nested={"comments": PULL_REQUEST_REVIEW_COMMENTS}),
+    "labels": GraphQLConnection("labels", 10, """
               nodes !
                 id
                 name
@@ -289,8 +393,8 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                 hasNextPage
                 endCursor
               ?
-            ?
-            files(first: 50) !
+            """),
+    "files": GraphQLConnection("files", 50, """
               nodes !
                 additions
                 deletions
@@ -301,30 +405,18 @@ class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
                 hasNextPage
                 endCursor
               ?
-            ?
-          ?
-        ?
-        """.format(query_arguments=query_arguments)
-
+            """)
+}
 
-class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
-    """
-    Construct the issue query
-    """
-
-    def get_query(self) -> str:
-        query_arguments = "first: 30"
-        if not self.is_first_execution():
-            query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
-        return """
-        issues({query_arguments}) !
-          nodes !
+# Fields of an issue without paginated connections
+ISSUE_FIELDS = """
             id
             number
             title
             body
             state
             createdAt
+            updatedAt
             milestone !
               id
               number
@@ -344,7 +436,18 @@ class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
                 ?
               ?
             ?
-            timelineItems(first: 100, itemTypes: [CLOSED_EVENT, CONVERTED_TO_DISCUSSION_EVENT]) !
+            author !
+              ... on User !
+                id
+                login
+                email
+                name
+              ?
+            ?"""
+
+# Paginated connections of an issue
+ISSUE_CONNECTIONS = {
+    "timelineItems": GraphQLConnection("timelineItems", 100, """
               nodes !
                 __typename
                 ... on ClosedEvent !
@@ -367,16 +470,8 @@ class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
                 endCursor
                 hasNextPage
               ?
-            ?
-            author !
-              ... on User !
-                id
-                login
-                email
-                name
-              ?
-            ?
-            assignees(first: 20) !
+            """, "itemTypes: [CLOSED_EVENT, CONVERTED_TO_DISCUSSION_EVENT]"),
+    "assignees": GraphQLConnection("assignees", 20, """
               nodes !
                 id
                 login
@@ -387,8 +482,8 @@ class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
                 endCursor
                 hasNextPage
               ?
-            ?
-            labels(first: 50) !
+            """),
+    "labels": GraphQLConnection("labels", 50, """
               nodes !
                 id
                 name
@@ -397,8 +492,8 @@ class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
                 endCursor
                 hasNextPage
               ?
-            ?
-            comments(first: 100) !
+            """),
+    "comments": GraphQLConnection("comments", 100, """
               nodes !
                 id
                 createdAt
@@ -416,14 +511,91 @@ class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
                 endCursor
                 hasNextPage
               ?
-            ?
+            """)
+}
+
+
+def get_node_query(fields: str, connections: dict, page_size_factor: float = 1.0) -> str:
+    """
+    Returns the complete selection of a node with the first page of all its connections
+    """
+    return fields + "".join([
+        connection.get_query(page_size_factor=page_size_factor) for connection in connections.values()
+    ])
+
+
+class PullRequestRootNodeGraphQL(GraphQLSecondaryRootNode):
+    """
+    Construct the pull request query
+    """
+
+    def __init__(self, since: Optional[str] = None):
+        """
+        :param since: Only collect pull requests updated at or after this time ('YYYY-MM-DDTHH:MM:SSZ')
+        """
+        super().__init__()
+        self._since = since
+
+    def get_query(self) -> str:
+        query_arguments = f"first: {self.get_page_size(15)}"
+        if self._since is not None:
+            # Pull requests have no 'since' filter -> Order by update time and stop at the first older pull request
+            query_arguments += ", orderBy: !field: UPDATED_AT, direction: DESC?"
+        if not self.is_first_execution():
+            query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
+        return """
+        pullRequests({query_arguments}) !
+          pageInfo !
+            hasNextPage
+            endCursor
+          ?
+          nodes !{node_query}
+          ?
+        ?
+        """.format(query_arguments=query_arguments,
+                   node_query=get_node_query(PULL_REQUEST_FIELDS, PULL_REQUEST_CONNECTIONS, self.get_page_size_factor()))
+
+    def parse_result(self, last_query_result: dict) -> []:
+        partially_collected_values = super().parse_result(last_query_result)
+        if self._since is not None:
+            # Results are ordered by update time -> All following pull requests are older than since
+            for pull_request in last_query_result.get("nodes", []):
+                updated_at = pull_request.get("updatedAt", None) if pull_request is not None else None
+                if updated_at is not None and updated_at < self._since:
+                    self.set_has_next_page(False)
+                    break
+        return partially_collected_values
+
+
+class IssueRootNodeGraphQL(GraphQLSecondaryRootNode):
+    """
+    Construct the issue query
+    """
+
+    def __init__(self, since: Optional[str] = None):
+        """
+        :param since: Only collect issues updated at or after this time ('YYYY-MM-DDTHH:MM:SSZ')
+        """
+        super().__init__()
+        self._since = since
+
+    def get_query(self) -> str:
+        query_arguments = f"first: {self.get_page_size(30)}"
+        if self._since is not None:
+            query_arguments += ", filterBy: !since: " + '\"' + self._since + '\"' + "?"
+        if not self.is_first_execution():
+            query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
+        return """
+        issues({query_arguments}) !
+          nodes !{node_query}
           ?
           pageInfo !
             endCursor
             hasNextPage
           ?
         ?
-        """.format(query_arguments=query_arguments)
+        """.format(query_arguments=query_arguments,
+                   node_query=get_node_query(ISSUE_FIELDS, ISSUE_CONNECTIONS, self.get_page_size_factor()))
 
 
 class DiscussionRootNodeGraphQL(GraphQLSecondaryRootNode):
@@ -432,7 +604,7 @@ class DiscussionRootNodeGraphQL(GraphQLSecondaryRootNode):
     """
 
     def get_query(self) -> str:
-        query_arguments = "first: 30"
+        query_arguments = f"first: {self.get_page_size(30)}"
         if not self.is_first_execution():
             query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
         return """
@@ -457,7 +629,7 @@ class DiscussionRootNodeGraphQL(GraphQLSecondaryRootNode):
                 name
               ?
             ?
-            labels(first: 50) !
+            labels(first: {labels_page_size}) !
               nodes !
                 id
                 name
@@ -467,7 +639,7 @@ class DiscussionRootNodeGraphQL(GraphQLSecondaryRootNode):
                 hasNextPage
               ?
             ?
-            comments(first: 30) !
+            comments(first: {comments_page_size}) !
               nodes !
                 id
                 body
@@ -481,7 +653,7 @@ class DiscussionRootNodeGraphQL(GraphQLSecondaryRootNode):
                     name
                   ?
                 ?
-                replies(first: 100) !
+                replies(first: {replies_page_size}) !
                     nodes !
                       id
                       body
@@ -512,7 +684,8 @@ class DiscussionRootNodeGraphQL(GraphQLSecondaryRootNode):
             hasNextPage
           ?
         ?
-        """.format(query_arguments=query_arguments)
+        """.format(query_arguments=query_arguments, labels_page_size=self.get_page_size(50),
+                   comments_page_size=self.get_page_size(30), replies_page_size=self.get_page_size(100))
 
 
 class ReleaseRootNodeGraphQL(GraphQLSecondaryRootNode):
@@ -521,7 +694,7 @@ class ReleaseRootNodeGraphQL(GraphQLSecondaryRootNode):
     """
 
     def get_query(self) -> str:
-        query_arguments = "first: 100"
+        query_arguments = f"first: {self.get_page_size(100)}"
         if not self.is_first_execution():
             query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
         return """
@@ -555,7 +728,7 @@ class LabelRootNodeGraphQL(GraphQLSecondaryRootNode):
     """
 
     def get_query(self) -> str:
-        query_arguments = "first: 100"
+        query_arguments = f"first: {self.get_page_size(100)}"
         if not self.is_first_execution():
             query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
         return """
@@ -579,7 +752,7 @@ class MilestoneRootNodeGraphQL(GraphQLSecondaryRootNode):
     """
 
     def get_query(self) -> str:
-        query_arguments = "first: 30"
+        query_arguments = f"first: {self.get_page_size(30)}"
         if not self.is_first_execution():
             query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
         return """
@@ -635,7 +808,7 @@ class WatcherRootNodeGraphQL(GraphQLSecondaryRootNode):
     """
 
     def get_query(self) -> str:
-        query_arguments = "first: 50"
+        query_arguments = f"first: {self.get_page_size(50)}"
         if not self.is_first_execution():
             query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
         return """
@@ -660,7 +833,7 @@ class StargazerRootNodeGraphQL(GraphQLSecondaryRootNode):
     """
 
     def get_query(self) -> str:
-        query_arguments = "first: 50"
+        query_arguments = f"first: {self.get_page_size(50)}"
         if not self.is_first_execution():
             query_arguments += ", after:" + '\"' + self.get_cursor() + '\"'
         return """
@@ -686,13 +859,16 @@ class GraphQLRootNode:
     parse cursors for retrieving the next results. Parsing cursors is only possible on the first layer (the nodes named
     in advance).
     """
-    def __init__(self, activate: [str], exception: [str]):
+    def __init__(self, activate: [str], exception: [str], since: Optional[dict] = None):
         """
         :param activate: A list of node names to generate queries for.
         :param exception: A list of node names that cannot keep the query running
+        :param since: Optional lower bounds of the update time per node name (issues, pullRequests)
         """
+        since = {} if since is None else since
         self.children: dict = {}
         self.exception: [str] = exception
+        self._queried_children: [str] = []  # Names of the secondary root nodes in the last query
         if "labels" in activate:
             self.children.update({"labels": LabelRootNodeGraphQL()})
         if "releases" in activate:
@@ -700,9 +876,9 @@ class GraphQLRootNode:
         if "discussions" in activate:
             self.children.update({"discussions": DiscussionRootNodeGraphQL()})
         if "issues" in activate:
-            self.children.update({"issues": IssueRootNodeGraphQL()})
+            self.children.update({"issues": IssueRootNodeGraphQL(since.get("issues", None))})
         if "pullRequests" in activate:
-            self.children.update({"pullRequests": PullRequestRootNodeGraphQL()})
+            self.children.update({"pullRequests": PullRequestRootNodeGraphQL(since.get("pullRequests", None))})
         if "watchers" in activate:
             self.children.update({"watchers": WatcherRootNodeGraphQL()})
         if "stargazers" in activate:
@@ -719,10 +895,50 @@ class GraphQLRootNode:
         query_array_keys = [child_key for child_key, child_value in self.children.items() if
                             child_value.has_next_page()]
         query_array_except = [child_key for child_key in query_array_keys if child_key not in self.exception]
+        self._queried_children = query_array_keys
         # Format query and return as string
         query = "\n".join(query_array)
         return query.replace("!", "{").replace("?", "}"), len(query_array_except) == 0
 
+    def enable_adaptive_page_size(self, adaptive_page_size: AdaptivePageSize):
+        """
+        Adjusts the page sizes of all secondary root nodes from the observed queries
+        """
+        for child in self.children.values():
+            child.set_adaptive_page_size(adaptive_page_size)
+
+    def record_query(self, seconds: float, last_query_result: dict):
+        """
+        Adjusts the page sizes of all secondary root nodes of the last query after it succeeded
+        :param seconds: Duration of the query
+        :param last_query_result: Query result including rateLimit
+        """
+        cost = dict_search(last_query_result, ["rateLimit", "cost"], None) or 1
+        for child_key in self._queried_children:
+            self.children[child_key].record_query(seconds, cost)
+
+    def record_timeout(self) -> bool:
+        """
+        Reduces the page sizes of all secondary root nodes of the last query after it timed out
+        :return: True if the next query requests smaller pages
+        """
+        return any([self.children[child_key].record_timeout() for child_key in self._queried_children])
+
+    def get_state(self) -> dict:
+        """
+        Returns the cursor state of all secondary root nodes
+        :return: {node_name: state}
+        """
+        return {child_key: child.get_state() for child_key, child in self.children.items()}
+
+    def set_state(self, state: dict):
+        """
+        Restores the cursor state of all secondary root nodes to continue a previous query
+        """
+        for child_key, child_state in state.items():
+            if child_key in self.children:
+                self.children[child_key].set_state(child_state)
+
     def parse_result(self, last_query_result: dict) -> dict:
         """
         Parses previous query results to update cursors and has_next_page values.
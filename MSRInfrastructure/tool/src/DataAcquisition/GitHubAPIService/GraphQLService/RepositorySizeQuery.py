@@ -0,0 +1,37 @@
+class RepositorySizeRoot:
+    """
+    Generates the GraphQL query to estimate the collection size of a repository (pre-flight sizing of the
+    RepositoryScheduler). The query only requests totalCounts and costs a single point.
+    """
+
+    def get_query_content(self) -> str:
+        return """
+        diskUsage
+        issues {
+          totalCount
+        }
+        pullRequests {
+          totalCount
+        }
+        discussions {
+          totalCount
+        }
+        stargazers {
+          totalCount
+        }
+        watchers {
+          totalCount
+        }
+        releases {
+          totalCount
+        }
+        defaultBranchRef {
+          target {
+            ... on Commit {
+              history {
+                totalCount
+              }
+            }
+          }
+        }
+        """
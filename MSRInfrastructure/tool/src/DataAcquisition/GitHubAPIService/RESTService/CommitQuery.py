@@ -1,4 +1,6 @@
 import warnings
+from datetime import datetime
+from typing import Optional
 
 from src.DataAcquisition.GitHubAPIService.RESTService.GitHubRESTWrapper import GitHubRESTWrapper
 from src.Utility.Utility import dict_search
@@ -9,11 +11,15 @@ class CommitsRoot:
     Generates metadata for each commit (author/ committer/ comments)
     """
 
-    def __init__(self, github_rest_api: GitHubRESTWrapper):
+    def __init__(self, github_rest_api: GitHubRESTWrapper, since: Optional[datetime] = None):
+        """
+        :param since: Only collect commits after this time (incremental collection)
+        """
         self._github_rest_api = github_rest_api
+        self._since = since
 
     def get_data(self):
-        for commit in self._github_rest_api.get_commits():
+        for commit in self._github_rest_api.get_commits(self._since):
             commit_hash = commit.sha
 
             # Edge case
@@ -2,7 +2,8 @@ import threading
 import requests
 from datetime import datetime
 from src.DataAcquisition.GitHubAPIService.TokenManager import TokenManager
-from typing import Union
+from src.DataAcquisition.GitHubAPIService.RequestPacer import RequestPacer
+from typing import Union, Optional
 from github import Github, Repository, Auth, RateLimitExceededException, NamedUser, Label, PaginatedList, Issue, \
     PullRequest, PullRequestComment, PullRequestReview, IssueEvent, IssueComment, File, Workflow, WorkflowRun, \
     Commit
@@ -28,6 +29,10 @@ class GitHubRESTWrapper:
         self.token = ""
         self.running: bool = False
         self._MIN_TOKEN_COUNT = 50
+        self._MAX_SECONDARY_RATE_LIMIT_ATTEMPTS = 5  # Attempts of a custom request that hits secondary rate limits
+        # Spaces requests based on the rate limit of the token
+        self.pacer = RequestPacer(token_manager, GITHUB_API_TYPE.REST_API, self.repo, self._MIN_TOKEN_COUNT)
+        self._last_remaining = -1  # Remaining points of the last paced response
 
     def start_client(self):
         """
@@ -40,6 +45,8 @@ class GitHubRESTWrapper:
         self.github: Github = github
         self.client: Repository = client
         self.running = True
+        self.pacer.reset()
+        self._last_remaining = -1
 
     def _create_client(self) -> (Github, Repository):
         """
@@ -49,7 +56,8 @@ class GitHubRESTWrapper:
         try:
             self.token = self.token_manager.get_token(GITHUB_API_TYPE.REST_API)
             authentication = Auth.Token(self.token)
-            github = Github(auth=authentication, per_page=100, seconds_between_requests=0.1)
+            # Requests are spaced by the RequestPacer instead of a fixed delay
+            github = Github(auth=authentication, per_page=100, seconds_between_requests=0)
             client = github.get_repo(self.repo)
             return github, client
         except RateLimitExceededException:
@@ -96,20 +104,62 @@ class GitHubRESTWrapper:
         # Check if the client is running
         if not self.running:
             self.logger.exception(f"{self.repo} Request failed -> client is not running")
-        # Destroys the old client and creates a new one if token count is below self._MIN_TOKEN_COUNT
-        if self.get_remaining_token() <= self._MIN_TOKEN_COUNT:
-            self._token_limit_exceeded()
-        # Execute custom
-        custom_request = requests.get(
-            url="https://api.github.com/repos/" + self.repo_owner + "/" + self.repo_name + endpoint,
-            headers={
-                "X-GitHub-Api-Version": "2022-11-28",
-                "Authorization": "Bearer " + self.token,
-                "Accept": "application/vnd.github+json"
-            }
-        )
+        for attempt in range(1, self._MAX_SECONDARY_RATE_LIMIT_ATTEMPTS + 1):
+            # Destroys the old client and creates a new one if token count is below self._MIN_TOKEN_COUNT
+            if self.get_remaining_token() <= self._MIN_TOKEN_COUNT:
+                self._token_limit_exceeded()
+            self.pacer.wait()
+            # Execute custom
+            custom_request = requests.get(
+                url="https://api.github.com/repos/" + self.repo_owner + "/" + self.repo_name + endpoint,
+                headers={
+                    "X-GitHub-Api-Version": "2022-11-28",
+                    "Authorization": "Bearer " + self.token,
+                    "Accept": "application/vnd.github+json"
+                }
+            )
+            # Other 403 responses (e.g., missing permissions) are returned immediately
+            if not GitHubRESTWrapper.is_secondary_rate_limit(custom_request):
+                break
+            if attempt == self._MAX_SECONDARY_RATE_LIMIT_ATTEMPTS:
+                self.logger.info(f"{self.repo} Custom request {endpoint} still secondary rate limited after {attempt} "
+                                 f"attempts")
+                break
+            # Secondary rate limit -> pause and retry
+            retry_after = custom_request.headers.get("Retry-After", None)
+            self.pacer.back_off(None if retry_after is None else float(retry_after))
+        if "X-RateLimit-Remaining" in custom_request.headers and "X-RateLimit-Reset" in custom_request.headers:
+            self.pacer.update(
+                int(custom_request.headers["X-RateLimit-Remaining"]),
+                int(custom_request.headers.get("X-RateLimit-Limit", 5000)),
+                datetime.utcfromtimestamp(int(custom_request.headers["X-RateLimit-Reset"]))
+            )
         return custom_request.json()
 
+    @staticmethod
+    def is_secondary_rate_limit(response: requests.Response) -> bool:
+        """
+        Returns True if a response is a secondary rate limit: 403/429 with remaining primary rate limit and either a
+        Retry-After header or a secondary rate limit message
+        """
+        if response.status_code not in [403, 429] or response.headers.get("X-RateLimit-Remaining", None) == "0":
+            return False
+        return "Retry-After" in response.headers or "secondary rate limit" in response.text.lower()
+
+    def _pace(self):
+        """
+        Updates the request pacer after PyGithub received a new response (the remaining points changed) and waits
+        until the next request may start. PyGithub reads the rate limit of every response.
+        """
+        remaining, limit = self.github.rate_limiting
+        if remaining < 0 or remaining == self._last_remaining:
+            return
+        self._last_remaining = remaining
+        reset_at = datetime.utcfromtimestamp(self.github.rate_limiting_resettime)
+        self.token_manager.update_budget(self.token, GITHUB_API_TYPE.REST_API, remaining, limit, reset_at)
+        self.pacer.update(remaining, limit, reset_at)
+        self.pacer.wait()
+
     def get_remaining_token(self):
         """
         Remaining token point for the current token.
@@ -124,6 +174,7 @@ class GitHubRESTWrapper:
         """
         try:
             next_result = next(iterator)
+            self._pace()
             # Destroys the old client and creates a new one if token count is below self._MIN_TOKEN_COUNT
             if self.get_remaining_token() <= self._MIN_TOKEN_COUNT:
                 self._token_limit_exceeded()
@@ -136,14 +187,18 @@ class GitHubRESTWrapper:
 
     def get_user_by_id(self, user_id: int) -> NamedUser:
         try:
-            return self.github.get_user_by_id(user_id)
+            user = self.github.get_user_by_id(user_id)
+            self._pace()
+            return user
         except RateLimitExceededException:
             self._token_limit_exceeded()
             return self.get_user_by_id(user_id)
 
     def get_pull_request(self, request_number: int) -> PullRequest:
         try:
-            return self.client.get_pull(request_number)
+            pull_request = self.client.get_pull(request_number)
+            self._pace()
+            return pull_request
         except RateLimitExceededException:
             self._token_limit_exceeded()
             return self.get_pull_request(request_number)
@@ -157,8 +212,8 @@ class GitHubRESTWrapper:
             except StopIteration:
                 return
 
-    def get_commits(self):
-        commits = self.client.get_commits().__iter__()
+    def get_commits(self, since: Optional[datetime] = None):
+        commits = (self.client.get_commits() if since is None else self.client.get_commits(since=since)).__iter__()
         while True:
             try:
                 yield self._get_next_result(commits)
@@ -173,8 +228,11 @@ class GitHubRESTWrapper:
             except StopIteration:
                 return
 
-    def get_pull_requests(self) -> PullRequest:
-        pull_requests = self.client.get_pulls(state="all").__iter__()
+    def get_pull_requests(self, recently_updated_first: bool = False) -> PullRequest:
+        if recently_updated_first:
+            pull_requests = self.client.get_pulls(state="all", sort="updated", direction="desc").__iter__()
+        else:
+            pull_requests = self.client.get_pulls(state="all").__iter__()
         while True:
             try:
                 yield self._get_next_result(pull_requests)
@@ -239,7 +297,9 @@ class GitHubRESTWrapper:
 
     def get_issue(self, issue_number: int):
         try:
-            return self.client.get_issue(issue_number)
+            issue = self.client.get_issue(issue_number)
+            self._pace()
+            return issue
         except RateLimitExceededException:
             self._token_limit_exceeded()
             return self.get_issue(issue_number)
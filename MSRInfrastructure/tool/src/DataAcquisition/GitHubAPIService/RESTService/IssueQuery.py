@@ -153,6 +153,7 @@ class IssueRoot(RESTRootNode):
                     "body": dict_search(issue._rawData, ["body"], ""),
                     "state": dict_search(issue._rawData, ["state"], "").upper(),
                     "createdAt": dict_search(issue._rawData, ["created_at"], ""),
+                    "updatedAt": dict_search(issue._rawData, ["updated_at"], ""),
                     "milestone": None if issue.milestone is None else {
                         "id": dict_search(issue._rawData, ["milestone", "node_id"], ""),
                         "number": dict_search(issue._rawData, ["milestone", "number"], -1),
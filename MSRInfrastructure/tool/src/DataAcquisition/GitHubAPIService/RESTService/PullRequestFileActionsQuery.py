@@ -1,3 +1,4 @@
+from typing import Optional
 from src.DataAcquisition.GitHubAPIService.RESTService.GitHubRESTWrapper import GitHubRESTWrapper
 from src.Utility.Utility import dict_search
 
@@ -7,15 +8,22 @@ class PullRequestFileActionsRoot:
     Collects pull request file actions with the REST API (EXPENSIVE)
     """
 
-    def __init__(self, github_rest_api: GitHubRESTWrapper):
+    def __init__(self, github_rest_api: GitHubRESTWrapper, since: Optional[str] = None):
+        """
+        :param since: Only collect pull requests updated at or after this time ('YYYY-MM-DDTHH:MM:SSZ')
+        """
         self._github_rest_api = github_rest_api
+        self._since = since
 
     def get_data(self):
         """
         Generator to retrieve all pull request file actions
         :return: dict
         """
-        for pull_request in self._github_rest_api.get_pull_requests():
+        for pull_request in self._github_rest_api.get_pull_requests(recently_updated_first=self._since is not None):
+            # Pull requests are ordered by update time -> All following pull requests are older than since
+            if self._since is not None and dict_search(pull_request._rawData, ["updated_at"], "") < self._since:
+                return
             for file_action in self._github_rest_api.get_repository_pull_request_file_actions(pull_request):
                 yield {
                     "pullRequestId": dict_search(pull_request._rawData, ["node_id"], ""),
@@ -308,6 +308,7 @@ class PullRequestRoot(RESTRootNode):
                     "isDraft": dict_search(pull_request._rawData, ["draft"], False),
                     "locked": dict_search(pull_request._rawData, ["locked"], False),
                     "createdAt": dict_search(pull_request._rawData, ["created_at"], ""),
+                    "updatedAt": dict_search(pull_request._rawData, ["updated_at"], ""),
                     "activeLockReason": dict_search(pull_request._rawData, ["active_lock_reason"], ""),
                     "state": dict_search(pull_request._rawData, ["state"], "").upper(),
                     "baseRepository": {
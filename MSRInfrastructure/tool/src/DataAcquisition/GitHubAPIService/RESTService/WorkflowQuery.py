@@ -1,3 +1,4 @@
+from typing import Optional, Set
 from src.DataAcquisition.GitHubAPIService.RESTService.GitHubRESTWrapper import GitHubRESTWrapper
 from src.Utility.Utility import dict_search
 
@@ -7,8 +8,12 @@ class WorkflowRoot:
     Collects workflows with the REST API
     """
 
-    def __init__(self, github_rest_api: GitHubRESTWrapper):
+    def __init__(self, github_rest_api: GitHubRESTWrapper, known_run_ids: Optional[Set[str]] = None):
+        """
+        :param known_run_ids: Ids of workflow runs that an earlier collection stored (incremental collection)
+        """
         self._github_rest_api = github_rest_api
+        self._known_run_ids = known_run_ids
 
     def get_data(self):
         """
@@ -43,6 +48,16 @@ class WorkflowRoot:
                             "email": "",
                             "name": ""
                         },
-                    } for workflow_run in self._github_rest_api.get_workflow_runs(workflow)
+                    } for workflow_run in self.get_new_workflow_runs(workflow)
                 ]
             }
+
+    def get_new_workflow_runs(self, workflow):
+        """
+        Generator over the workflow runs (newest first) that stops at the first run an earlier collection stored
+        """
+        for workflow_run in self._github_rest_api.get_workflow_runs(workflow):
+            if self._known_run_ids is not None and \
+                    dict_search(workflow_run._rawData, ["node_id"], "") in self._known_run_ids:
+                return
+            yield workflow_run
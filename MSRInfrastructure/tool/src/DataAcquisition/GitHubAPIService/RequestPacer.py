@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from src.DataAcquisition.GitHubAPIService.GitHubAPIType import GITHUB_API_TYPE
+from src.DataAcquisition.GitHubAPIService.TokenManager import TokenManager
+from src.Utility.Logger import MSRLogger
+
+
+class RequestPacer:
+    """
+    RequestPacer spaces the requests of a GitHub API wrapper based on the rate limit of its token instead of fixed
+    sleeps. Requests run at full speed while the token is ahead of an even consumption of its budget (or while other
+    tokens are idle). Otherwise, the remaining budget is spread evenly until the rate limit resets. Secondary rate
+    limit responses pause all requests of the token with an exponential back off.
+    """
+
+    _WINDOW_SECONDS = 3600  # GitHub rate limit window
+    _MAX_INTERVAL = 60.0  # Upper bound of the pause between two requests
+    _SECONDARY_BACK_OFF = 60.0  # First pause after a secondary rate limit response without Retry-After
+    _MAX_SECONDARY_BACK_OFF = 900.0
+
+    def __init__(self, token_manager: TokenManager, api_type: GITHUB_API_TYPE, repo: str, min_token_count: int = 50):
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self.token_manager: TokenManager = token_manager
+        self.api_type: GITHUB_API_TYPE = api_type
+        self.repo: str = repo
+        self.min_token_count: int = min_token_count  # Budget that the wrapper keeps before it rotates the token
+        self._lock = threading.Lock()
+        self._interval: float = 0.0  # Seconds between two requests
+        self._next_request_time: float = 0.0  # Earliest start of the next request (time.monotonic)
+        self._back_offs: int = 0  # Consecutive secondary rate limit responses
+
+    def reset(self):
+        """
+        Resets the pacing for a new token
+        """
+        with self._lock:
+            self._interval = 0.0
+            self._next_request_time = 0.0
+            self._back_offs = 0
+
+    def update(self, remaining: int, limit: int, reset_at: datetime, cost: int = 1):
+        """
+        Updates the pause between requests from the rate limit of the last response
+        :param remaining: remaining points of the token
+        :param limit: points of the token per rate limit window
+        :param reset_at: UTC time of the rate limit reset
+        :param cost: points of the last request (GraphQL query cost)
+        """
+        seconds_until_reset = (reset_at - datetime.utcnow()).total_seconds()
+        usable = remaining - self.min_token_count
+        if limit <= 0 or usable <= 0 or seconds_until_reset <= 0:
+            # The wrapper rotates the token or the budget resets now
+            interval = 0.0
+        elif remaining / limit >= seconds_until_reset / RequestPacer._WINDOW_SECONDS:
+            # Ahead of an even consumption of the budget
+            interval = 0.0
+        elif self.token_manager.get_idle_token_count(self.api_type) > 0:
+            # Using up this token only costs a token rotation
+            interval = 0.0
+        else:
+            interval = min(RequestPacer._MAX_INTERVAL, seconds_until_reset / usable * max(1, cost))
+        with self._lock:
+            self._interval = interval
+            self._back_offs = 0
+
+    def back_off(self, retry_after: Optional[float] = None):
+        """
+        Pauses all requests after a secondary rate limit response
+        :param retry_after: seconds of the Retry-After header or None for an exponential back off
+        """
+        with self._lock:
+            if retry_after is None:
+                retry_after = min(RequestPacer._MAX_SECONDARY_BACK_OFF,
+                                  RequestPacer._SECONDARY_BACK_OFF * 2 ** self._back_offs)
+            self._back_offs += 1
+            self._next_request_time = max(self._next_request_time, time.monotonic() + retry_after)
+        self.logger.info(f"{self.repo} Secondary rate limit of api {self.api_type.value} -> pausing {retry_after} seconds")
+
+    def _reserve(self) -> float:
+        """
+        Reserves the next request slot
+        :return: seconds to wait until the slot starts
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_time)
+            self._next_request_time = start + self._interval
+            return start - now
+
+    def wait(self):
+        """
+        Blocks until the next request may start
+        """
+        waiting_time = self._reserve()
+        if waiting_time > 0:
+            time.sleep(waiting_time)
+
+    async def wait_async(self):
+        """
+        Waits without blocking the event loop until the next request may start
+        """
+        waiting_time = self._reserve()
+        if waiting_time > 0:
+            await asyncio.sleep(waiting_time)
+
+    def get_interval(self) -> float:
+        return self._interval
@@ -1,7 +1,8 @@
-import json
+import heapq
+import itertools
 import threading
-import time
-from typing import Dict, Union, Tuple
+from collections import deque
+from typing import Dict, Union, Optional
 from datetime import datetime
 from src.Utility.Utility import read_config
 from src.DataAcquisition.GitHubAPIService.GitHubAPIType import GITHUB_API_TYPE
@@ -13,8 +14,13 @@ class TokenManager:
     TokenManager orchestrates GitHub tokens in a thread save way. All RepositoryCollector instances use the same
     TokenManager to acquire and return token. If a token expires as it is overused, the TokenManger automatically holds
     the token back until it reset.
+    Waiting collectors are served in FIFO order. Rate limited tokens wait in a heap ordered by their reuse time, so
+    waiting collectors wake up exactly when the first token resets or when another collector returns a token. Of all
+    available tokens, the token with the most remaining budget is handed out first.
     """
 
+    _DEFAULT_BUDGET = 5000  # Budget of a token whose rate limit is unknown or reset
+
     def __init__(self):
         # Initiate logger
         self.logger = MSRLogger.get_logger(self.__class__.__name__)
@@ -24,22 +30,28 @@ class TokenManager:
         if tokens is None:
             self.logger.exception("Configuration file corruption, please define .tokens.")
         # Initialize token storage
-        self.tokens: Dict[GITHUB_API_TYPE, Dict[str, list]] = {
-            GITHUB_API_TYPE.GRAPH_QL_API: {
-                "available": [(token, datetime.min) for token in tokens],
-                "in_use": []
-            },
-            GITHUB_API_TYPE.REST_API: {
-                "available": [(token, datetime.min) for token in tokens],
-                "in_use": []
-            }
+        self._sequence = itertools.count()  # Tiebreaker of equal heap priorities (keeps the insertion order)
+        self.tokens: Dict[GITHUB_API_TYPE, dict] = {
+            api_type: {
+                # Heap of available tokens: (-remaining budget, sequence, token)
+                "available": [(-TokenManager._DEFAULT_BUDGET, next(self._sequence), token) for token in tokens],
+                # Heap of rate limited tokens: (reuse time, sequence, token)
+                "resetting": [],
+                "in_use": set(),
+                # Token -> (remaining budget, limit, reset time) of the last response
+                "budgets": {},
+                # Tickets of the waiting collectors in arrival order
+                "waiting": deque()
+            } for api_type in [GITHUB_API_TYPE.GRAPH_QL_API, GITHUB_API_TYPE.REST_API]
         }
+        for api_type in self.tokens.keys():
+            heapq.heapify(self.tokens[api_type]["available"])
         # Initialize locks
-        self.acquire_token_lock = {
-            GITHUB_API_TYPE.GRAPH_QL_API: threading.Lock(),
-            GITHUB_API_TYPE.REST_API: threading.Lock()
-        }
         self.modify_tokens_lock = threading.Lock()
+        self.token_changed = {
+            GITHUB_API_TYPE.GRAPH_QL_API: threading.Condition(self.modify_tokens_lock),
+            GITHUB_API_TYPE.REST_API: threading.Condition(self.modify_tokens_lock)
+        }
         # Terminates the program if no token is set
         self.token_list_empty = True if len(tokens) <= 0 else False
         if self.token_list_empty:
@@ -47,31 +59,98 @@ class TokenManager:
 
     def get_token(self, api_type: GITHUB_API_TYPE) -> str:
         """
-        Acquire a GitHub token for a specific API_TYPE
+        Acquire a GitHub token for a specific API_TYPE. Blocks until a token is available and all collectors that
+        waited before received a token.
         """
         self.logger.info(f"Trying to acquire token for api {api_type.value}")
-        while self.acquire_token_lock.get(api_type):
-            while (token := self._get_available_token(api_type)) is None:
-                if token is None:
-                    self.logger.info(f"Waiting 10 seconds before retrying to acquire token of type {api_type.value}")
-                    time.sleep(10)
-            else:
-                self.logger.info(f"Successfully acquired new token: {token[0]} of type {api_type.value}")
-                return token[0]
+        token_storage = self.tokens.get(api_type)
+        token_changed = self.token_changed.get(api_type)
+        ticket = object()
+        with token_changed:
+            token_storage["waiting"].append(ticket)
+            try:
+                while True:
+                    self._release_reset_tokens(api_type)
+                    if token_storage["waiting"][0] is ticket and len(token_storage["available"]) > 0:
+                        _, _, token = heapq.heappop(token_storage["available"])
+                        token_storage["in_use"].add(token)
+                        break
+                    timeout = self._get_seconds_until_reset(api_type)
+                    if token_storage["waiting"][0] is ticket:
+                        waiting_time = "until a token returns" if timeout is None else f"{timeout:.0f} seconds"
+                        self.logger.info(f"Waiting {waiting_time} to acquire token of type {api_type.value}")
+                    token_changed.wait(timeout)
+            finally:
+                token_storage["waiting"].remove(ticket)
+                # The next collector in line checks the remaining tokens
+                token_changed.notify_all()
+        self.logger.info(f"Successfully acquired new token: {token} of type {api_type.value}")
+        return token
+
+    def _release_reset_tokens(self, api_type: GITHUB_API_TYPE):
+        """
+        Moves all tokens whose reuse time passed from the resetting heap to the available heap (requires the lock)
+        """
+        token_storage = self.tokens.get(api_type)
+        now = datetime.utcnow()
+        while len(token_storage["resetting"]) > 0 and token_storage["resetting"][0][0] <= now:
+            _, _, token = heapq.heappop(token_storage["resetting"])
+            self._make_available(api_type, token)
+
+    def _make_available(self, api_type: GITHUB_API_TYPE, token: str):
+        """
+        Adds a token to the available heap with its current budget (requires the lock)
+        """
+        heapq.heappush(self.tokens.get(api_type)["available"],
+                       (-self._get_budget(api_type, token), next(self._sequence), token))
+
+    def _get_budget(self, api_type: GITHUB_API_TYPE, token: str) -> int:
+        """
+        Returns the remaining budget of a token. Budgets of passed rate limit windows are reset.
+        """
+        remaining, limit, reset_at = self.tokens.get(api_type)["budgets"].get(
+            token, (TokenManager._DEFAULT_BUDGET, TokenManager._DEFAULT_BUDGET, None))
+        if reset_at is None or reset_at <= datetime.utcnow():
+            return limit
+        return remaining
+
+    def _get_seconds_until_reset(self, api_type: GITHUB_API_TYPE) -> Optional[float]:
+        """
+        Returns the seconds until the next rate limited token resets or None if no token is rate limited
+        """
+        resetting = self.tokens.get(api_type)["resetting"]
+        if len(resetting) == 0:
+            return None
+        return max(0.0, (resetting[0][0] - datetime.utcnow()).total_seconds())
 
-    def _get_available_token(self, api_type: GITHUB_API_TYPE) -> Union[Tuple[str, datetime], None]:
+    def update_budget(self, token: str, api_type: GITHUB_API_TYPE, remaining: int, limit: int,
+                      reset_at: Union[datetime, str]):
+        """
+        Records the rate limit of the last response of a token
+        :param remaining: remaining points of the token
+        :param limit: points of the token per rate limit window
+        :param reset_at: UTC time of the rate limit reset
+        """
+        if isinstance(reset_at, str):
+            reset_at = datetime.strptime(reset_at, "%Y-%m-%dT%H:%M:%SZ")
         with self.modify_tokens_lock:
-            final_token = None
-            for token in self.tokens.get(api_type).get("available"):
-                if token[1] < datetime.utcnow():
-                    final_token = token
-                    break
-            if final_token is None:
-                return None
-            else:
-                self.tokens.get(api_type).get("available").remove(final_token)
-                self.tokens.get(api_type).get("in_use").append(final_token[0])
-                return final_token
+            self.tokens.get(api_type)["budgets"][token] = (remaining, limit, reset_at)
+
+    def get_token_count(self, api_type: GITHUB_API_TYPE) -> int:
+        """
+        Returns the number of all tokens of a specific API_TYPE
+        """
+        with self.modify_tokens_lock:
+            token_storage = self.tokens.get(api_type)
+            return len(token_storage["available"]) + len(token_storage["resetting"]) + len(token_storage["in_use"])
+
+    def get_idle_token_count(self, api_type: GITHUB_API_TYPE) -> int:
+        """
+        Returns the number of tokens of a specific API_TYPE that are not in use and not rate limited
+        """
+        with self.modify_tokens_lock:
+            self._release_reset_tokens(api_type)
+            return len(self.tokens.get(api_type)["available"])
 
     def return_token(self, return_token: str, api_type: GITHUB_API_TYPE, reuse_time: Union[datetime, str] = None):
         """
@@ -81,14 +160,17 @@ class TokenManager:
         # Convert str to datetime if necessary
         if isinstance(reuse_time, str):
             reuse_time = datetime.strptime(reuse_time, "%Y-%m-%dT%H:%M:%SZ")
-        # Remove the token from in_use list and add it to available
-        with self.modify_tokens_lock:
-            if return_token not in self.tokens.get(api_type).get("in_use"):
+        token_storage = self.tokens.get(api_type)
+        # Remove the token from in_use and add it to available or resetting
+        with self.token_changed.get(api_type):
+            if return_token not in token_storage["in_use"]:
                 self.logger.exception("Invalid token return, token does not exist")
-            self.tokens.get(api_type).get("in_use").remove(return_token)
-            if reuse_time is None:
-                self.tokens.get(api_type).get("available").append((return_token, datetime.utcnow()))
+            token_storage["in_use"].discard(return_token)
+            if reuse_time is None or reuse_time <= datetime.utcnow():
+                self._make_available(api_type, return_token)
                 self.logger.info(f"Successfully returned token with immediate reuse time {datetime.utcnow()}")
             else:
-                self.tokens.get(api_type).get("available").append((return_token, reuse_time))
+                heapq.heappush(token_storage["resetting"], (reuse_time, next(self._sequence), return_token))
                 self.logger.info(f"Successfully returned token with reuse time {reuse_time}")
+            # Wake up the waiting collectors (the first in line takes the token)
+            self.token_changed.get(api_type).notify_all()
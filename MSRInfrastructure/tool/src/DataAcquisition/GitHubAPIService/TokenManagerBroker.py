@@ -0,0 +1,21 @@
+from multiprocessing import get_context
+from multiprocessing.managers import BaseManager
+from src.DataAcquisition.GitHubAPIService.TokenManager import TokenManager
+
+
+class TokenManagerBroker(BaseManager):
+    """
+    TokenManagerBroker runs the TokenManager in a separate manager process, so all collection worker processes share
+    one global token accounting. The TokenManager proxy offers the public methods of the TokenManager and can be
+    passed to worker processes. The manager process serves every connection (one per process and thread) in its own
+    thread, so a blocking get_token of one collector does not block the others.
+    """
+
+    def __init__(self):
+        # Spawned processes do not inherit the locks and threads of the parent process
+        super().__init__(ctx=get_context("spawn"))
+
+
+TokenManagerBroker.register("TokenManager", TokenManager, exposed=[
+    "get_token", "return_token", "update_budget", "get_token_count", "get_idle_token_count"
+])
@@ -1,11 +1,18 @@
 from enum import Enum
+from datetime import datetime
+from typing import Optional, Dict
 
 from src.DataAcquisition.GitHubAPIService.GraphQLService import GitHubGraphQLWrapper
 from src.DataAcquisition.GitHubAPIService.RESTService.GitHubRESTWrapper import GitHubRESTWrapper
 
 from src.DataAcquisition.GitHubAPIService.GraphQLService.GraphQLQueryTree import GraphQLRootNode
+from src.DataAcquisition.GitHubAPIService.GraphQLService.AdaptivePageSize import AdaptivePageSize
+from src.DataAcquisition.GitHubAPIService.GraphQLService.GitHubAsyncGraphQLEngine import GitHubAsyncGraphQLEngine
 from src.DataAcquisition.GitHubAPIService.GraphQLService.ProjectQuery import ProjectRoot
+from src.DataAcquisition.GitHubAPIService.GraphQLService.RepositorySizeQuery import RepositorySizeRoot
 from src.DataAcquisition.GitHubAPIService.GraphQLService.DiscussionQuery import DiscussionRoot
+from src.DataAcquisition.GitHubAPIService.GraphQLService.FollowUpQuery import FollowUpRoot, IssueFollowUpRoot, \
+    PullRequestFollowUpRoot
 
 from src.DataAcquisition.GitHubAPIService.RESTService.PullRequestQuery import PullRequestRoot
 from src.DataAcquisition.GitHubAPIService.RESTService.IssueQuery import IssueRoot
@@ -37,8 +44,20 @@ class GraphQLCollector:
 
     def __init__(self, graphql_client: GitHubGraphQLWrapper):
         self.graphql_client = graphql_client
+        self._root_node_state: Optional[dict] = None  # Cursor state after the last result of get()
+        # Adjusts the page sizes of get() and get_concurrent() queries, None -> default page sizes
+        self._adaptive_page_size: Optional[AdaptivePageSize] = AdaptivePageSize.from_config()
 
-    def get(self, secondary_root_nodes: [DATA_TREE], exceptions: [DATA_TREE]):
+    def get_root_node_state(self) -> Optional[dict]:
+        """
+        Returns the cursor state after the last query result of get(). Passing it as resume_state to get() continues
+        the collection with the next page.
+        :return: dict
+        """
+        return self._root_node_state
+
+    def get(self, secondary_root_nodes: [DATA_TREE], exceptions: [DATA_TREE], resume_state: Optional[dict] = None,
+            since: Optional[dict] = None):
         """
         Generator to collect different types of nodes with the GraphQL API. Node cursors automatically advance in
         the first layer by parsing the query result before returning it.
@@ -46,13 +65,20 @@ class GraphQLCollector:
         :param exceptions: List of node names that will not prevent the query from terminating. After collecting
         all other nodes the query will stop.
         :param secondary_root_nodes: List of node names that the query requests. (Exceptions must be contained)
+        :param resume_state: Cursor state of a previous get() call (see get_root_node_state)
+        :param since: Optional lower bounds of the update time per node (e.g., {DATA_TREE.ISSUE: '2024-01-01T00:00:00Z'})
         :return: (query_result: dict, partially_collected_nodes: dict)
         """
         # Construct the root node
         root_node = GraphQLRootNode(
             [secondary_root_node.value for secondary_root_node in secondary_root_nodes],
-            [exception.value for exception in exceptions]
+            [exception.value for exception in exceptions],
+            None if since is None else {node.value: value for node, value in since.items()}
         )
+        if resume_state is not None:
+            root_node.set_state(resume_state)
+        if self._adaptive_page_size is not None:
+            root_node.enable_adaptive_page_size(self._adaptive_page_size)
         # Loop over query results
         while True:
             query, is_query_finished = root_node.get_query_content()
@@ -60,12 +86,52 @@ class GraphQLCollector:
             if is_query_finished:
                 return
             # Execute the query
-            query_result = self.graphql_client.execute(query)
+            if self._adaptive_page_size is None:
+                query_result = self.graphql_client.execute(query)
+            else:
+                try:
+                    query_result = self.graphql_client.execute(query, retry_timeouts=False)
+                except Exception as e:
+                    if not self.graphql_client.is_timeout(e):
+                        raise
+                    # Retry with smaller pages or with the same pages if they are already at the lower bound
+                    if root_node.record_timeout():
+                        continue
+                    query_result = self.graphql_client.execute(query)
+                root_node.record_query(self.graphql_client.get_last_query_seconds(), query_result)
             # Parse the result into the query builder to update cursors
             partially_collected_nodes = root_node.parse_result(query_result)
+            self._root_node_state = root_node.get_state()
             # Return the query results and the nodes that are only partially collected
             yield query_result, partially_collected_nodes
 
+    def get_concurrent(self, streams: Dict[str, dict], max_in_flight: int = 4):
+        """
+        Generator that collects multiple independent node types at the same time with the async GraphQL engine. Every
+        stream pages its own cursors like get(). Results of different streams interleave, pages of one stream keep
+        their order. After the last page of a stream, the stream is returned once more with query_result None.
+        :param streams: stream name -> {"nodes": [DATA_TREE], "exceptions": [DATA_TREE] (optional),
+        "resume_state": dict (optional), "since": dict (optional)} (see get())
+        :param max_in_flight: Maximum number of queries that run at the same time
+        :return: (stream_name: str, query_result: dict | None, partially_collected_nodes: dict, cursor_state: dict)
+        """
+        root_nodes = {}
+        for stream_name, stream in streams.items():
+            since = stream.get("since", None)
+            root_node = GraphQLRootNode(
+                [secondary_root_node.value for secondary_root_node in stream["nodes"]],
+                [exception.value for exception in stream.get("exceptions", [])],
+                None if since is None else {node.value: value for node, value in since.items()}
+            )
+            if stream.get("resume_state", None) is not None:
+                root_node.set_state(stream["resume_state"])
+            if self._adaptive_page_size is not None:
+                root_node.enable_adaptive_page_size(self._adaptive_page_size)
+            root_nodes[stream_name] = root_node
+        engine = GitHubAsyncGraphQLEngine(self.graphql_client, max_in_flight, self._adaptive_page_size is not None)
+        for stream_name, query_result, partially_collected_nodes, cursor_state in engine.run(root_nodes):
+            yield stream_name, query_result, partially_collected_nodes, cursor_state
+
     def get_discussion(self, number: int):
         """
         Generator to get all discussion comments for a specific discussion number.
@@ -86,6 +152,36 @@ class GraphQLCollector:
             root_node.parse_result(query_result)
             yield query_result
 
+    def get_issues(self, node_numbers: [int]):
+        """
+        Generator to collect multiple partially collected issues with batched follow-up queries
+        :param node_numbers: a list of node numbers (max. IssueFollowUpRoot.BATCH_SIZE)
+        :return: Each iteration a dictionary of complete issues ({"nodes": [...]})
+        """
+        for query_result in self._get_follow_up(IssueFollowUpRoot(node_numbers)):
+            yield query_result
+
+    def get_pull_requests(self, node_numbers: [int]):
+        """
+        Generator to collect multiple partially collected pull requests with batched follow-up queries
+        :param node_numbers: a list of node numbers (max. PullRequestFollowUpRoot.BATCH_SIZE)
+        :return: Each iteration a dictionary of complete pull requests ({"nodes": [...]})
+        """
+        for query_result in self._get_follow_up(PullRequestFollowUpRoot(node_numbers)):
+            yield query_result
+
+    def _get_follow_up(self, root_node: FollowUpRoot):
+        """
+        Executes the follow-up queries of a batch until all of its nodes are complete
+        """
+        while True:
+            query, root_query, is_query_finished = root_node.get_query_content()
+            if is_query_finished:
+                return
+            complete_nodes = root_node.parse_result(self.graphql_client.execute(query, root_query))
+            if len(complete_nodes) > 0:
+                yield {"nodes": complete_nodes}
+
     def get_remaining_token(self):
         """
         Get the amount of remaining token points for the currently used token. (GraphQL)
@@ -101,6 +197,13 @@ class GraphQLCollector:
         project_query = ProjectRoot().get_query_content()
         return self.graphql_client.execute(project_query)
 
+    def get_repository_size(self):
+        """
+        Retrieves the totalCounts and disk usage of the repository (pre-flight sizing).
+        :return: query_result: dict
+        """
+        return self.graphql_client.execute_once(RepositorySizeRoot().get_query_content())
+
 
 class RESTCollector:
     """
@@ -131,12 +234,13 @@ class RESTCollector:
             root_node = PullRequestRoot(self.rest_client, node_number)
             yield root_node.get_data()
 
-    def get_workflows(self):
+    def get_workflows(self, known_run_ids: Optional[set] = None):
         """
         Generator to collect all workflows and workflow runs with the REST API
+        :param known_run_ids: Ids of workflow runs that are not collected again (incremental collection)
         :return: Each iteration a dictionary
         """
-        for workflow in WorkflowRoot(self.rest_client).get_data():
+        for workflow in WorkflowRoot(self.rest_client, known_run_ids).get_data():
             yield workflow
 
     def get_sbom(self) -> []:
@@ -153,17 +257,19 @@ class RESTCollector:
         """
         return self.rest_client.get_remaining_token()
 
-    def get_commits(self):
+    def get_commits(self, since: Optional[datetime] = None):
         """
         Generator to get commit meta information. (author/committer/commit comments)
+        :param since: Only collect commits after this time (incremental collection)
         """
-        for commit in CommitsRoot(self.rest_client).get_data():
+        for commit in CommitsRoot(self.rest_client, since).get_data():
             yield commit
 
-    def get_repository_pull_request_file_actions(self):
+    def get_repository_pull_request_file_actions(self, since: Optional[str] = None):
         """
         Generator for all file actions of GitHub pull requests
+        :param since: Only collect pull requests updated at or after this time (incremental collection)
         :return: Each iteration a single file actions as a dictionary
         """
-        for pull_request_file_action in PullRequestFileActionsRoot(self.rest_client).get_data():
+        for pull_request_file_action in PullRequestFileActionsRoot(self.rest_client, since).get_data():
             yield pull_request_file_action
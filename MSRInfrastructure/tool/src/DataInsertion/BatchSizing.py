@@ -0,0 +1,98 @@
+import math
+import threading
+from typing import Dict, Optional
+
+from src.Utility.Logger import MSRLogger
+from src.Utility.Utility import read_config
+
+
+class AdaptiveBatchSizer:
+    """
+    AdaptiveBatchSizer chooses the number of rows per insertion transaction for every node and relationship type.
+    The first batch size of a type follows from its average row width (TARGET_TRANSACTION_BYTES per transaction).
+    Afterward, every observed transaction latency moves the batch size towards TARGET_TRANSACTION_SECONDS. Learned
+    sizes are shared by all RepositoryInsertion instances of the process. Sizes pinned in the configuration
+    (insertion_batch_sizes) are never tuned.
+    """
+
+    # Default batch size if the row width of a type is unknown
+    DEFAULT_BATCH_SIZE = 300
+    MIN_BATCH_SIZE = 50
+    MAX_BATCH_SIZE = 20000
+    # Targets of a single transaction
+    TARGET_TRANSACTION_BYTES = 2 * 1024 * 1024
+    TARGET_TRANSACTION_SECONDS = 1.0
+    # Maximum factor a batch size changes after a single observation
+    MAX_ADJUSTMENT = 2.0
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, pinned_batch_sizes: Optional[Dict[str, int]] = None):
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.pinned_batch_sizes: Dict[str, int] = pinned_batch_sizes if pinned_batch_sizes is not None else {}
+        self.learned_batch_sizes: Dict[str, int] = {}
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the process wide AdaptiveBatchSizer and creates it with the pinned sizes of the configuration
+        """
+        with AdaptiveBatchSizer._instance_lock:
+            if AdaptiveBatchSizer._instance is None:
+                AdaptiveBatchSizer._instance = AdaptiveBatchSizer(read_config().get("insertion_batch_sizes", {}))
+            return AdaptiveBatchSizer._instance
+
+    def get_batch_size(self, type_name: str, rows: Optional[int] = None, file_bytes: int = 0) -> int:
+        """
+        Returns the batch size for the next transactions of a type
+        :param type_name: node or relationship type value (e.g., CONTAINS_COMMIT)
+        :param rows: number of rows that will be inserted or None if unknown
+        :param file_bytes: staged bytes of these rows
+        :return: int
+        """
+        with self.lock:
+            if type_name in self.pinned_batch_sizes:
+                return self.pinned_batch_sizes[type_name]
+            if type_name in self.learned_batch_sizes:
+                return self.learned_batch_sizes[type_name]
+        if rows is None or rows <= 0 or file_bytes <= 0:
+            return AdaptiveBatchSizer.DEFAULT_BATCH_SIZE
+        row_width = file_bytes / rows
+        return self._clamp(AdaptiveBatchSizer.TARGET_TRANSACTION_BYTES / row_width)
+
+    def report(self, type_name: str, rows: int, batch_size: int, seconds: float):
+        """
+        Learns from the observed duration of inserting rows with a batch size
+        :param type_name: node or relationship type value
+        :param rows: number of inserted rows
+        :param batch_size: rows per transaction
+        :param seconds: duration of the insertion
+        """
+        if rows <= 0 or seconds <= 0:
+            return
+        transactions = math.ceil(rows / batch_size)
+        transaction_seconds = seconds / transactions
+        adjustment = AdaptiveBatchSizer.TARGET_TRANSACTION_SECONDS / transaction_seconds
+        adjustment = min(max(adjustment, 1 / AdaptiveBatchSizer.MAX_ADJUSTMENT), AdaptiveBatchSizer.MAX_ADJUSTMENT)
+        # Partial batches do not tell anything about larger batches
+        if rows < batch_size:
+            adjustment = min(adjustment, 1.0)
+        with self.lock:
+            if type_name in self.pinned_batch_sizes:
+                return
+            self.learned_batch_sizes[type_name] = self._clamp(batch_size * adjustment)
+
+    def log_summary(self, repo: str, type_name: str, rows: int, batch_size: int, seconds: float):
+        """
+        Logs rows/sec and the chosen batch size of a type, so good values can be pinned in config.json
+        """
+        rows_per_second = rows / seconds if seconds > 0 else 0.0
+        self.logger.info(f"{repo} Inserted {type_name}: {rows} rows, batch size {batch_size}, "
+                         f"{rows_per_second:.1f} rows/sec, next batch size "
+                         f"{self.get_batch_size(type_name)}")
+
+    @staticmethod
+    def _clamp(batch_size: float) -> int:
+        return int(min(max(batch_size, AdaptiveBatchSizer.MIN_BATCH_SIZE), AdaptiveBatchSizer.MAX_BATCH_SIZE))
@@ -0,0 +1,113 @@
+import time
+from typing import Optional, Iterator, List, Union
+
+from src.DataInsertion.RepositoryInsertion import RepositoryInsertion
+from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+from src.DataProcessing.NodeType import NODE_TYPE
+from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
+
+
+class BoltRepositoryInsertion(RepositoryInsertion):
+    """
+    BoltRepositoryInsertion streams the rows of the repository CSV files from the preprocessor storage to the database
+    as parameterized 'UNWIND $rows' batches. Values are converted in Python with the DATA_TYPE maps of each node and
+    relationship type. Neo4J does not need access to the CSV files, and it caches one query plan per type as the query
+    text never changes. The batch size adapts after every batch to the observed transaction latency.
+    """
+
+    def insert_node_type(self, node_type: DBNode, segment: Optional[int] = None):
+        """
+        Inserts all nodes of a single node type in parameterized batches
+        :param node_type: placeholder node of the node type
+        :param segment: segment number of a sealed segment or None to insert the current file
+        """
+        node_name = node_type.get_node_name()
+        properties = node_type.get_cypher_parameter_properties()
+        key_name = node_type.get_key_name()
+        if node_type.can_merge():
+            # Merge on the unique key only, the first collected properties of a node win
+            operation = f"MERGE (n:{node_name} {{{key_name}: row.{key_name}}}) ON CREATE SET n += {{{properties}}}"
+        elif self.incremental:
+            # Nodes of a previous collection are updated (e.g., the state of an issue)
+            operation = f"MERGE (n:{node_name} {{{key_name}: row.{key_name}}}) SET n += {{{properties}}}"
+        else:
+            operation = f"CREATE (:{node_name} {{{properties}}})"
+        query = f"""
+        UNWIND $rows AS row
+        {operation}
+        """
+        rows = self.repo.get_preprocessor_storage().read_rows(node_type.get_node_type(), segment)
+        self.run_batches(query, (node_type.get_parameter_row(row) for row in rows), node_type.get_node_type(), segment)
+
+    def insert_relationship_type(self, relationship_type: DBRelationship, segment: Optional[int] = None):
+        """
+        Inserts all relationships of a single relationship type in parameterized batches
+        :param relationship_type: placeholder relationship of the relationship type
+        :param segment: segment number of a sealed segment or None to insert the current file
+        """
+        source_node_name = relationship_type.get_source_node().get_node_name()
+        source_node_key = relationship_type.get_source_node().get_key_name()
+        destination_node_name = relationship_type.get_destination_node().get_node_name()
+        destination_node_key = relationship_type.get_destination_node().get_key_name()
+        relationship_name = relationship_type.get_cypher_relationship_name()
+        properties = f" {{{relationship_type.get_cypher_parameter_properties()}}}" \
+            if relationship_type.has_properties() else ""
+        # Relationships of a previous collection are matched instead of duplicated
+        operator = "MERGE" if self.incremental else "CREATE"
+        if self.incremental and relationship_type.get_relationship_type() in RepositoryInsertion.REPLACED_RELATIONSHIP_TYPES:
+            rows = self.repo.get_preprocessor_storage().read_rows(relationship_type.get_relationship_type(), segment)
+            self.run_batches(f"""
+            UNWIND $rows AS row
+            MATCH (:{source_node_name} {{{source_node_key}: row.source_id}})-[r:{relationship_name}]->()
+            DELETE r
+            """, (relationship_type.get_parameter_row(row) for row in rows), relationship_type.get_relationship_type(),
+                segment)
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (s:{source_node_name} {{{source_node_key}: row.source_id}})
+        MATCH (d:{destination_node_name} {{{destination_node_key}: row.destination_id}})
+        {operator} (s)-[:{relationship_name}{properties}]->(d)
+        """
+        rows = self.repo.get_preprocessor_storage().read_rows(relationship_type.get_relationship_type(), segment)
+        self.run_batches(query, (relationship_type.get_parameter_row(row) for row in rows),
+                         relationship_type.get_relationship_type(), segment)
+
+    def run_batches(self, query: str, rows: Iterator[dict], file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE],
+                    segment: Optional[int] = None):
+        """
+        Executes a parameterized query once per batch of rows. Every batch reports its latency to the batch sizer
+        which determines the size of the next batch.
+        :param query: Cypher query that reads the batch from the $rows parameter
+        :param rows: typed parameter rows
+        :param file_type: node or relationship type of the rows
+        :param segment: segment number of a sealed segment or None for the current file
+        """
+        _, batch_size = self.choose_batch_size(file_type, segment)
+        first_batch_size = batch_size
+        inserted_rows = 0
+        start_time = time.perf_counter()
+        batch: List[dict] = []
+        with self.db.session() as session:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    batch_size = self._run_batch(session, query, batch, batch_size, file_type)
+                    inserted_rows += len(batch)
+                    batch = []
+            if len(batch) > 0:
+                self._run_batch(session, query, batch, batch_size, file_type)
+                inserted_rows += len(batch)
+        if inserted_rows > 0:
+            self.batch_sizer.log_summary(f"{self.repo_owner}/{self.repo_name}", file_type.value, inserted_rows,
+                                         first_batch_size, time.perf_counter() - start_time)
+
+    def _run_batch(self, session, query: str, batch: List[dict], batch_size: int,
+                   file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]) -> int:
+        """
+        Executes a single batch and returns the batch size for the next batch
+        """
+        start_time = time.perf_counter()
+        session.run(query, rows=batch).consume()
+        self.batch_sizer.report(file_type.value, len(batch), batch_size, time.perf_counter() - start_time)
+        return self.batch_sizer.get_batch_size(file_type.value)
@@ -0,0 +1,225 @@
+import csv
+import gzip
+import hashlib
+import os
+import stat
+import threading
+from datetime import datetime
+from typing import Dict, Set, List
+
+import src.RepositoryCollector as RepositoryCollector
+from src.Utility.Logger import MSRLogger
+from src.Utility.Utility import read_config
+from src.DatabaseObjects.DataTypes import DATA_TYPE
+from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+from src.DataInsertion.RepositoryInsertion import RepositoryInsertion
+
+
+class BulkImportBundle:
+    """
+    BulkImportBundle converts the CSV files of collected repositories into a neo4j-admin import bundle instead of
+    inserting them with transactions. Every node label has one global id space, so relationships of all repositories
+    resolve against the same nodes. Mergeable nodes (e.g., User, File, Topic) are written only once per process. The
+    bundle contains one header file per node/relationship type, one data file per repository and type, and the
+    script import.sh that runs the offline import into an empty database.
+    """
+
+    # neo4j-admin column types of every DATA_TYPE
+    COLUMN_TYPES = {
+        DATA_TYPE.STRING: "string",
+        DATA_TYPE.INTEGER: "long",
+        DATA_TYPE.FLOAT: "double",
+        DATA_TYPE.BOOLEAN: "boolean",
+        DATA_TYPE.DATETIME: "datetime"
+    }
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, deploy: bool = False, compression: str = "none"):
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self.location = "/repo_share/bulk_import/" if deploy else "./MSRInfrastructure/dev_data/bulk_import/"
+        self.compression = compression
+        self.lock = threading.Lock()
+        # Digests of the keys of all mergeable nodes in the bundle per node type
+        self.merged_node_keys: Dict[str, Set[bytes]] = {}
+        os.makedirs(self.location + "headers/", exist_ok=True)
+        os.makedirs(self.location + "data/", exist_ok=True)
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the process wide BulkImportBundle and creates it with the configuration
+        """
+        with BulkImportBundle._instance_lock:
+            if BulkImportBundle._instance is None:
+                config = read_config()
+                BulkImportBundle._instance = BulkImportBundle(
+                    config.get("deploy", False),
+                    config.get("csv_compression", "none")
+                )
+            return BulkImportBundle._instance
+
+    def add_repository(self, repo: RepositoryCollector):
+        """
+        Adds all node and relationship CSV files of a collected repository to the bundle
+        :param repo: RepositoryCollector with closed CSV files
+        """
+        repository = f"{repo.get_repo_owner()}__{repo.get_repo_name()}"
+        self.logger.info(f"{repo.get_repo_owner()}/{repo.get_repo_name()} Adding repository to bulk import bundle")
+        storage = repo.get_preprocessor_storage()
+        for node_type in RepositoryInsertion.initialize_placeholder_nodes():
+            rows = (self._get_node_row(node_type, row) for row in storage.read_rows(node_type.get_node_type()))
+            if node_type.can_merge():
+                rows = self._skip_merged_nodes(node_type, rows)
+            self._write_data_file(node_type.get_node_type().value, repository, rows,
+                                  self._get_node_header(node_type))
+        for relationship_type in RepositoryInsertion.initialize_placeholder_relationships():
+            rows = (self._get_relationship_row(relationship_type, row)
+                    for row in storage.read_rows(relationship_type.get_relationship_type()))
+            self._write_data_file(relationship_type.get_relationship_type().value, repository, rows,
+                                  self._get_relationship_header(relationship_type))
+        self._write_import_script()
+
+    def _skip_merged_nodes(self, node_type: DBNode, rows):
+        """
+        Filters the rows of a mergeable node type that an earlier repository already added to the bundle
+        """
+        key_index = list(node_type.get_data().keys()).index(node_type.get_key_name())
+        type_name = node_type.get_node_type().value
+        for row in rows:
+            digest = hashlib.blake2b(str(row[key_index]).encode(), digest_size=16).digest()
+            with self.lock:
+                keys = self.merged_node_keys.setdefault(type_name, set())
+                if digest in keys:
+                    continue
+                keys.add(digest)
+            yield row
+
+    def _write_data_file(self, type_name: str, repository: str, rows, header: List[str]):
+        """
+        Writes the rows of a type into the data file of the repository and the header file on first use. Empty
+        types produce no files.
+        """
+        directory = self.location + "data/" + type_name + "/"
+        file_name = directory + repository + (".csv.gz" if self.compression == "gzip" else ".csv")
+        f = None
+        for row in rows:
+            if f is None:
+                os.makedirs(directory, exist_ok=True)
+                if self.compression == "gzip":
+                    f = gzip.open(file_name, "wt", encoding="UTF-8", newline="", compresslevel=3)
+                else:
+                    f = open(file_name, "w", encoding="UTF-8", newline="")
+            f.write(BulkImportBundle._format_row(row))
+        if f is None:
+            return
+        f.close()
+        header_file_name = self.location + "headers/" + type_name + ".csv"
+        with self.lock:
+            if not os.path.isfile(header_file_name):
+                with open(header_file_name, "w", encoding="UTF-8", newline="") as header_file:
+                    csv.writer(header_file, delimiter=",", quotechar='"').writerow(header)
+
+    def _write_import_script(self):
+        """
+        (Re)writes import.sh with one file group per type that has a header. Data files are matched with regular
+        expressions, so the command line stays short for hundreds of repositories.
+        """
+        arguments = []
+        with self.lock:
+            for node_type in RepositoryInsertion.initialize_placeholder_nodes():
+                type_name = node_type.get_node_type().value
+                if os.path.isfile(self.location + "headers/" + type_name + ".csv"):
+                    arguments.append(f"--nodes={node_type.get_node_name()}="
+                                     f"\"headers/{type_name}.csv,data/{type_name}/.*\"")
+            for relationship_type in RepositoryInsertion.initialize_placeholder_relationships():
+                type_name = relationship_type.get_relationship_type().value
+                if os.path.isfile(self.location + "headers/" + type_name + ".csv"):
+                    arguments.append(f"--relationships={relationship_type.get_cypher_relationship_name()}="
+                                     f"\"headers/{type_name}.csv,data/{type_name}/.*\"")
+            script = "\n".join([
+                "#!/bin/sh",
+                "# Offline import of all collected repositories into an empty (stopped) database.",
+                "# Usage: ./import.sh [database name (DEFAULT: neo4j)]",
+                "# Indexes and constraints are created by the first transactional insertion afterward.",
+                f"# Generated {datetime.now().isoformat(timespec='seconds')}",
+                "cd \"$(dirname \"$0\")\" || exit 1",
+                "neo4j-admin database import full \"${1:-neo4j}\" \\",
+                "    --overwrite-destination=true \\",
+                "    --skip-duplicate-nodes=true \\",
+                "    --skip-bad-relationships=true \\",
+                "    --multiline-fields=true \\",
+                " \\\n".join(["    " + argument for argument in arguments]),
+                ""
+            ])
+            script_file_name = self.location + "import.sh"
+            with open(script_file_name, "w", encoding="UTF-8") as script_file:
+                script_file.write(script)
+            os.chmod(script_file_name, os.stat(script_file_name).st_mode | stat.S_IXUSR | stat.S_IXGRP)
+
+    @staticmethod
+    def _get_node_header(node_type: DBNode) -> List[str]:
+        """
+        Header of a node type, e.g., ['id:ID(Issue)', 'number:long', 'title:string', ...]
+        """
+        header = []
+        for key in node_type.get_data().keys():
+            if key == node_type.get_key_name():
+                header.append(f"{key}:ID({node_type.get_node_name()})")
+            else:
+                header.append(f"{key}:{BulkImportBundle.COLUMN_TYPES[node_type.get_cypher_property_type()[key]]}")
+        return header
+
+    @staticmethod
+    def _get_relationship_header(relationship_type: DBRelationship) -> List[str]:
+        """
+        Header of a relationship type, e.g., [':START_ID(User)', ':END_ID(Issue)', 'createdAt:datetime']
+        """
+        header = [
+            f":START_ID({relationship_type.get_source_node().get_node_name()})",
+            f":END_ID({relationship_type.get_destination_node().get_node_name()})"
+        ]
+        for key in relationship_type.get_data().keys():
+            property_type = relationship_type._get_cypher_property_type()[key]
+            header.append(f"{key}:{BulkImportBundle.COLUMN_TYPES[property_type]}")
+        return header
+
+    @staticmethod
+    def _get_node_row(node_type: DBNode, csv_row: dict) -> list:
+        parameter_row = node_type.get_parameter_row(csv_row)
+        return [BulkImportBundle._format_value(parameter_row[key]) for key in node_type.get_data().keys()]
+
+    @staticmethod
+    def _get_relationship_row(relationship_type: DBRelationship, csv_row: dict) -> list:
+        parameter_row = relationship_type.get_parameter_row(csv_row)
+        return [parameter_row["source_id"], parameter_row["destination_id"]] + \
+            [BulkImportBundle._format_value(parameter_row[key]) for key in relationship_type.get_data().keys()]
+
+    @staticmethod
+    def _format_row(row: list) -> str:
+        """
+        Formats a line of a data file. Strings are quoted and numbers are not. None is an unquoted empty field, which
+        neo4j-admin imports as a missing property (a quoted "" does not parse in long, double, and datetime columns).
+        """
+        fields = []
+        for value in row:
+            if value is None:
+                fields.append("")
+            elif isinstance(value, str):
+                fields.append('"' + value.replace('"', '""') + '"')
+            else:
+                fields.append(str(value))
+        return ",".join(fields) + "\r\n"
+
+    @staticmethod
+    def _format_value(value):
+        """
+        Formats a typed value as neo4j-admin reads it (strings are quoted, numbers are not)
+        """
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
@@ -0,0 +1,46 @@
+import threading
+from typing import Optional
+from neo4j import GraphDatabase, Driver
+
+from src.Utility.Logger import MSRLogger
+from src.Utility.Utility import read_config
+
+
+class DatabaseConnection:
+    """
+    DatabaseConnection owns the process wide Neo4J driver. The driver manages a pool of Bolt connections that all
+    RepositoryInsertion instances share, so collectors do not open and close their own driver for every repository.
+    """
+
+    _driver: Optional[Driver] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_driver(deploy: bool) -> Driver:
+        """
+        Returns the shared driver and creates it on first use
+        :param deploy: True if the database runs in the docker network
+        :return: Driver
+        """
+        with DatabaseConnection._lock:
+            if DatabaseConnection._driver is None:
+                config = read_config()
+                uri = f"bolt://{'neo4j1' if deploy else 'localhost'}:7687"
+                DatabaseConnection._driver = GraphDatabase.driver(
+                    uri=uri,
+                    auth=(config.get("db_username"), config.get("db_password")),
+                    max_connection_pool_size=config.get("db_max_connection_pool_size", 100)
+                )
+                MSRLogger.get_logger(DatabaseConnection.__name__).info(f"Connection pool to Neo4J ({uri}) established")
+            return DatabaseConnection._driver
+
+    @staticmethod
+    def close():
+        """
+        Closes the shared driver and all pooled connections (e.g., after all repositories are inserted)
+        """
+        with DatabaseConnection._lock:
+            if DatabaseConnection._driver is not None:
+                DatabaseConnection._driver.close()
+                DatabaseConnection._driver = None
+                MSRLogger.get_logger(DatabaseConnection.__name__).info("Connection pool to Neo4J closed")
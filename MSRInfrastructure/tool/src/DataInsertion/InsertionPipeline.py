@@ -0,0 +1,62 @@
+import threading
+from queue import Queue
+from typing import Optional
+
+import src.RepositoryCollector as RepositoryCollector
+from src.Utility.Logger import MSRLogger
+from src.DataInsertion.RepositoryInsertion import RepositoryInsertion
+
+
+class InsertionPipeline(threading.Thread):
+    """
+    InsertionPipeline inserts sealed CSV segments into the Neo4J database while the RepositoryCollector continues
+    collecting. Segments are inserted strictly in the order they were sealed and within each segment all nodes are
+    inserted before all relationships. As collection phases only reference nodes of the same or earlier phases, every
+    relationship finds its source and destination node.
+    """
+
+    def __init__(self, repo: RepositoryCollector):
+        super().__init__()
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self.repo = repo
+        self._repo = repo.get_repo_owner() + "/" + repo.get_repo_name()
+        self._segments: Queue = Queue()  # Sealed segment numbers, None marks the end of the collection
+        self._insertion: Optional[RepositoryInsertion] = None
+        self.failed = False  # True if at least one segment could not be inserted
+
+    def submit(self, segment: int):
+        """
+        Hands a sealed segment to the insertion worker
+        """
+        self._segments.put(segment)
+
+    def close(self):
+        """
+        Signals that the collection finished and no further segments follow
+        """
+        self._segments.put(None)
+
+    def run(self):
+        self._insertion = self.repo.create_insertion()
+        self._insertion.connect()
+        try:
+            self._insertion.create_indexes()
+            while True:
+                segment = self._segments.get()
+                if segment is None:
+                    break
+                self.insert_segment(segment)
+        except Exception as e:
+            self.failed = True
+            self.logger.exception(f"{self._repo} Insertion pipeline failed {e}")
+        finally:
+            self._insertion.disconnect()
+
+    def insert_segment(self, segment: int):
+        """
+        Inserts all nodes and then all relationships of a segment and deletes its files afterward
+        """
+        self.logger.info(f"{self._repo} Inserting segment {segment}")
+        self._insertion.insert_nodes(segment)
+        self._insertion.insert_relationships(segment)
+        self.repo.get_preprocessor_storage().delete_segment(segment)
@@ -0,0 +1,85 @@
+import threading
+from typing import List, Set, Callable
+
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+
+
+class RelationshipImportScheduler:
+    """
+    RelationshipImportScheduler imports relationship types concurrently on multiple workers. Creating a relationship
+    locks its source and destination node, therefore a worker only starts a relationship type if no other worker
+    currently imports a type that touches one of its node labels. Types sharing a hot label (e.g., User or Project)
+    run one after another, which avoids lock contention and deadlocks. Pending types start in list order whenever
+    their labels become free.
+    """
+
+    def __init__(self, relationship_types: List[DBRelationship], workers: int):
+        self.pending: List[DBRelationship] = list(relationship_types)
+        self.workers = max(workers, 1)
+        self.locked_labels: Set[str] = set()
+        self.condition = threading.Condition()
+        self.errors: List[Exception] = []
+
+    @staticmethod
+    def get_labels(relationship_type: DBRelationship) -> Set[str]:
+        """
+        Returns the node labels a relationship type locks while it is imported
+        """
+        return {
+            relationship_type.get_source_node().get_node_name(),
+            relationship_type.get_destination_node().get_node_name()
+        }
+
+    def run(self, insert: Callable[[DBRelationship], None]):
+        """
+        Imports all relationship types and blocks until every type finished
+        :param insert: function importing a single relationship type
+        """
+        if self.workers == 1:
+            for relationship_type in self.pending:
+                insert(relationship_type)
+            self.pending = []
+            return
+        threads = [threading.Thread(target=self._work, args=(insert,)) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if len(self.errors) > 0:
+            raise self.errors[0]
+
+    def _work(self, insert: Callable[[DBRelationship], None]):
+        while True:
+            with self.condition:
+                relationship_type = self._take_next()
+                while relationship_type is None:
+                    if len(self.pending) == 0 or len(self.errors) > 0:
+                        return
+                    # Every pending type conflicts with a running type -> Wait until a worker releases its labels
+                    self.condition.wait()
+                    relationship_type = self._take_next()
+            labels = RelationshipImportScheduler.get_labels(relationship_type)
+            try:
+                insert(relationship_type)
+            except Exception as e:
+                with self.condition:
+                    self.errors.append(e)
+            finally:
+                with self.condition:
+                    self.locked_labels.difference_update(labels)
+                    self.condition.notify_all()
+
+    def _take_next(self):
+        """
+        Removes and returns the first pending relationship type whose labels are not locked (caller holds the
+        condition lock)
+        """
+        if len(self.errors) > 0:
+            return None
+        for relationship_type in self.pending:
+            labels = RelationshipImportScheduler.get_labels(relationship_type)
+            if labels.isdisjoint(self.locked_labels):
+                self.pending.remove(relationship_type)
+                self.locked_labels.update(labels)
+                return relationship_type
+        return None
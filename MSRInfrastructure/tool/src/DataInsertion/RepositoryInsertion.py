@@ -1,10 +1,19 @@
-from neo4j import GraphDatabase, Driver
-from typing import Optional
+import time
+import threading
+from neo4j import Driver
+from typing import Optional, Union, Dict, Tuple
 
 import src.RepositoryCollector as RepositoryCollector
 from src.Utility.Logger import MSRLogger
 from src.Utility.Utility import read_config
 from src.DatabaseObjects.DataTypes import DATA_TYPE
+from src.DataInsertion.BatchSizing import AdaptiveBatchSizer
+from src.DataInsertion.DatabaseConnection import DatabaseConnection
+from src.DataInsertion.RelationshipScheduling import RelationshipImportScheduler
+from src.DataProcessing.NodeType import NODE_TYPE
+from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
+from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
 
 from src.DatabaseObjects.DatabaseNode.Project import Project
 from src.DatabaseObjects.DatabaseNode.Label import Label
@@ -43,7 +52,8 @@ from src.DatabaseObjects.DatabaseRelationship.PullRequest import PullRequestHasL
     IsReplyToPullRequestReviewComment, IsPullRequestBaseCommit, IsPullRequestHeadCommit, PullRequestEventLinksCommit, \
     PullRequestHasReview, PullRequestHasEvent, IsSinglePullRequestReviewComment, PullRequestReviewReviewsCommit, \
     PullRequestReviewCommentCommentsOriginalCommit, PullRequestReviewCommentCommentsCommit, \
-    PullRequestHasTargetBranch, PullRequestHasSourceBranch
+    PullRequestHasTargetBranch, PullRequestHasSourceBranch, PullRequestFileAfterMerge
+from src.DatabaseObjects.DatabaseRelationship.Reference import initialize_placeholder_reference_relationships
 from src.DatabaseObjects.DatabaseRelationship.Release import ReleaseTagsCommit
 from src.DatabaseObjects.DatabaseRelationship.User import AuthorOfCommit, CommitterOfCommit, ClosesIssue, \
     CommentsOnIssue, CreatesIssue, CreatesPullRequest, CreatesDiscussion, \
@@ -60,16 +70,24 @@ class RepositoryInsertion:
     RepositoryInsertion is responsible for establishing a connection to the database and generating and executing
     all queries to insert nodes and relationships from CSV files
     """
+
+    # Relationships that every source node has at most once. Incremental collections replace them.
+    REPLACED_RELATIONSHIP_TYPES = [RELATIONSHIP_TYPE.BRANCH_HAS_HEAD_COMMIT]
+
+    # The database schema is created once per process and shared by all repositories
+    _schema_created = False
+    _schema_lock = threading.Lock()
+
     def __init__(self, repo: RepositoryCollector):
         self.logger = MSRLogger.get_logger(self.__class__.__name__)
         self.config = read_config()
         self.project_id = repo.get_project_id()
-        self.IP = "neo4j1" if repo.is_deployment() else "localhost"
-        self.URI = f"bolt://{self.IP}:7687"
         self.db: Optional[Driver] = None
         self.repo_owner = repo.get_repo_owner()
         self.repo_name = repo.get_repo_name()
         self.repo = repo
+        self.incremental = repo.is_incremental_collection()  # Merge into the graph of a previous collection
+        self.batch_sizer = AdaptiveBatchSizer.get_instance()
 
     def start(self):
         """
@@ -80,48 +98,93 @@ class RepositoryInsertion:
         self.create_indexes()
         self.insert_nodes()
         self.insert_relationships()
-        self.link_nodes_to_issues_and_pull_requests()
-        self.link_pull_request_file_and_merge_commit_file()
         self.disconnect()
 
     def connect(self):
         """
-        Establishment of the connection to the Neo4J database
+        Acquires the process wide Neo4J driver (connection pool)
         """
-        self.db = GraphDatabase.driver(uri=self.URI, auth=(self.config.get("db_username"), self.config.get("db_password")))
+        self.db = DatabaseConnection.get_driver(self.repo.is_deployment())
         self.logger.info(f"{self.repo_owner}/{self.repo_name} Connection to Neo4J established")
 
     def disconnect(self):
         """
-        Disconnecting from the Neo4J database
+        Releases the Neo4J driver. The shared connection pool stays open for other repositories.
         """
-        self.db.close()
+        self.db = None
         self.logger.info(f"{self.repo_owner}/{self.repo_name} Connection to Neo4J closed")
 
     def create_indexes(self):
         """
-        Creating database indexes for every unique node identification property/ node time properties/ relationship
-        time properties
+        Creates the database schema once per process: uniqueness constraints for the keys of mergeable nodes, indexes
+        for the keys of all other nodes, and indexes for node/relationship time properties. Schema objects that exist
+        already are skipped.
         """
-        self.logger.info(f"{self.repo_owner}/{self.repo_name} Creating database indexes")
+        with RepositoryInsertion._schema_lock:
+            if RepositoryInsertion._schema_created:
+                return
+            self.logger.info(f"{self.repo_owner}/{self.repo_name} Creating database schema")
+            existing_indexes = self.get_existing_indexes()
 
-        node_types = RepositoryInsertion.initialize_placeholder_nodes()
-        for node in node_types:
-            node_name = node.get_node_name()
-            self.create_node_index(node.get_node_type().value + "_indices", node_name, node.get_key_name())
+            node_types = RepositoryInsertion.initialize_placeholder_nodes()
+            for node in node_types:
+                node_name = node.get_node_name()
+                key_name = node.get_key_name()
+                existing_index = existing_indexes.get((node_name, key_name), None)
+                if node.can_merge():
+                    # MERGE needs unique keys, concurrent repositories must not create the same node twice
+                    if existing_index is None or not existing_index[1]:
+                        self.create_node_constraint(node.get_node_type().value + "_constraint", node_name, key_name,
+                                                    existing_index[0] if existing_index is not None else None)
+                elif existing_index is None:
+                    # Nodes created per repository (e.g., commits of forks) can share a key across repositories
+                    self.create_node_index(node.get_node_type().value + "_indices", node_name, key_name)
 
-            # Index time properties for every node
-            for property_name, property_value in node.get_cypher_property_type().items():
-                if property_value == DATA_TYPE.DATETIME:
-                    self.create_node_index(node.get_node_type().value + "_" + property_name + "_indices", node_name, property_name)
+                # Index time properties for every node
+                for property_name, property_value in node.get_cypher_property_type().items():
+                    if property_value == DATA_TYPE.DATETIME and (node_name, property_name) not in existing_indexes:
+                        self.create_node_index(node.get_node_type().value + "_" + property_name + "_indices", node_name, property_name)
 
-        # Index time properties for every relationship
-        relationship_types = RepositoryInsertion.initialize_placeholder_relationships()
-        for relationship in relationship_types:
-            relationship_name = relationship.get_relationship_type().value
-            for property_name, property_value in relationship._get_cypher_property_type().items():
-                if property_value == DATA_TYPE.DATETIME:
-                    self.create_relationship_index(relationship_name + "_" + property_name + "_indices", relationship_name, property_name)
+            # Index time properties for every relationship
+            relationship_types = RepositoryInsertion.initialize_placeholder_relationships()
+            for relationship in relationship_types:
+                relationship_name = relationship.get_cypher_relationship_name()
+                for property_name, property_value in relationship._get_cypher_property_type().items():
+                    if property_value == DATA_TYPE.DATETIME and (relationship_name, property_name) not in existing_indexes:
+                        self.create_relationship_index(relationship.get_relationship_type().value + "_" + property_name + "_indices", relationship_name, property_name)
+                        existing_indexes[(relationship_name, property_name)] = ("", False)
+            RepositoryInsertion._schema_created = True
+
+    def get_existing_indexes(self) -> Dict[Tuple[str, str], Tuple[str, bool]]:
+        """
+        Reads all single property indexes of the database
+        :return: {(label or relationship type, property): (index name, True if the index backs a constraint)}
+        """
+        existing_indexes = {}
+        with self.db.session() as t:
+            result = t.run("SHOW INDEXES YIELD name, labelsOrTypes, properties, owningConstraint")
+            for record in result:
+                labels = record["labelsOrTypes"]
+                properties = record["properties"]
+                if labels is None or properties is None or len(labels) != 1 or len(properties) != 1:
+                    continue
+                existing_indexes[(labels[0], properties[0])] = (record["name"], record["owningConstraint"] is not None)
+        return existing_indexes
+
+    def create_node_constraint(self, constraint_name, node_label, key_name, replaced_index_name=None):
+        """
+        Executes queries to create a uniqueness constraint on a node property. A plain index on the same property has
+        to be dropped first. If the constraint cannot be created (e.g., duplicate keys from earlier collections), the
+        property keeps a plain index.
+        """
+        try:
+            with self.db.session() as t:
+                if replaced_index_name is not None:
+                    t.run(f"DROP INDEX {replaced_index_name} IF EXISTS").consume()
+                t.run(f"CREATE CONSTRAINT {constraint_name} IF NOT EXISTS FOR (n:{node_label}) REQUIRE n.{key_name} IS UNIQUE").consume()
+        except Exception as e:
+            self.logger.warning(f"{self.repo_owner}/{self.repo_name} Uniqueness constraint on {node_label}.{key_name} not possible, creating index instead {e}")
+            self.create_node_index(constraint_name.replace("_constraint", "_indices"), node_label, key_name)
 
     def create_node_index(self, index_name, node_label, key_name):
         """
@@ -137,71 +200,137 @@ class RepositoryInsertion:
         with self.db.session() as t:
             t.run(f"CREATE INDEX {index_name} IF NOT EXISTS FOR ()-[r:{relationship_label}]-() ON (r.{key_name})")
 
-    def insert_nodes(self):
+    def insert_nodes(self, segment: Optional[int] = None):
         """
         Loops over all repository node CSV files to generate and execute a Cypher insertion query
+        :param segment: segment number of a sealed segment or None to insert the current files
         """
         node_types = RepositoryInsertion.initialize_placeholder_nodes()
         # Loop over all node types
         for node_type in node_types:
             self.logger.info(f"{self.repo_owner}/{self.repo_name} Inserting node {node_type.get_node_type().value}")
-            # Retrieve file path and check if the file exists
-            file_path = self.repo.get_preprocessor_storage().get_file_name_neo4j(node_type.get_node_type())
-            if file_path is None:
-                continue
-            # Insert all nodes
-            node_name = node_type.get_node_name()
-            properties = node_type.get_cypher_properties()
-            operator = "MERGE" if node_type.can_merge() else "CREATE"
+            self.insert_node_type(node_type, segment)
+
+    def insert_node_type(self, node_type: DBNode, segment: Optional[int] = None):
+        """
+        Inserts all nodes of a single node type with LOAD CSV
+        :param node_type: placeholder node of the node type
+        :param segment: segment number of a sealed segment or None to insert the current file
+        """
+        # Retrieve file path and check if the file exists (LOAD CSV decompresses '.csv.gz' files transparently)
+        file_path = self.repo.get_preprocessor_storage().get_file_name_neo4j(node_type.get_node_type(), segment)
+        if file_path is None:
+            return
+        # Insert all nodes
+        node_name = node_type.get_node_name()
+        properties = node_type.get_cypher_properties()
+        key_property = node_type.get_cypher_properties(include=[node_type.get_key_name()])
+        if node_type.can_merge():
+            # Merge on the unique key only, the first collected properties of a node win (e.g., a user whose name
+            # differs between repositories)
+            operation = f"MERGE (n:{node_name} {{{key_property}}}) ON CREATE SET n += {{{properties}}}"
+        elif self.incremental:
+            # Nodes of a previous collection are updated (e.g., the state of an issue)
+            operation = f"MERGE (n:{node_name} {{{key_property}}}) SET n += {{{properties}}}"
+        else:
+            operation = f"CREATE (:{node_name} {{{properties}}})"
+        rows, batch_size = self.choose_batch_size(node_type.get_node_type(), segment)
+        start_time = time.perf_counter()
+        query_result = self.run_query(f"""
+        LOAD CSV WITH HEADERS FROM '{file_path}' AS row
+        CALL{{
+            WITH row
+            {operation}
+        }} IN TRANSACTIONS OF {batch_size} ROWS
+        """)
+        self.report_batch_size(node_type.get_node_type(), rows, batch_size, time.perf_counter() - start_time)
+
+    def insert_relationships(self, segment: Optional[int] = None):
+        """
+        Loops over all repository relationship CSV files to generate and execute a Cypher insertion query
+        :param segment: segment number of a sealed segment or None to insert the current files
+        """
+        relationship_types = RepositoryInsertion.initialize_placeholder_relationships()
+        # Import relationship types with disjoint node labels concurrently
+        scheduler = RelationshipImportScheduler(relationship_types, self.config.get("relationship_import_workers", 1))
+
+        def insert(relationship_type: DBRelationship):
+            self.logger.info(f"{self.repo_owner}/{self.repo_name} Inserting relationship {relationship_type.get_relationship_type().value}")
+            self.insert_relationship_type(relationship_type, segment)
+        scheduler.run(insert)
+
+    def insert_relationship_type(self, relationship_type: DBRelationship, segment: Optional[int] = None):
+        """
+        Inserts all relationships of a single relationship type with LOAD CSV
+        :param relationship_type: placeholder relationship of the relationship type
+        :param segment: segment number of a sealed segment or None to insert the current file
+        """
+        # Retrieve file path and check if the file exists (LOAD CSV decompresses '.csv.gz' files transparently)
+        file_path = self.repo.get_preprocessor_storage().get_file_name_neo4j(
+            relationship_type.get_relationship_type(), segment)
+        if file_path is None:
+            return
+        # Insert all relationships
+        source_node_name = relationship_type.get_source_node().get_node_name()
+        source_node_key = relationship_type.get_source_node().get_key_name()
+        destination_node_name = relationship_type.get_destination_node().get_node_name()
+        destination_node_key = relationship_type.get_destination_node().get_key_name()
+        properties = relationship_type.get_cypher_properties()
+        relationship_name = relationship_type.get_cypher_relationship_name()
+        # Relationships of a previous collection are matched instead of duplicated
+        operator = "MERGE" if self.incremental else "CREATE"
+        rows, batch_size = self.choose_batch_size(relationship_type.get_relationship_type(), segment)
+        if self.incremental and relationship_type.get_relationship_type() in RepositoryInsertion.REPLACED_RELATIONSHIP_TYPES:
+            self.run_query(f"""
+            LOAD CSV WITH HEADERS FROM '{file_path}' AS row
+            CALL{{
+                WITH row
+                MATCH (:{source_node_name} {{{source_node_key}: row.source_id}})-[r:{relationship_name}]->()
+                DELETE r
+            }} IN TRANSACTIONS OF {batch_size} ROWS
+            """)
+        start_time = time.perf_counter()
+        if relationship_type.has_properties():
             query_result = self.run_query(f"""
             LOAD CSV WITH HEADERS FROM '{file_path}' AS row
             CALL{{
                 WITH row
-                {operator} (:{node_name} {{{properties}}})
-            }} IN TRANSACTIONS OF 300 ROWS
+                MATCH (s:{source_node_name} {{{source_node_key}: row.source_id}})
+                MATCH (d:{destination_node_name} {{{destination_node_key}: row.destination_id}})
+                {operator} (s)-[:{relationship_name} {{{properties}}}]->(d)
+            }} IN TRANSACTIONS OF {batch_size} ROWS
             """)
+        else:
+            query_result = self.run_query(f"""
+            LOAD CSV WITH HEADERS FROM '{file_path}' AS row
+            CALL{{
+                WITH row
+                MATCH (s:{source_node_name} {{{source_node_key}: row.source_id}})
+                MATCH (d:{destination_node_name} {{{destination_node_key}: row.destination_id}})
+                WITH s, d
+                {operator} (s)-[:{relationship_name}]->(d)
+            }} IN TRANSACTIONS OF {batch_size} ROWS
+            """)
+        self.report_batch_size(relationship_type.get_relationship_type(), rows, batch_size,
+                               time.perf_counter() - start_time)
 
-    def insert_relationships(self):
+    def choose_batch_size(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
         """
-        Loops over all repository relationship CSV files to generate and execute a Cypher insertion query
+        Chooses the number of rows per transaction from the row width of the file and previous observations
+        :return: (rows or None if unknown, batch_size)
         """
-        relationship_types = RepositoryInsertion.initialize_placeholder_relationships()
-        # Loop over all relationship types
-        for relationship_type in relationship_types:
-            self.logger.info(f"{self.repo_owner}/{self.repo_name} Inserting relationship {relationship_type.get_relationship_type().value}")
-            # Retrieve file path and check if the file exists
-            file_path = self.repo.get_preprocessor_storage().get_file_name_neo4j(
-                relationship_type.get_relationship_type())
-            if file_path is None:
-                continue
-            # Insert all relationships
-            source_node_name = relationship_type.get_source_node().get_node_name()
-            source_node_key = relationship_type.get_source_node().get_key_name()
-            destination_node_name = relationship_type.get_destination_node().get_node_name()
-            destination_node_key = relationship_type.get_destination_node().get_key_name()
-            properties = relationship_type.get_cypher_properties()
-            relationship_name = relationship_type.get_relationship_type().value
-            if relationship_type.has_properties():
-                query_result = self.run_query(f"""
-                LOAD CSV WITH HEADERS FROM '{file_path}' AS row
-                CALL{{
-                    WITH row
-                    MATCH (s:{source_node_name} {{{source_node_key}: row.source_id}})
-                    MATCH (d:{destination_node_name} {{{destination_node_key}: row.destination_id}})
-                    CREATE (s)-[:{relationship_name} {{{properties}}}]->(d)
-                }} IN TRANSACTIONS OF 300 ROWS
-                """)
-            else:
-                query_result = self.run_query(f"""
-                LOAD CSV WITH HEADERS FROM '{file_path}' AS row
-                CALL{{
-                    WITH row
-                    MATCH (s:{source_node_name} {{{source_node_key}: row.source_id}})
-                    MATCH (d:{destination_node_name} {{{destination_node_key}: row.destination_id}})
-                    WITH s, d
-                    CREATE (s)-[:{relationship_name}]->(d)
-                }} IN TRANSACTIONS OF 300 ROWS
-                """)
+        rows, file_bytes = self.repo.get_preprocessor_storage().get_row_statistics(file_type, segment)
+        return rows, self.batch_sizer.get_batch_size(file_type.value, rows, file_bytes)
+
+    def report_batch_size(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], rows: Optional[int],
+                          batch_size: int, seconds: float):
+        """
+        Reports the duration of a complete import of a type to the batch sizer and logs rows/sec
+        """
+        if rows is None:
+            return
+        self.batch_sizer.report(file_type.value, rows, batch_size, seconds)
+        self.batch_sizer.log_summary(f"{self.repo_owner}/{self.repo_name}", file_type.value, rows, batch_size, seconds)
 
     def run_query(self, query: str):
         """
@@ -215,55 +344,6 @@ class RepositoryInsertion:
         with self.db.session() as t:
             return t.run(query)
 
-    def link_nodes_to_issues_and_pull_requests(self):
-        """
-        Executes a query to connect every node in a repository that has the attribute title, message, or body and
-        contains a link to another number in the form of 'fixes #234' or only '#234' to its respective issue.
-        """
-        self.logger.info(f"{self.repo_owner}/{self.repo_name} Establishing issue/pull request links")
-        self.run_query(f"""
-        MATCH (p:Project {{id: '{self.repo.get_project_id()}'}})
-        CALL apoc.path.subgraphAll(p,{{
-        labelFilter: '-Topic|-File|-Language|-Dependency|-User|-License|-Branch|-File'
-        }})
-        YIELD nodes as nodes_list
-        UNWIND nodes_list as n
-        UNWIND apoc.text.regexGroups(n.message,
-            '.*(?i)(?:(fix|close|closes|closed|fix|fixes|fixed|resolve|resolves|resolved)? #(\\d+)).*') +
-        apoc.text.regexGroups(n.title, 
-            '.*(?i)(?:(fix|close|closes|closed|fix|fixes|fixed|resolve|resolves|resolved)? #(\\d+)).*') +
-        apoc.text.regexGroups(n.body, 
-            '.*(?i)(?:(fix|close|closes|closed|fix|fixes|fixed|resolve|resolves|resolved)? #(\\d+)).*') as g
-        WITH n, g
-        WHERE size(g) > 0
-        CALL {{
-            WITH n, g
-            MATCH (:Project {{id: '{self.repo.get_project_id()}'}})-[:HAS_PULL_REQUEST_MONTH]->(pprm:ProjectPullRequestMonth),
-            (pprm)<-[:PULL_REQUEST_IN_MONTH]-(pr:PullRequest)
-            WHERE pr.number = toInteger(g[2])
-            CREATE (n)-[:LINKS_PULL_REQUEST {{action: CASE g[1] WHEN null THEN "NO_ACTION" ELSE toString(g[1]) END}}]->(pr)
-        }}
-        CALL {{
-            WITH n, g
-            MATCH (:Project {{id: '{self.repo.get_project_id()}'}})-[:HAS_ISSUE_MONTH]->(pim:ProjectIssueMonth),
-            (pim)<-[:ISSUE_IN_MONTH]-(i:Issue)
-            WHERE i.number = toInteger(g[2])
-            CREATE (n)-[:LINKS_ISSUE {{action: CASE g[1] WHEN null THEN "NO_ACTION" ELSE toString(g[1]) END}}]->(i)
-        }}
-        """)
-
-    def link_pull_request_file_and_merge_commit_file(self):
-        """
-        Executes a query to link a pull request file to its corresponding file node after the pull request merge
-        """
-        self.logger.info(f"{self.repo_owner}/{self.repo_name} Linking pull request files to file nodes")
-        self.run_query(f"""
-        MATCH (p:Project {{id: '{self.repo.get_project_id()}'}})-[:HAS_PULL_REQUEST_MONTH]->(prm:ProjectPullRequestMonth)<-[:PULL_REQUEST_IN_MONTH]-(pr:PullRequest)-[:PROPOSES_CHANGE]->(prf:PullRequestFile),
-        (pr)-[:HAS_EVENT]->(pre:PullRequestEvent {{__typename: 'MergedEvent'}})-[:LINKS_COMMIT]->(c:Commit)-[:PERFORMS]->(fc:FileAction)-[:AFTER_ACTION]->(f:File)
-        WHERE f.path = prf.path
-        CREATE (prf)-[:FILE_AFTER_MERGE]->(f)
-        """)
-
     @staticmethod
     def initialize_placeholder_nodes():
         """
@@ -322,6 +402,7 @@ class RepositoryInsertion:
             PullRequestHasEvent().set_source_node(PullRequest()).set_destination_node(PullRequestEvent()),
             IsSinglePullRequestReviewComment().set_source_node(PullRequestReviewComment()).set_destination_node(PullRequest()),
             PullRequestProposesFileChange().set_source_node(PullRequest()).set_destination_node(PullRequestFile()),
+            PullRequestFileAfterMerge().set_source_node(PullRequestFile()).set_destination_node(File()),
             ReleaseTagsCommit().set_source_node(Release()).set_destination_node(Commit()),
             AuthorOfCommit().set_source_node(User()).set_destination_node(Commit()),
             CommitterOfCommit().set_source_node(User()).set_destination_node(Commit()),
@@ -354,4 +435,4 @@ class RepositoryInsertion:
             PullRequestHasSourceBranch().set_source_node(PullRequest()).set_destination_node(Branch()),
             ProjectHasDiscussion().set_source_node(Project()).set_destination_node(Discussion()),
             BranchContainsCommit().set_source_node(Branch()).set_destination_node(Commit())
-        ]
+        ] + initialize_placeholder_reference_relationships()
@@ -0,0 +1,97 @@
+from typing import Optional, Dict, List
+
+from src.Utility.Logger import MSRLogger
+from src.DataInsertion.DatabaseConnection import DatabaseConnection
+
+
+class RepositoryState:
+    """
+    RepositoryState reads the last collected state of a project from the Neo4J database. An incremental collection
+    continues from this state: only commits after the branch heads, issues and pull requests updated after the latest
+    update time, and unknown workflow runs are collected and merged into the existing project graph.
+    """
+
+    def __init__(self, project_id: str):
+        self.project_id: str = project_id
+        self.branch_ids: Dict[str, str] = {}  # Branch name -> branch node id
+        self.head_commits: List[str] = []  # Head commit hashes of all collected branches
+        self.time_aggregator_ids: Dict[str, Dict[str, str]] = {
+            "issue": {},
+            "pullRequest": {},
+            "commit": {}
+        }  # Time aggregator type -> 'YYYY-MM' -> node id
+        self.issue_ids: Dict[int, str] = {}  # Issue number -> issue node id
+        self.pull_request_ids: Dict[int, str] = {}  # Pull request number -> pull request node id
+        self.issues_updated_at: Optional[str] = None  # Latest issue update time (e.g., '2024-01-01T00:00:00Z')
+        self.pull_requests_updated_at: Optional[str] = None  # Latest pull request update time
+        self.workflow_run_ids: set = set()  # Ids of all collected workflow runs
+
+    @staticmethod
+    def load(project_id: str, deploy: bool) -> Optional["RepositoryState"]:
+        """
+        Loads the collected state of a project
+        :param project_id: GitHub node id of the project
+        :param deploy: True if the database runs in the docker network
+        :return: RepositoryState or None if the project was not collected before
+        """
+        logger = MSRLogger.get_logger(RepositoryState.__name__)
+        state = RepositoryState(project_id)
+        with DatabaseConnection.get_driver(deploy).session() as session:
+            if session.run("MATCH (p:Project {id: $id}) RETURN p.id", id=project_id).single() is None:
+                logger.info(f"Project {project_id} was not collected before")
+                return None
+            for record in session.run("""
+            MATCH (:Project {id: $id})-[:HAS_BRANCH]->(b:Branch)
+            OPTIONAL MATCH (b)-[:BRANCH_HAS_HEAD_COMMIT]->(c:Commit)
+            RETURN b.name AS name, b.id AS id, c.hash AS hash
+            """, id=project_id):
+                state.branch_ids[record["name"]] = record["id"]
+                if record["hash"] is not None:
+                    state.head_commits.append(record["hash"])
+            for time_aggregator, relationship_name in [("issue", "HAS_ISSUE_MONTH"),
+                                                       ("pullRequest", "HAS_PULL_REQUEST_MONTH"),
+                                                       ("commit", "HAS_COMMIT_MONTH")]:
+                for record in session.run(f"""
+                MATCH (:Project {{id: $id}})-[:{relationship_name}]->(m)
+                RETURN m.year AS year, m.month AS month, m.id AS id
+                """, id=project_id):
+                    time_aggregator_key = f"{record['year']:04d}-{record['month']:02d}"
+                    state.time_aggregator_ids[time_aggregator][time_aggregator_key] = record["id"]
+            state.issues_updated_at = RepositoryState._load_numbers(
+                session, project_id, "HAS_ISSUE_MONTH", "ISSUE_IN_MONTH", "Issue", state.issue_ids)
+            state.pull_requests_updated_at = RepositoryState._load_numbers(
+                session, project_id, "HAS_PULL_REQUEST_MONTH", "PULL_REQUEST_IN_MONTH", "PullRequest",
+                state.pull_request_ids)
+            for record in session.run("""
+            MATCH (:Project {id: $id})-[:HAS_WORKFLOW]->(:Workflow)-[:HAS_RUN]->(r:WorkflowRun)
+            RETURN r.id AS id
+            """, id=project_id):
+                state.workflow_run_ids.add(record["id"])
+        logger.info(f"Project {project_id} state loaded ({len(state.head_commits)} branch heads, "
+                    f"{len(state.issue_ids)} issues, {len(state.pull_request_ids)} pull requests, "
+                    f"{len(state.workflow_run_ids)} workflow runs)")
+        return state
+
+    @staticmethod
+    def _load_numbers(session, project_id: str, month_relationship: str, in_month_relationship: str,
+                      node_name: str, numbers: Dict[int, str]) -> Optional[str]:
+        """
+        Loads the numbers and node ids of all issues or pull requests of a project
+        :return: latest update time or None if no node has an update time (e.g., collected without updatedAt)
+        """
+        updated_at = None
+        for record in session.run(f"""
+        MATCH (:Project {{id: $id}})-[:{month_relationship}]->()<-[:{in_month_relationship}]-(n:{node_name})
+        RETURN n.number AS number, n.id AS id, n.updatedAt AS updatedAt
+        """, id=project_id):
+            numbers[record["number"]] = record["id"]
+            node_updated_at = record["updatedAt"]
+            # Missing update times are inserted as 0001-01-01
+            if node_updated_at is None or node_updated_at.year <= 1:
+                continue
+            if updated_at is None or node_updated_at > updated_at:
+                updated_at = node_updated_at
+        if updated_at is None:
+            return None
+        return f"{updated_at.year:04d}-{updated_at.month:02d}-{updated_at.day:02d}T" \
+               f"{updated_at.hour:02d}:{updated_at.minute:02d}:{updated_at.second:02d}Z"
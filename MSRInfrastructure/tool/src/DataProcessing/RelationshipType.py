@@ -46,6 +46,7 @@ class RELATIONSHIP_TYPE(Enum):
     PULL_REQUEST_HAS_EVENT = "HAS_EVENT"
     PULL_REQUEST_PROPOSES_CHANGE = "PROPOSES_CHANGE"
     PULL_REQUEST_EVENT_LINKS_COMMIT = "LINKS_COMMIT"
+    PULL_REQUEST_FILE_AFTER_MERGE = "FILE_AFTER_MERGE"
     PULL_REQUEST_REVIEW_REVIEWS_COMMIT = "REVIEWS_COMMIT"
     COMMENTS_ON_PULL_REQUEST_REVIEW = "COMMENTS_ON_PULL_REQUEST_REVIEW"
     PULL_REQUEST_REVIEW_COMMENT_COMMENTS_COMMIT = "COMMENTS_COMMIT"
@@ -76,4 +77,21 @@ class RELATIONSHIP_TYPE(Enum):
     PULL_REQUEST_HAS_SOURCE_BRANCH = "HAS_SOURCE_BRANCH"
     PULL_REQUEST_HAS_TARGET_BRANCH = "HAS_TARGET_BRANCH"
     IS_SINGLE_PULL_REQUEST_REVIEW_COMMENT = "IS_SINGLE_PULL_REQUEST_REVIEW_COMMENT"
-
+    COMMIT_LINKS_ISSUE = "COMMIT_LINKS_ISSUE"
+    COMMIT_LINKS_PULL_REQUEST = "COMMIT_LINKS_PULL_REQUEST"
+    DISCUSSION_LINKS_ISSUE = "DISCUSSION_LINKS_ISSUE"
+    DISCUSSION_LINKS_PULL_REQUEST = "DISCUSSION_LINKS_PULL_REQUEST"
+    DISCUSSION_COMMENT_LINKS_ISSUE = "DISCUSSION_COMMENT_LINKS_ISSUE"
+    DISCUSSION_COMMENT_LINKS_PULL_REQUEST = "DISCUSSION_COMMENT_LINKS_PULL_REQUEST"
+    ISSUE_LINKS_ISSUE = "ISSUE_LINKS_ISSUE"
+    ISSUE_LINKS_PULL_REQUEST = "ISSUE_LINKS_PULL_REQUEST"
+    MILESTONE_LINKS_ISSUE = "MILESTONE_LINKS_ISSUE"
+    MILESTONE_LINKS_PULL_REQUEST = "MILESTONE_LINKS_PULL_REQUEST"
+    PULL_REQUEST_LINKS_ISSUE = "PULL_REQUEST_LINKS_ISSUE"
+    PULL_REQUEST_LINKS_PULL_REQUEST = "PULL_REQUEST_LINKS_PULL_REQUEST"
+    PULL_REQUEST_REVIEW_LINKS_ISSUE = "PULL_REQUEST_REVIEW_LINKS_ISSUE"
+    PULL_REQUEST_REVIEW_LINKS_PULL_REQUEST = "PULL_REQUEST_REVIEW_LINKS_PULL_REQUEST"
+    PULL_REQUEST_REVIEW_COMMENT_LINKS_ISSUE = "PULL_REQUEST_REVIEW_COMMENT_LINKS_ISSUE"
+    PULL_REQUEST_REVIEW_COMMENT_LINKS_PULL_REQUEST = "PULL_REQUEST_REVIEW_COMMENT_LINKS_PULL_REQUEST"
+    WORKFLOW_LINKS_ISSUE = "WORKFLOW_LINKS_ISSUE"
+    WORKFLOW_LINKS_PULL_REQUEST = "WORKFLOW_LINKS_PULL_REQUEST"
@@ -1,4 +1,5 @@
 from enum import Enum
+from datetime import datetime, timezone
 
 
 class DATA_TYPE(Enum):
@@ -10,3 +11,47 @@ class DATA_TYPE(Enum):
     INTEGER = "INTEGER"
     FLOAT = "FLOAT"
     BOOLEAN = "BOOLEAN"
+
+
+# Default datetime of empty DATETIME properties (equals datetime('0001-01-01T01:01:01Z') in Cypher)
+DEFAULT_DATETIME = datetime(1, 1, 1, 1, 1, 1, tzinfo=timezone.utc)
+
+
+def convert_csv_value(value, data_type: DATA_TYPE):
+    """
+    Converts a CSV string value into its typed Python value. The conversion is equivalent to the CASE conversions of
+    DBNode.get_cypher_properties, so query parameters and LOAD CSV produce the same database values.
+    :param value: CSV value or None if the column is missing
+    :param data_type: DATA_TYPE of the property
+    :return: str, datetime, int, float, bool, or None if a number cannot be parsed (toInteger/toFloat return null)
+    """
+    if data_type == DATA_TYPE.STRING:
+        return "" if value is None else value
+    elif data_type == DATA_TYPE.BOOLEAN:
+        return value == "True"
+    elif data_type == DATA_TYPE.INTEGER:
+        if value is None or value == "":
+            return -1
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return int(float(value))
+        except (ValueError, OverflowError):
+            return None
+    elif data_type == DATA_TYPE.FLOAT:
+        if value is None or value == "":
+            return -1.0
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    elif data_type == DATA_TYPE.DATETIME:
+        if value is None or value == "":
+            return DEFAULT_DATETIME
+        try:
+            return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    raise Exception(f"[DATA_TYPE] Resolving datatype {data_type} not possible")
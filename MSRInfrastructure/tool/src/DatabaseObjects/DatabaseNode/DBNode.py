@@ -1,7 +1,7 @@
 from abc import abstractmethod, ABC
 from typing import Dict
 from src.DataProcessing.NodeType import NODE_TYPE
-from src.DatabaseObjects.DataTypes import DATA_TYPE
+from src.DatabaseObjects.DataTypes import DATA_TYPE, convert_csv_value
 import hashlib
 from src.Utility.Utility import check_string, check_boolean, check_datetime, check_number_int, check_number_float
 
@@ -132,4 +132,23 @@ class DBNode(ABC):
             property_query_string = format_single_property(key, self.get_cypher_property_type().get(key, None))
             if property_query_string is not None:
                 keys.append(property_query_string)
-        return ", ".join(keys)
\ No newline at end of file
+        return ", ".join(keys)
+
+    def get_cypher_parameter_properties(self):
+        """
+        Constructs a string in the format 'x: row.x, y: row.y, ...' for rows that are already converted with
+        get_parameter_row (e.g., UNWIND $rows AS row)
+        :return: str
+        """
+        return ", ".join([key + ": row." + key for key in self.get_data().keys()])
+
+    def get_parameter_row(self, csv_row: dict) -> dict:
+        """
+        Converts a CSV row of this node type into a dictionary of typed query parameters
+        :param csv_row: dictionary of CSV strings
+        :return: dict
+        """
+        return {
+            key: convert_csv_value(csv_row.get(key, None), self.get_cypher_property_type().get(key, None))
+            for key in self.get_data().keys()
+        }
@@ -14,6 +14,7 @@ class Issue(DBNode):
             "title": "",
             "body": "",
             "state": "",
+            "updatedAt": "",
             "convertedToDiscussion": False
         }
 
@@ -24,6 +25,7 @@ class Issue(DBNode):
             "title": DATA_TYPE.STRING,
             "body": DATA_TYPE.STRING,
             "state": DATA_TYPE.STRING,
+            "updatedAt": DATA_TYPE.DATETIME,
             "convertedToDiscussion": DATA_TYPE.BOOLEAN
         }
 
@@ -18,6 +18,7 @@ class PullRequest(DBNode):
             "locked": "",
             "activeLockReason": "",
             "state": "",
+            "updatedAt": "",
             "baseRepositoryURL": "",
             "headRepositoryURL": "",
             "baseRefOid": "",
@@ -35,6 +36,7 @@ class PullRequest(DBNode):
             "locked": DATA_TYPE.BOOLEAN,
             "activeLockReason": DATA_TYPE.STRING,
             "state": DATA_TYPE.STRING,
+            "updatedAt": DATA_TYPE.DATETIME,
             "baseRepositoryURL": DATA_TYPE.STRING,
             "headRepositoryURL": DATA_TYPE.STRING,
             "baseRefOid": DATA_TYPE.STRING,
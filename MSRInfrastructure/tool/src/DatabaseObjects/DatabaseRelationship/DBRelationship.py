@@ -2,7 +2,7 @@ from abc import abstractmethod, ABC
 from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
 from typing import Optional, Dict
 from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
-from src.DatabaseObjects.DataTypes import DATA_TYPE
+from src.DatabaseObjects.DataTypes import DATA_TYPE, convert_csv_value
 import hashlib
 
 
@@ -34,11 +34,24 @@ class DBRelationship(ABC):
         Hashes relationship source, destination nodes and  key/value attributes to unique value
         :return:
         """
-        relationship_data = "|".join([key + ":" + str(value) for key, value in self.get_data().items()])
-        hash_data = self.get_unique_source_node_id() + ":" + relationship_data + ":" + self.get_unique_destination_node_id()
-        hash_value = hashlib.sha256(hash_data.encode())
+        hash_value = hashlib.sha256(self._get_hash_data().encode())
         return hash_value.hexdigest()
 
+    def digest_relationship(self) -> bytes:
+        """
+        Compact binary digest of relationship source, destination nodes and key/value attributes
+        :return: 16 bytes
+        """
+        return hashlib.blake2b(self._get_hash_data().encode(), digest_size=16).digest()
+
+    def _get_hash_data(self) -> str:
+        """
+        Joins source node id, key/value attributes and destination node id into the string that identifies the
+        relationship
+        """
+        relationship_data = "|".join([key + ":" + str(value) for key, value in self.get_data().items()])
+        return self.get_unique_source_node_id() + ":" + relationship_data + ":" + self.get_unique_destination_node_id()
+
     @abstractmethod
     def get_data(self):
         """
@@ -62,6 +75,13 @@ class DBRelationship(ABC):
         """
         pass
 
+    def get_cypher_relationship_name(self) -> str:
+        """
+        Returns the relationship name in the database (DEFAULT: the relationship type value)
+        :return: str
+        """
+        return self.get_relationship_type().value
+
     def get_relationship_name(self) -> str:
         """
         Returns the relationship name (Class name)
@@ -133,3 +153,27 @@ class DBRelationship(ABC):
                 raise Exception(f"[DB Node] Resolving datatype of {property_name} ({property_type.value}) not possible")
         keys = [format_single_property(key, self._get_cypher_property_type().get(key, None)) for key in self.get_data().keys()]
         return ", ".join(keys)
+
+    def get_cypher_parameter_properties(self):
+        """
+        Constructs a string in the format 'x: row.x, y: row.y, ...' for rows that are already converted with
+        get_parameter_row (e.g., UNWIND $rows AS row)
+        :return: str
+        """
+        return ", ".join([key + ": row." + key for key in self.get_data().keys()])
+
+    def get_parameter_row(self, csv_row: dict) -> dict:
+        """
+        Converts a CSV row of this relationship type into a dictionary of typed query parameters
+        :param csv_row: dictionary of CSV strings
+        :return: dict
+        """
+        parameter_row = {
+            key: convert_csv_value(csv_row.get(key, None), self._get_cypher_property_type().get(key, None))
+            for key in self.get_data().keys()
+        }
+        parameter_row.update({
+            "source_id": csv_row.get("source_id"),
+            "destination_id": csv_row.get("destination_id")
+        })
+        return parameter_row
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
 from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
 from src.DatabaseObjects.DataTypes import DATA_TYPE
@@ -241,6 +241,36 @@ class PullRequestProposesFileChange(DBRelationship):
         return self.data
 
 
+class PullRequestFileAfterMerge(DBRelationship):
+    """
+    Links a pull request file to the file node after the pull request merge. The pull request file id is a hash of
+    the complete file content, therefore, the relationship can be created from the id only.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+        self.source_node_id: Optional[str] = None
+
+    def set_source_node_id(self, source_node_id: str):
+        self.source_node_id = source_node_id
+        return self
+
+    def get_unique_source_node_id(self) -> str:
+        if self.source_node_id is not None:
+            return self.source_node_id
+        return super().get_unique_source_node_id()
+
+    def _get_cypher_property_type(self) -> Dict[str, DATA_TYPE]:
+        return {}
+
+    def get_relationship_type(self) -> RELATIONSHIP_TYPE:
+        return RELATIONSHIP_TYPE.PULL_REQUEST_FILE_AFTER_MERGE
+
+    def get_data(self) -> dict:
+        return self.data
+
+
 class PullRequestHasSourceBranch(DBRelationship):
 
     def __init__(self):
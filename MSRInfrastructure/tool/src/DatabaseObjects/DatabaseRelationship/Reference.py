@@ -0,0 +1,122 @@
+from typing import Dict, List
+from src.DataProcessing.NodeType import NODE_TYPE
+from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
+from src.DatabaseObjects.DataTypes import DATA_TYPE
+from src.DatabaseObjects.DatabaseNode.Commit import Commit
+from src.DatabaseObjects.DatabaseNode.Discussion import Discussion, DiscussionComment
+from src.DatabaseObjects.DatabaseNode.Issue import Issue
+from src.DatabaseObjects.DatabaseNode.Milestone import Milestone
+from src.DatabaseObjects.DatabaseNode.PullRequest import PullRequest, PullRequestReview, PullRequestReviewComment
+from src.DatabaseObjects.DatabaseNode.Workflow import Workflow
+
+# Node types whose text (message, title, body) can reference issues and pull requests with '#123'
+REFERENCE_SOURCE_NODES = {
+    NODE_TYPE.COMMIT: Commit,
+    NODE_TYPE.DISCUSSION: Discussion,
+    NODE_TYPE.DISCUSSION_COMMENT: DiscussionComment,
+    NODE_TYPE.ISSUE: Issue,
+    NODE_TYPE.MILESTONE: Milestone,
+    NODE_TYPE.PULL_REQUEST: PullRequest,
+    NODE_TYPE.PULL_REQUEST_REVIEW: PullRequestReview,
+    NODE_TYPE.PULL_REQUEST_REVIEW_COMMENT: PullRequestReviewComment,
+    NODE_TYPE.WORKFLOW: Workflow
+}
+
+
+def create_reference_source_node(node_type: NODE_TYPE, node_id: str) -> DBNode:
+    """
+    Creates a node of a reference source type that only contains its unique id
+    """
+    node = REFERENCE_SOURCE_NODES[node_type]()
+    return node.extract_and_update({node.get_key_name(): node_id})
+
+
+class LinksIssue(DBRelationship):
+    """
+    A node references an issue (e.g., 'fixes #123'). Every source node type has its own RELATIONSHIP_TYPE (file),
+    but all of them are inserted as LINKS_ISSUE relationships.
+    """
+
+    _RELATIONSHIP_TYPES = {
+        NODE_TYPE.COMMIT: RELATIONSHIP_TYPE.COMMIT_LINKS_ISSUE,
+        NODE_TYPE.DISCUSSION: RELATIONSHIP_TYPE.DISCUSSION_LINKS_ISSUE,
+        NODE_TYPE.DISCUSSION_COMMENT: RELATIONSHIP_TYPE.DISCUSSION_COMMENT_LINKS_ISSUE,
+        NODE_TYPE.ISSUE: RELATIONSHIP_TYPE.ISSUE_LINKS_ISSUE,
+        NODE_TYPE.MILESTONE: RELATIONSHIP_TYPE.MILESTONE_LINKS_ISSUE,
+        NODE_TYPE.PULL_REQUEST: RELATIONSHIP_TYPE.PULL_REQUEST_LINKS_ISSUE,
+        NODE_TYPE.PULL_REQUEST_REVIEW: RELATIONSHIP_TYPE.PULL_REQUEST_REVIEW_LINKS_ISSUE,
+        NODE_TYPE.PULL_REQUEST_REVIEW_COMMENT: RELATIONSHIP_TYPE.PULL_REQUEST_REVIEW_COMMENT_LINKS_ISSUE,
+        NODE_TYPE.WORKFLOW: RELATIONSHIP_TYPE.WORKFLOW_LINKS_ISSUE
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.data = {
+            "action": ""
+        }
+
+    def _get_cypher_property_type(self) -> Dict[str, DATA_TYPE]:
+        return {
+            "action": DATA_TYPE.STRING
+        }
+
+    def get_relationship_type(self) -> RELATIONSHIP_TYPE:
+        return LinksIssue._RELATIONSHIP_TYPES[self.get_source_node().get_node_type()]
+
+    def get_cypher_relationship_name(self) -> str:
+        return "LINKS_ISSUE"
+
+    def get_data(self) -> dict:
+        return self.data
+
+
+class LinksPullRequest(DBRelationship):
+    """
+    A node references a pull request (e.g., 'fixes #123'). Every source node type has its own RELATIONSHIP_TYPE
+    (file), but all of them are inserted as LINKS_PULL_REQUEST relationships.
+    """
+
+    _RELATIONSHIP_TYPES = {
+        NODE_TYPE.COMMIT: RELATIONSHIP_TYPE.COMMIT_LINKS_PULL_REQUEST,
+        NODE_TYPE.DISCUSSION: RELATIONSHIP_TYPE.DISCUSSION_LINKS_PULL_REQUEST,
+        NODE_TYPE.DISCUSSION_COMMENT: RELATIONSHIP_TYPE.DISCUSSION_COMMENT_LINKS_PULL_REQUEST,
+        NODE_TYPE.ISSUE: RELATIONSHIP_TYPE.ISSUE_LINKS_PULL_REQUEST,
+        NODE_TYPE.MILESTONE: RELATIONSHIP_TYPE.MILESTONE_LINKS_PULL_REQUEST,
+        NODE_TYPE.PULL_REQUEST: RELATIONSHIP_TYPE.PULL_REQUEST_LINKS_PULL_REQUEST,
+        NODE_TYPE.PULL_REQUEST_REVIEW: RELATIONSHIP_TYPE.PULL_REQUEST_REVIEW_LINKS_PULL_REQUEST,
+        NODE_TYPE.PULL_REQUEST_REVIEW_COMMENT: RELATIONSHIP_TYPE.PULL_REQUEST_REVIEW_COMMENT_LINKS_PULL_REQUEST,
+        NODE_TYPE.WORKFLOW: RELATIONSHIP_TYPE.WORKFLOW_LINKS_PULL_REQUEST
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.data = {
+            "action": ""
+        }
+
+    def _get_cypher_property_type(self) -> Dict[str, DATA_TYPE]:
+        return {
+            "action": DATA_TYPE.STRING
+        }
+
+    def get_relationship_type(self) -> RELATIONSHIP_TYPE:
+        return LinksPullRequest._RELATIONSHIP_TYPES[self.get_source_node().get_node_type()]
+
+    def get_cypher_relationship_name(self) -> str:
+        return "LINKS_PULL_REQUEST"
+
+    def get_data(self) -> dict:
+        return self.data
+
+
+def initialize_placeholder_reference_relationships() -> List[DBRelationship]:
+    """
+    Initializes an instance of every LINKS_ISSUE and LINKS_PULL_REQUEST relationship type
+    """
+    placeholders = []
+    for node_class in REFERENCE_SOURCE_NODES.values():
+        placeholders.append(LinksIssue().set_source_node(node_class()).set_destination_node(Issue()))
+        placeholders.append(LinksPullRequest().set_source_node(node_class()).set_destination_node(PullRequest()))
+    return placeholders
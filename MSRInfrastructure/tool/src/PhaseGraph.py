@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from src.Utility.Logger import MSRLogger
+
+
+class PhaseGraph:
+    """
+    PhaseGraph runs the collection phases of a RepositoryCollector as a dependency graph. Every phase belongs to a
+    lane (e.g., the cloned repository, the GraphQL client, or the REST client), as the resources of a lane are not
+    thread-safe. The phases of a lane run one after another in the order they were added. Phases of different lanes run
+    at the same time as soon as all of their dependencies completed.
+    """
+
+    def __init__(self, repo: str):
+        """
+        :param repo: repository full name (owner/name) for logging
+        """
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self._repo: str = repo
+        self._phases: Dict[str, Tuple[str, Callable, List[str]]] = {}  # Phase name -> (lane, phase, dependencies)
+        self._results: Dict[str, object] = {}  # Phase name -> return value of all completed phases
+
+    def add(self, phase_name: str, lane: str, phase: Callable, dependencies: Optional[List[str]] = None):
+        """
+        Adds a phase to the graph
+        :param phase_name: unique name of the phase
+        :param lane: name of the lane that runs the phase
+        :param phase: method without parameters that runs the phase
+        :param dependencies: names of the previously added phases that must complete first
+        """
+        dependencies = [] if dependencies is None else dependencies
+        for dependency in dependencies:
+            if dependency not in self._phases:
+                raise Exception(f"[PhaseGraph] Unknown dependency {dependency} of phase {phase_name}")
+        self._phases[phase_name] = (lane, phase, list(dependencies))
+
+    def get_phase_names(self) -> List[str]:
+        return list(self._phases.keys())
+
+    def get_result(self, phase_name: str):
+        """
+        Returns the return value of a completed phase
+        """
+        return self._results[phase_name]
+
+    def run(self):
+        """
+        Runs all phases and blocks until they completed. After a failed phase, no further phase starts, and the
+        exception is raised once all running phases finished.
+        """
+        lanes = {lane for lane, _, _ in self._phases.values()}
+        executors = {
+            lane: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self._repo}-{lane}") for lane in lanes
+        }
+        pending = list(self._phases.keys())
+        running: Dict[Future, str] = {}
+        busy_lanes: Set[str] = set()
+        failure: Optional[Tuple[str, BaseException]] = None
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                if failure is None:
+                    # Start the next phase of every idle lane whose dependencies completed
+                    for lane in lanes - busy_lanes:
+                        phase_name = next((name for name in pending if self._phases[name][0] == lane), None)
+                        if phase_name is None or \
+                                any([dependency not in self._results for dependency in self._phases[phase_name][2]]):
+                            continue
+                        pending.remove(phase_name)
+                        busy_lanes.add(lane)
+                        running[executors[lane].submit(self._phases[phase_name][1])] = phase_name
+                if len(running) == 0:
+                    if failure is not None:
+                        break
+                    raise Exception(f"[PhaseGraph] Phases {', '.join(pending)} wait for phases that never complete")
+                # Wait until at least one phase finished
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    phase_name = running.pop(future)
+                    busy_lanes.discard(self._phases[phase_name][0])
+                    exception = future.exception()
+                    if exception is not None:
+                        self.logger.error(f"{self._repo} Phase {phase_name} failed {exception}", exc_info=exception)
+                        failure = (phase_name, exception) if failure is None else failure
+                    else:
+                        self._results[phase_name] = future.result()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+        if failure is not None:
+            raise Exception(f"[PhaseGraph] Phase {failure[0]} failed: {failure[1]}") from failure[1]
@@ -0,0 +1,85 @@
+import os
+import json
+import struct
+from typing import Optional, List, Tuple
+
+
+class CollectionCheckpoint:
+    """
+    CollectionCheckpoint persists the progress of a repository collection next to the repository CSV files. A
+    checkpoint consists of a JSON state file and an append only journal of deduplication digests. The JSON file is
+    replaced atomically and stores the journal size, so a crash while writing never leaves an inconsistent checkpoint.
+    """
+
+    # Journal record header: digest kind and length of the type name
+    _RECORD_HEADER = struct.Struct("BB")
+    _DIGEST_SIZE = 16
+
+    def __init__(self, file_location: str, file_prefix: str):
+        self.state_path = file_location + file_prefix + "_checkpoint.json"
+        self.journal_path = file_location + file_prefix + "_deduplication.journal"
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.state_path)
+
+    def load(self) -> Optional[dict]:
+        """
+        Reads the checkpoint state
+        :return: state dictionary or None if no checkpoint exists
+        """
+        if not self.exists():
+            return None
+        with open(self.state_path, "r", encoding="UTF-8") as f:
+            return json.load(f)
+
+    def save(self, state: dict, journal_entries: List[Tuple[int, str, bytes]]):
+        """
+        Appends new deduplication digests to the journal and replaces the checkpoint state afterward
+        :param state: JSON serializable state dictionary
+        :param journal_entries: [(kind, type, digest), ...] added since the last checkpoint
+        """
+        with open(self.journal_path, "ab") as f:
+            for kind, type_name, digest in journal_entries:
+                encoded_type = type_name.encode()
+                f.write(CollectionCheckpoint._RECORD_HEADER.pack(kind, len(encoded_type)))
+                f.write(encoded_type)
+                f.write(digest)
+            f.flush()
+            os.fsync(f.fileno())
+            journal_size = f.tell()
+        state = dict(state, journal_size=journal_size)
+        temporary_path = self.state_path + ".tmp"
+        with open(temporary_path, "w", encoding="UTF-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.state_path)
+
+    def read_journal(self, journal_size: int) -> List[Tuple[int, str, bytes]]:
+        """
+        Truncates the journal to the size stored in the checkpoint and reads all digests
+        :return: [(kind, type, digest), ...]
+        """
+        if not os.path.isfile(self.journal_path):
+            return []
+        os.truncate(self.journal_path, journal_size)
+        entries = []
+        with open(self.journal_path, "rb") as f:
+            data = f.read()
+        position = 0
+        while position < len(data):
+            kind, type_length = CollectionCheckpoint._RECORD_HEADER.unpack_from(data, position)
+            position += CollectionCheckpoint._RECORD_HEADER.size
+            type_name = data[position:position + type_length].decode()
+            position += type_length
+            entries.append((kind, type_name, data[position:position + CollectionCheckpoint._DIGEST_SIZE]))
+            position += CollectionCheckpoint._DIGEST_SIZE
+        return entries
+
+    def delete(self):
+        """
+        Deletes the checkpoint state and journal
+        """
+        for file_path in [self.state_path, self.journal_path, self.state_path + ".tmp"]:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
@@ -0,0 +1,323 @@
+import os
+import sys
+import sqlite3
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Dict, Set, Tuple, List, Optional
+from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+
+
+class DeduplicationStore(ABC):
+    """
+    A DeduplicationStore decides if a node or relationship was already written for a repository. Every
+    PreprocessorStorageInterface owns exactly one instance.
+    With journaling enabled the store records every new digest until take_journal is called. This allows persisting
+    the store incrementally in checkpoints.
+    """
+
+    NODE_DIGEST = 0
+    RELATIONSHIP_DIGEST = 1
+
+    # New digests (kind, type, digest) since the last take_journal call or None if journaling is disabled
+    _journal: Optional[List[Tuple[int, str, bytes]]] = None
+
+    def enable_journal(self):
+        """
+        Starts recording new digests
+        """
+        self._journal = []
+
+    def take_journal(self) -> List[Tuple[int, str, bytes]]:
+        """
+        Returns all digests added since the last call and clears the journal
+        :return: [(kind, type, digest), ...]
+        """
+        journal = self._journal if self._journal is not None else []
+        if self._journal is not None:
+            self._journal = []
+        return journal
+
+    def restore(self, entries: List[Tuple[int, str, bytes]]):
+        """
+        Registers digests of a previous collection without recording them in the journal
+        :param entries: [(kind, type, digest), ...]
+        """
+        for kind, type_name, digest in entries:
+            self._add_digest(kind, type_name, digest)
+
+    def _record(self, kind: int, type_name: str, digest: bytes):
+        if self._journal is not None:
+            self._journal.append((kind, type_name, digest))
+
+    @abstractmethod
+    def _add_digest(self, kind: int, type_name: str, digest: bytes) -> bool:
+        """
+        Registers a digest if it does not exist yet
+        :return: True if the digest is new, False if it already exists
+        """
+        pass
+
+    @abstractmethod
+    def add_node_if_absent(self, node: DBNode) -> bool:
+        """
+        Registers a node if it does not exist yet
+        :return: True if the node is new, False if it already exists
+        """
+        pass
+
+    @abstractmethod
+    def add_relationship_if_absent(self, relationship: DBRelationship) -> bool:
+        """
+        Registers a relationship if it does not exist yet
+        :return: True if the relationship is new, False if it already exists
+        """
+        pass
+
+    @abstractmethod
+    def get_memory_report(self) -> dict:
+        """
+        Returns the number of stored keys and the approximate memory consumption per node and relationship type
+        :return: {"nodes": {type: {"count": int, "bytes": int}}, "relationships": {...}}
+        """
+        pass
+
+    def close(self):
+        """
+        Releases all resources of the store (DEFAULT: nothing to release)
+        """
+        pass
+
+    @staticmethod
+    def node_digest(node: DBNode) -> bytes:
+        """
+        Compact binary digest of the unique node id
+        :return: 16 bytes
+        """
+        return hashlib.blake2b(str(node.get_unique_node_id()).encode(), digest_size=16).digest()
+
+
+class HashIndexedDeduplicationStore(DeduplicationStore):
+    """
+    Keeps one set of binary digests per node and relationship type in memory. Lookup and insertion are a single
+    set operation, so deduplication cost stays constant per insert independent of the repository size.
+    """
+
+    def __init__(self):
+        self.node_digests: Dict[str, Set[bytes]] = {}
+        self.relationship_digests: Dict[str, Set[bytes]] = {}
+
+    def add_node_if_absent(self, node: DBNode) -> bool:
+        node_type = node.get_node_type().value
+        type_digests = self.node_digests.get(node_type, None)
+        if type_digests is None:
+            type_digests = self.node_digests[node_type] = set()
+        digest = DeduplicationStore.node_digest(node)
+        if digest in type_digests:
+            return False
+        type_digests.add(digest)
+        self._record(DeduplicationStore.NODE_DIGEST, node_type, digest)
+        return True
+
+    def add_relationship_if_absent(self, relationship: DBRelationship) -> bool:
+        relationship_type = relationship.get_relationship_type().value
+        type_digests = self.relationship_digests.get(relationship_type, None)
+        if type_digests is None:
+            type_digests = self.relationship_digests[relationship_type] = set()
+        # Hash the relationship exactly once for lookup and insertion
+        digest = relationship.digest_relationship()
+        if digest in type_digests:
+            return False
+        type_digests.add(digest)
+        self._record(DeduplicationStore.RELATIONSHIP_DIGEST, relationship_type, digest)
+        return True
+
+    def _add_digest(self, kind: int, type_name: str, digest: bytes) -> bool:
+        digests = self.node_digests if kind == DeduplicationStore.NODE_DIGEST else self.relationship_digests
+        type_digests = digests.setdefault(type_name, set())
+        if digest in type_digests:
+            return False
+        type_digests.add(digest)
+        return True
+
+    def get_memory_report(self) -> dict:
+        return {
+            "nodes": {
+                node_type: HashIndexedDeduplicationStore._measure(digests)
+                for node_type, digests in self.node_digests.items()
+            },
+            "relationships": {
+                relationship_type: HashIndexedDeduplicationStore._measure(digests)
+                for relationship_type, digests in self.relationship_digests.items()
+            }
+        }
+
+    @staticmethod
+    def _measure(digests: Set[bytes]) -> dict:
+        """
+        Approximates the memory of a digest set (set table plus one bytes object per digest)
+        """
+        digest_size = sys.getsizeof(b"\x00" * 16)
+        return {
+            "count": len(digests),
+            "bytes": sys.getsizeof(digests) + len(digests) * digest_size
+        }
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter over 16 byte digests. The filter never reports a false negative, therefore a negative
+    answer proves that a digest was never added.
+    """
+
+    def __init__(self, size_bytes: int, hash_functions: int = 4):
+        self.size_bits = max(size_bytes, 1) * 8
+        self.hash_functions = hash_functions
+        self.bits = bytearray(max(size_bytes, 1))
+
+    def _positions(self, digest: bytes):
+        """
+        Derives all bit positions of a digest by double hashing the two digest halves
+        """
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:16], "little") | 1
+        return [(first + i * second) % self.size_bits for i in range(self.hash_functions)]
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, digest: bytes) -> bool:
+        for position in self._positions(digest):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def get_size(self) -> int:
+        return len(self.bits)
+
+
+class SpillingDeduplicationStore(DeduplicationStore):
+    """
+    Keeps all digests in an embedded sqlite database on disk and only holds a Bloom filter, the sqlite page cache and
+    a bounded buffer of pending digests in memory. The memory budget is fixed per RepositoryCollector and split into
+    50% Bloom filter, 25% sqlite page cache and 25% pending buffer. New digests (Bloom filter miss) never touch the
+    disk until the pending buffer is full.
+    """
+
+    # Approximate memory of one pending digest inside a set (set slot plus bytes object)
+    _PENDING_ENTRY_SIZE = 100
+
+    def __init__(self, repo_owner: str, repo_name: str, deploy: bool = False, memory_budget_mb: int = 64):
+        budget_bytes = max(memory_budget_mb, 1) * 1024 * 1024
+        self.bloom_filter = BloomFilter(budget_bytes // 2)
+        self.max_pending = max((budget_bytes // 4) // SpillingDeduplicationStore._PENDING_ENTRY_SIZE, 1)
+        # Pending digests per (kind, type) that are not written to the database yet
+        self.pending: Dict[Tuple[int, str], Set[bytes]] = {}
+        self.pending_count = 0
+        # Number of stored digests per (kind, type)
+        self.counts: Dict[Tuple[int, str], int] = {}
+        # Database file location
+        repo_hash = hashlib.sha256((repo_owner + "/" + repo_name).encode()).hexdigest()
+        file_location = "/repo_dedup/" if deploy else "./MSRInfrastructure/dev_data/repo_dedup/"
+        os.makedirs(file_location, exist_ok=True)
+        self.database_path = file_location + repo_hash + ".sqlite"
+        if os.path.isfile(self.database_path):
+            os.remove(self.database_path)
+        # The store is created in the pool thread but used by the collector thread
+        self.connection = sqlite3.connect(self.database_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        # Negative cache size is interpreted by sqlite in KiB
+        self.connection.execute(f"PRAGMA cache_size = -{max((budget_bytes // 4) // 1024, 1)}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            "kind INTEGER NOT NULL, type TEXT NOT NULL, digest BLOB NOT NULL, "
+            "PRIMARY KEY (kind, type, digest)) WITHOUT ROWID"
+        )
+
+    def add_node_if_absent(self, node: DBNode) -> bool:
+        return self._add_if_absent(
+            DeduplicationStore.NODE_DIGEST,
+            node.get_node_type().value,
+            DeduplicationStore.node_digest(node)
+        )
+
+    def add_relationship_if_absent(self, relationship: DBRelationship) -> bool:
+        return self._add_if_absent(
+            DeduplicationStore.RELATIONSHIP_DIGEST,
+            relationship.get_relationship_type().value,
+            relationship.digest_relationship()
+        )
+
+    def _add_if_absent(self, kind: int, type_name: str, digest: bytes) -> bool:
+        if not self._add_digest(kind, type_name, digest):
+            return False
+        self._record(kind, type_name, digest)
+        return True
+
+    def _add_digest(self, kind: int, type_name: str, digest: bytes) -> bool:
+        """
+        Checks the Bloom filter first and only consults the pending buffer and database if the digest might exist
+        :return: True if the digest is new, False if it already exists
+        """
+        key = (kind, type_name)
+        if self.bloom_filter.might_contain(digest):
+            if digest in self.pending.get(key, ()):
+                return False
+            if self._exists_on_disk(kind, type_name, digest):
+                return False
+        self.bloom_filter.add(digest)
+        self.pending.setdefault(key, set()).add(digest)
+        self.pending_count += 1
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self.pending_count >= self.max_pending:
+            self._spill()
+        return True
+
+    def _exists_on_disk(self, kind: int, type_name: str, digest: bytes) -> bool:
+        cursor = self.connection.execute(
+            "SELECT 1 FROM digests WHERE kind = ? AND type = ? AND digest = ?",
+            (kind, type_name, digest)
+        )
+        return cursor.fetchone() is not None
+
+    def _spill(self):
+        """
+        Writes all pending digests into the database and clears the pending buffer
+        """
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO digests (kind, type, digest) VALUES (?, ?, ?)",
+            ((kind, type_name, digest) for (kind, type_name), digests in self.pending.items() for digest in digests)
+        )
+        self.connection.commit()
+        self.pending.clear()
+        self.pending_count = 0
+
+    def get_memory_report(self) -> dict:
+        report = {"nodes": {}, "relationships": {}}
+        for (kind, type_name), count in self.counts.items():
+            pending = len(self.pending.get((kind, type_name), ()))
+            section = "nodes" if kind == DeduplicationStore.NODE_DIGEST else "relationships"
+            report[section][type_name] = {
+                "count": count,
+                "bytes": pending * SpillingDeduplicationStore._PENDING_ENTRY_SIZE
+            }
+        report["budget"] = {
+            "bloom_filter_bytes": self.bloom_filter.get_size(),
+            "pending_digests": self.pending_count,
+            "max_pending_digests": self.max_pending,
+            "disk_bytes": os.path.getsize(self.database_path) if os.path.isfile(self.database_path) else 0
+        }
+        return report
+
+    def close(self):
+        """
+        Closes the database connection and deletes the database file
+        """
+        if self.connection is None:
+            return
+        self.connection.close()
+        self.connection = None
+        if os.path.isfile(self.database_path):
+            os.remove(self.database_path)
@@ -0,0 +1,148 @@
+import csv
+import os
+from typing import Dict, List, Tuple
+
+from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
+from src.DatabaseObjects.DatabaseNode.File import File
+from src.DatabaseObjects.DatabaseNode.PullRequest import PullRequestFile
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+from src.DatabaseObjects.DatabaseRelationship.PullRequest import PullRequestFileAfterMerge
+
+
+class MergeFileIndex:
+    """
+    MergeFileIndex links every pull request file to the file node that the merge commit of its pull request produced
+    at the same path. The index observes the relationships written by the processors (merge commit of a pull request,
+    files after each commit, files of each pull request) and emits FILE_AFTER_MERGE relationships after the collection.
+    This replaces the path join over pull requests, merged events, commits, and file actions in the database.
+    The files after every commit and the files of every pull request are appended to a CSV file next to the repository
+    CSV files instead of memory, as they grow with all file actions of the repository. The file survives sealed and
+    inserted segments and is resolved in two passes after the collection, keeping only the files of merge commits.
+    """
+
+    _COMMIT_FILE = "c"  # Row kind: (commit hash, path, file id)
+    _PULL_REQUEST_FILE = "p"  # Row kind: (pull request id, pull request file id, path)
+
+    def __init__(self, file_path: str):
+        """
+        :param file_path: path of the CSV file of the indexed files
+        """
+        self.file_path: str = file_path
+        self._file = None  # Append handle of the CSV file (opened on the first row)
+        self._writer = None
+        # File action id -> (path, file id) until the commit of the file action is known
+        self.file_action_files: Dict[str, Tuple[str, str]] = {}
+        # Merged event id -> merge commit hash until the pull request of the event is known
+        self.event_commits: Dict[str, str] = {}
+        # Pull request id -> merge commit hash
+        self.merge_commits: Dict[str, str] = {}
+
+    def get_state(self) -> dict:
+        """
+        Returns the index to persist it in a checkpoint. The indexed files are persisted by their file size.
+        """
+        self.close()
+        return {
+            "file_offset": os.path.getsize(self.file_path) if os.path.isfile(self.file_path) else 0,
+            "file_action_files": self.file_action_files,
+            "event_commits": self.event_commits,
+            "merge_commits": self.merge_commits
+        }
+
+    def set_state(self, state: dict):
+        """
+        Restores the index of a checkpoint and removes all files indexed after the checkpoint
+        """
+        self.close()
+        if os.path.isfile(self.file_path):
+            with open(self.file_path, "r+b") as f:
+                f.truncate(state["file_offset"])
+        self.file_action_files = {key: tuple(value) for key, value in state["file_action_files"].items()}
+        self.event_commits = state["event_commits"]
+        self.merge_commits = state["merge_commits"]
+
+    def close(self):
+        """
+        Closes the CSV file of the indexed files. It is reopened on the next row.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _append(self, row: list):
+        if self._file is None:
+            self._file = open(self.file_path, "a", encoding="UTF-8", newline="")
+            self._writer = csv.writer(self._file, delimiter=",", quotechar='"', quoting=csv.QUOTE_ALL)
+        self._writer.writerow(row)
+
+    def _read_rows(self):
+        self.close()
+        if not os.path.isfile(self.file_path):
+            return
+        with open(self.file_path, "r", encoding="UTF-8", newline="") as f:
+            for row in csv.reader(f, delimiter=",", quotechar='"'):
+                yield row
+
+    def extract(self, relationship: DBRelationship):
+        """
+        Updates the index with a newly collected relationship
+        :param relationship: DBRelationship
+        """
+        relationship_type = relationship.get_relationship_type()
+        if relationship_type == RELATIONSHIP_TYPE.FILE_AFTER_ACTION:
+            # FileAction -[AFTER_ACTION]-> File precedes Commit -[PERFORMS]-> FileAction
+            self.file_action_files[relationship.get_unique_source_node_id()] = (
+                relationship.get_destination_node().get_data().get("path", ""),
+                relationship.get_unique_destination_node_id()
+            )
+        elif relationship_type == RELATIONSHIP_TYPE.PERFORMS_FILE_ACTION:
+            file_after_action = self.file_action_files.pop(relationship.get_unique_destination_node_id(), None)
+            if file_after_action is not None:
+                path, file_id = file_after_action
+                self._append([MergeFileIndex._COMMIT_FILE, relationship.get_unique_source_node_id(), path, file_id])
+        elif relationship_type == RELATIONSHIP_TYPE.PULL_REQUEST_EVENT_LINKS_COMMIT:
+            # Only merged events link a commit
+            self.event_commits[relationship.get_unique_source_node_id()] = \
+                relationship.get_unique_destination_node_id()
+        elif relationship_type == RELATIONSHIP_TYPE.PULL_REQUEST_HAS_EVENT:
+            merge_commit = self.event_commits.pop(relationship.get_unique_destination_node_id(), None)
+            if merge_commit is not None:
+                self.merge_commits[relationship.get_unique_source_node_id()] = merge_commit
+        elif relationship_type == RELATIONSHIP_TYPE.PULL_REQUEST_PROPOSES_CHANGE:
+            self._append([
+                MergeFileIndex._PULL_REQUEST_FILE,
+                relationship.get_unique_source_node_id(),
+                relationship.get_unique_destination_node_id(),
+                relationship.get_destination_node().get_data().get("path", "")
+            ])
+
+    def get_relationships(self) -> List[DBRelationship]:
+        """
+        Resolves the file after the merge for every file of a merged pull request. Files the merge commit did not
+        touch (e.g., squash merges of other paths) are skipped.
+        :return: list of PullRequestFileAfterMerge relationships
+        """
+        # First pass: files after the merge commits -> Merge commit hash -> path -> file id
+        merge_commits = set(self.merge_commits.values())
+        merge_commit_files: Dict[str, Dict[str, str]] = {}
+        for row in self._read_rows():
+            if row[0] == MergeFileIndex._COMMIT_FILE and row[1] in merge_commits:
+                merge_commit_files.setdefault(row[1], {})[row[2]] = row[3]
+        # Second pass: files of merged pull requests
+        relationships = []
+        for row in self._read_rows():
+            if row[0] != MergeFileIndex._PULL_REQUEST_FILE:
+                continue
+            pull_request_id, pull_request_file_id, path = row[1], row[2], row[3]
+            merge_commit = self.merge_commits.get(pull_request_id, None)
+            file_id = merge_commit_files.get(merge_commit, {}).get(path, None)
+            if file_id is None:
+                continue
+            relationships.append(
+                PullRequestFileAfterMerge()
+                .set_source_node(PullRequestFile())
+                .set_source_node_id(pull_request_file_id)
+                .set_destination_node(File().extract_and_update({"fileId": file_id}))
+            )
+        return relationships
@@ -1,8 +1,15 @@
+import threading
+
 from src.PreprocessorStorage.RepositoryContainer import RepositoryContainer
 from src.PreprocessorStorage.RepositoryFileHandler import RepositoryFileHandler
+from src.PreprocessorStorage.CollectionCheckpoint import CollectionCheckpoint
+from src.PreprocessorStorage.ReferenceLinker import ReferenceLinker
+from src.PreprocessorStorage.MergeFileIndex import MergeFileIndex
+from src.PreprocessorStorage.DeduplicationStore import DeduplicationStore, HashIndexedDeduplicationStore, \
+    SpillingDeduplicationStore
 from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
 from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
-from typing import Union
+from typing import Union, Optional
 from src.DataProcessing.NodeType import NODE_TYPE
 from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
 
@@ -10,14 +17,106 @@ from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
 class PreprocessorStorageInterface:
     """
     Interface for interacting and modifying the in-memory repository version and repository CSV files.
+    All methods that processors call are serialized, so collection phases of one repository can process their data
+    in parallel threads.
     """
 
-    def __init__(self, repo_owner: str, repo_name: str, deploy: bool = False):
+    def __init__(self, repo_owner: str, repo_name: str, deploy: bool = False, csv_writer_pool: bool = False,
+                 deduplication_backend: str = "memory", deduplication_memory_budget_mb: int = 64,
+                 csv_compression: str = "none", checkpoints: bool = False):
         self.deploy = deploy
         self.repo_owner = repo_owner
         self.repo_name = repo_name
-        self._file_handler = RepositoryFileHandler(repo_owner=repo_owner, repo_name=repo_name, deploy=deploy)
+        self._lock = threading.RLock()  # Serializes modifications of concurrently running collection phases
+        self._file_handler = RepositoryFileHandler(
+            repo_owner=repo_owner,
+            repo_name=repo_name,
+            deploy=deploy,
+            writer_pool=csv_writer_pool,
+            compression=csv_compression
+        )
         self._repository_container = RepositoryContainer()
+        self._reference_linker = ReferenceLinker()
+        self._merge_file_index = MergeFileIndex(
+            self._file_handler.get_file_location() + self._file_handler.repo_to_hash() + "_merge_files.csv"
+        )
+        self._deduplication_store: DeduplicationStore = PreprocessorStorageInterface._create_deduplication_store(
+            repo_owner,
+            repo_name,
+            deploy,
+            deduplication_backend,
+            deduplication_memory_budget_mb
+        )
+        # Checkpoints are stored next to the CSV files, so they survive a restart of the collector
+        self._checkpoint: Optional[CollectionCheckpoint] = None
+        if checkpoints:
+            self._checkpoint = CollectionCheckpoint(
+                self._file_handler.get_file_location(),
+                self._file_handler.repo_to_hash()
+            )
+            self._deduplication_store.enable_journal()
+
+    @staticmethod
+    def _create_deduplication_store(repo_owner: str, repo_name: str, deploy: bool, backend: str,
+                                    memory_budget_mb: int) -> DeduplicationStore:
+        """
+        Creates the deduplication store selected in the configuration
+        :param backend: "memory" keeps all keys in RAM, "disk" spills keys into an embedded database
+        :param memory_budget_mb: fixed RAM budget of the "disk" backend
+        """
+        if backend == "disk":
+            return SpillingDeduplicationStore(repo_owner, repo_name, deploy, memory_budget_mb)
+        if backend != "memory":
+            raise Exception(f"[PreprocessorStorage] Unknown deduplication backend {backend}")
+        return HashIndexedDeduplicationStore()
+
+    def has_checkpoint(self) -> bool:
+        """
+        Returns True if a checkpoint of a previous collection exists
+        """
+        return self._checkpoint is not None and self._checkpoint.exists()
+
+    def save_checkpoint(self, collection_state: dict):
+        """
+        Persists the collection progress together with the CSV file offsets, the generated ids and all deduplication
+        digests that were added since the last checkpoint
+        :param collection_state: JSON serializable state of the RepositoryCollector
+        """
+        with self._lock:
+            if self._checkpoint is None:
+                return
+            self._checkpoint.save({
+                "collection": collection_state,
+                "file_offsets": self._file_handler.get_file_offsets(),
+                "row_counts": self._file_handler.get_row_counts(),
+                "container": self._repository_container.get_state(),
+                "references": self._reference_linker.get_state(),
+                "merge_files": self._merge_file_index.get_state()
+            }, self._deduplication_store.take_journal())
+
+    def load_checkpoint(self) -> Optional[dict]:
+        """
+        Restores CSV files, generated ids, and deduplication digests of the last checkpoint. All rows written after
+        the checkpoint are removed from the CSV files.
+        :return: state of the RepositoryCollector or None if there is no checkpoint
+        """
+        if not self.has_checkpoint():
+            return None
+        state = self._checkpoint.load()
+        self._file_handler.truncate_files(state["file_offsets"])
+        self._file_handler.set_row_counts(state["row_counts"])
+        self._repository_container.set_state(state["container"])
+        self._reference_linker.set_state(state["references"])
+        self._merge_file_index.set_state(state["merge_files"])
+        self._deduplication_store.restore(self._checkpoint.read_journal(state["journal_size"]))
+        return state["collection"]
+
+    def delete_checkpoint(self):
+        """
+        Deletes the checkpoint after a completed collection
+        """
+        if self._checkpoint is not None:
+            self._checkpoint.delete()
 
     def get_file_size(self):
         """
@@ -26,54 +125,154 @@ class PreprocessorStorageInterface:
         """
         return self._file_handler.get_file_size()
 
+    def get_compression_report(self):
+        """
+        Retrieve the raw and compressed file size of all repository files
+        :return: dict
+        """
+        return self._file_handler.get_compression_report()
+
     def delete_all_files(self):
         """
         Deletes all files corresponding to this repository mining process
         :return:
         """
+        self._merge_file_index.close()
         self._file_handler.delete_files()
 
-    def get_file_name_neo4j(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]):
+    def flush_files(self):
+        """
+        Writes all buffered CSV content to disk (e.g., at the end of a collection phase)
+        """
+        with self._lock:
+            self._file_handler.flush_files()
+
+    def close_files(self):
+        """
+        Closes all open CSV files. Necessary before the database reads the files.
+        """
+        self._file_handler.close_files()
+        self._merge_file_index.close()
+
+    def close_deduplication_store(self):
+        """
+        Releases the deduplication store after the collection finished
+        """
+        self._deduplication_store.close()
+
+    def get_deduplication_memory_report(self):
+        """
+        Retrieve the number of deduplication keys and their approximate memory consumption per type
+        :return: dict
+        """
+        return self._deduplication_store.get_memory_report()
+
+    def seal_segment(self, segment: int):
+        """
+        Seals all current CSV files into a segment that can be inserted while the collection continues
+        :param segment: consecutive segment number
+        :return: True if the segment contains at least one file
+        """
+        return self._file_handler.seal_segment(segment)
+
+    def delete_segment(self, segment: int):
+        """
+        Deletes all files of an inserted segment
+        """
+        self._file_handler.delete_segment(segment)
+
+    def get_file_name_neo4j(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
         """
         Generates file path in the neo4j format 'file:///{filename}' or None if file does not exist
         :param file_type:
+        :param segment: segment number of a sealed segment or None for the current file
         :return:
         """
-        return self._file_handler.get_file_name_neo4j(file_type)
+        return self._file_handler.get_file_name_neo4j(file_type, segment)
+
+    def read_rows(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
+        """
+        Generator over all rows of a node or relationship CSV file
+        :param file_type: NODE_TYPE or RELATIONSHIP_TYPE
+        :param segment: segment number of a sealed segment or None for the current file
+        :return: Each iteration a dictionary of CSV strings
+        """
+        return self._file_handler.read_rows(file_type, segment)
+
+    def get_row_statistics(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
+        """
+        Returns the number of data rows and the staged bytes of a node or relationship file
+        :param segment: segment number of a sealed segment or None for the current file
+        :return: (rows or None if unknown, bytes)
+        """
+        return self._file_handler.get_row_statistics(file_type, segment)
 
     def add_node(self, node: DBNode):
         """
         Adds a node to the in memory storage and write the node into a CSV file
         :param node: DBNode
         """
-        # Return if the node exists already
-        node_exists = self._repository_container.node_exists(node)
-        if node_exists:
-            return
-        # Write the node into CSV file and in memory storage
-        self._file_handler.append_node(node)
-        self._repository_container.add_node(node)
+        with self._lock:
+            # Register the node in the deduplication store and return if the node exists already
+            if not self._deduplication_store.add_node_if_absent(node):
+                return
+            # Remember issue/pull request references of the node
+            self._reference_linker.extract(node)
+            # Write the node into CSV file
+            self._file_handler.append_node(node)
 
     def add_relationship(self, relationship: DBRelationship):
         """
         Adds a hashed relationships to the in memory storage and write the relationship into a CSV file
         :param relationship: DBRelationship
         """
-        # Return if the relationship exists already
-        relationship_exists = self._repository_container.relationship_exists(relationship)
-        if relationship_exists:
-            # If relationship exists we skip it
-            return
-        # If relationship does not exist write the node into CSV file and in memory storage
-        self._file_handler.append_relationship(relationship)
-        self._repository_container.add_relationship(relationship)
+        with self._lock:
+            # Register the relationship in the deduplication store and skip it if it exists already
+            if not self._deduplication_store.add_relationship_if_absent(relationship):
+                return
+            # Index merge commits, files after commits, and pull request files
+            self._merge_file_index.extract(relationship)
+            # If relationship does not exist write the relationship into CSV file
+            self._file_handler.append_relationship(relationship)
+
+    def add_reference_links(self):
+        """
+        Resolves all issue/pull request references of the collected nodes and writes them as relationships. Requires
+        that all issues and pull requests are collected.
+        """
+        with self._lock:
+            for relationship in self._reference_linker.get_relationships():
+                self.add_relationship(relationship)
+
+    def add_merge_file_links(self):
+        """
+        Links every pull request file to the file node after the pull request merge. Requires that all commits,
+        file actions, and pull requests are collected.
+        """
+        with self._lock:
+            for relationship in self._merge_file_index.get_relationships():
+                self.add_relationship(relationship)
+
+    def seed_collected_state(self, project_id: str, branch_ids: dict, time_aggregator_ids: dict, issue_ids: dict,
+                             pull_request_ids: dict):
+        """
+        Seeds the in memory repository with the node ids of a previous collection (incremental collection)
+        :param branch_ids: branch name -> node id
+        :param time_aggregator_ids: 'issue'/'pullRequest'/'commit' -> 'YYYY-MM' -> node id
+        :param issue_ids: issue number -> node id
+        :param pull_request_ids: pull request number -> node id
+        """
+        with self._lock:
+            self._repository_container.seed_ids(project_id, branch_ids, time_aggregator_ids)
+            self._reference_linker.seed_numbers(issue_ids, pull_request_ids)
 
     def get_branch_id(self, project_id: str, branch_name: str):
         """
         Constructs out of the branch name and project id a unique node id
         :return: node_id
         """
-        return self._repository_container.get_branch_id(project_id, branch_name)
+        with self._lock:
+            return self._repository_container.get_branch_id(project_id, branch_name)
 
     def get_issue_time_aggregator_id(self, time: str):
         """
@@ -81,7 +280,8 @@ class PreprocessorStorageInterface:
         :param time: Expects time in the format 'YYYY-MM-DDTHH:MM:SSZ'
         :return: the uuid of the issue time aggregator node
         """
-        return self._repository_container.get_issue_time_aggregator_id(time)
+        with self._lock:
+            return self._repository_container.get_issue_time_aggregator_id(time)
 
     def get_pull_request_time_aggregator_id(self, time: str):
         """
@@ -89,7 +289,8 @@ class PreprocessorStorageInterface:
         :param time: Expects time in the format 'YYYY-MM-DDTHH:MM:SSZ'
         :return: the uuid of the pull request time aggregator node
         """
-        return self._repository_container.get_pull_request_time_aggregator_id(time)
+        with self._lock:
+            return self._repository_container.get_pull_request_time_aggregator_id(time)
 
     def get_commit_time_aggregator_id(self, time: str):
         """
@@ -97,4 +298,5 @@ class PreprocessorStorageInterface:
         :param time: Expects time in the format 'YYYY-MM-DDTHH:MM:SSZ'
         :return: the uuid of the commit time aggregator node
         """
-        return self._repository_container.get_commit_time_aggregator_id(time)
+        with self._lock:
+            return self._repository_container.get_commit_time_aggregator_id(time)
@@ -0,0 +1,115 @@
+import re
+from typing import Dict, List, Set, Tuple
+
+from src.DataProcessing.NodeType import NODE_TYPE
+from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
+from src.DatabaseObjects.DatabaseNode.Issue import Issue
+from src.DatabaseObjects.DatabaseNode.PullRequest import PullRequest
+from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
+from src.DatabaseObjects.DatabaseRelationship.Reference import REFERENCE_SOURCE_NODES, LinksIssue, \
+    LinksPullRequest, create_reference_source_node
+from src.Utility.Utility import check_number_int
+
+
+class ReferenceLinker:
+    """
+    ReferenceLinker finds references to issues and pull requests (e.g., 'fixes #234' or only '#234') in the message,
+    title, and body of collected nodes. References are resolved into LINKS_ISSUE and LINKS_PULL_REQUEST relationships
+    after the collection, when the numbers of all issues and pull requests of the repository are known. This replaces
+    the repository wide regular expression scan in the database after the insertion.
+    """
+
+    # Every '#<number>' reference that stands at the beginning of a word, optionally preceded by an action keyword
+    REFERENCE_PATTERN = re.compile(
+        r"(?i)(?:\b(fix|fixes|fixed|close|closes|closed|resolve|resolves|resolved) )?(?<!\S)#(\d+)"
+    )
+    TEXT_PROPERTIES = ["message", "title", "body"]
+    NO_ACTION = "NO_ACTION"
+
+    def __init__(self):
+        # (source node type value, source node id, referenced number, action)
+        self.references: Set[Tuple[str, str, int, str]] = set()
+        # Issue and pull request numbers to node ids
+        self.issue_ids: Dict[int, str] = {}
+        self.pull_request_ids: Dict[int, str] = {}
+
+    def get_state(self) -> dict:
+        """
+        Returns all references and numbers to persist them in a checkpoint
+        """
+        return {
+            "references": [list(reference) for reference in self.references],
+            "issue_ids": [[number, node_id] for number, node_id in self.issue_ids.items()],
+            "pull_request_ids": [[number, node_id] for number, node_id in self.pull_request_ids.items()]
+        }
+
+    def set_state(self, state: dict):
+        """
+        Restores all references and numbers of a checkpoint
+        """
+        self.references = set(tuple(reference) for reference in state["references"])
+        self.issue_ids = {number: node_id for number, node_id in state["issue_ids"]}
+        self.pull_request_ids = {number: node_id for number, node_id in state["pull_request_ids"]}
+
+    def seed_numbers(self, issue_ids: Dict[int, str], pull_request_ids: Dict[int, str]):
+        """
+        Registers the issues and pull requests of a previous collection, so new nodes can reference them
+        """
+        self.issue_ids.update(issue_ids)
+        self.pull_request_ids.update(pull_request_ids)
+
+    def extract(self, node: DBNode):
+        """
+        Registers issue/pull request numbers and extracts all references of a newly collected node
+        :param node: DBNode
+        """
+        node_type = node.get_node_type()
+        if node_type == NODE_TYPE.ISSUE:
+            self._register_number(self.issue_ids, node)
+        elif node_type == NODE_TYPE.PULL_REQUEST:
+            self._register_number(self.pull_request_ids, node)
+        if node_type not in REFERENCE_SOURCE_NODES:
+            return
+        node_id = node.get_unique_node_id()
+        for property_name in ReferenceLinker.TEXT_PROPERTIES:
+            text = node.get_data().get(property_name, None)
+            if not isinstance(text, str) or "#" not in text:
+                continue
+            for action, number in ReferenceLinker.REFERENCE_PATTERN.findall(text):
+                self.references.add((
+                    node_type.value,
+                    node_id,
+                    int(number),
+                    action if action != "" else ReferenceLinker.NO_ACTION
+                ))
+
+    def get_relationships(self) -> List[DBRelationship]:
+        """
+        Resolves all references to issues and pull requests of the repository. References to unknown numbers
+        (e.g., other repositories or deleted issues) are dropped.
+        :return: list of LinksIssue and LinksPullRequest relationships
+        """
+        relationships = []
+        for node_type_value, node_id, number, action in sorted(self.references):
+            source_node = create_reference_source_node(NODE_TYPE(node_type_value), node_id)
+            if number in self.issue_ids:
+                links_issue = LinksIssue()
+                links_issue.extract_and_update({"action": action})
+                links_issue.set_source_node(source_node)
+                links_issue.set_destination_node(Issue().extract_and_update({"id": self.issue_ids[number]}))
+                relationships.append(links_issue)
+            if number in self.pull_request_ids:
+                links_pull_request = LinksPullRequest()
+                links_pull_request.extract_and_update({"action": action})
+                links_pull_request.set_source_node(source_node)
+                links_pull_request.set_destination_node(
+                    PullRequest().extract_and_update({"id": self.pull_request_ids[number]}))
+                relationships.append(links_pull_request)
+        return relationships
+
+    @staticmethod
+    def _register_number(numbers: Dict[int, str], node: DBNode):
+        number = check_number_int(node.get_data().get("number", None))
+        if number < 0:
+            return
+        numbers[number] = node.get_unique_node_id()
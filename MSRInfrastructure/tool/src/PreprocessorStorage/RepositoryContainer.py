@@ -1,17 +1,13 @@
-from src.DatabaseObjects.DatabaseNode.DBNode import DBNode
 from uuid import uuid4
-from src.DatabaseObjects.DatabaseRelationship.DBRelationship import DBRelationship
 
 
 class RepositoryContainer:
     """
-    RepositoryContainer manages the in memory version of a repository.
+    RepositoryContainer manages the in memory version of a repository. Node and relationship deduplication is handled
+    by the DeduplicationStore.
     """
 
     def __init__(self):
-        # Node and relationship container store ID's content hashes to determine if a node or relationship already exist
-        self.repository_node_container = {}
-        self.repository_relationship_container = {}
         # ID's for the time aggregation nodes as they have no unique ID from GitHub
         self.time_aggregator_ids = {
             "issue": {},
@@ -21,6 +17,33 @@ class RepositoryContainer:
         # ID's for the branch nodes as they have no unique ID from GitHub
         self.branch_ids = {}
 
+    def get_state(self) -> dict:
+        """
+        Returns all generated ids to persist them in a checkpoint
+        """
+        return {
+            "time_aggregator_ids": self.time_aggregator_ids,
+            "branch_ids": self.branch_ids
+        }
+
+    def set_state(self, state: dict):
+        """
+        Restores all generated ids of a checkpoint
+        """
+        self.time_aggregator_ids = state["time_aggregator_ids"]
+        self.branch_ids = state["branch_ids"]
+
+    def seed_ids(self, project_id: str, branch_ids: dict, time_aggregator_ids: dict):
+        """
+        Reuses the node ids of a previous collection, so recollected branches and time aggregation nodes keep their ids
+        :param branch_ids: branch name -> node id
+        :param time_aggregator_ids: 'issue'/'pullRequest'/'commit' -> 'YYYY-MM' -> node id
+        """
+        for branch_name, node_id in branch_ids.items():
+            self.branch_ids[project_id + branch_name] = node_id
+        for time_aggregator, node_ids in time_aggregator_ids.items():
+            self.time_aggregator_ids[time_aggregator].update(node_ids)
+
     def get_branch_id(self, project_id: str, branch_name: str):
         """
         Constructs out of the branch and project name a unique node id
@@ -60,61 +83,3 @@ class RepositoryContainer:
         if time[:7] not in self.time_aggregator_ids["commit"].keys():
             self.time_aggregator_ids["commit"][time[:7]] = str(uuid4())
         return self.time_aggregator_ids["commit"][time[:7]]
-
-    def add_relationship(self, relationship: DBRelationship):
-        """
-        Add source node ID and relationship hash to the in memory repository relationships
-        Why hash? between the same node ids sometimes multiple relationships exist and relationship content is
-        included in the hashed value
-        """
-        source_node = relationship.get_source_node()
-        source_node_id = source_node.get_unique_node_id()
-        relationship_hash = relationship.hash_relationship()
-        relationship_type = relationship.get_relationship_type()
-
-        # Create relationship dictionary if it is not existent
-        if relationship_type not in self.repository_relationship_container.keys():
-            self.repository_relationship_container[relationship_type] = {}
-        # Retrieve current relationship container and append relationship
-        relationship_type_container = self.repository_relationship_container[relationship_type]
-        if relationship.get_source_node().get_unique_node_id() in relationship_type_container.keys():
-            relationship_type_container[source_node_id].append(relationship_hash)
-        else:
-            relationship_type_container[source_node_id] = [relationship_hash]
-
-    def add_node(self, node: DBNode):
-        """
-        Appends a node to the in memory repository version
-        """
-        if node.get_node_type().value not in self.repository_node_container:
-            self.repository_node_container[node.get_node_type().value] = [node.get_unique_node_id()]
-        else:
-            self.repository_node_container[node.get_node_type().value].append(node.get_unique_node_id())
-
-    def node_exists(self, node: DBNode):
-        """
-        Returns true if a node already exists
-        """
-        if node.get_node_type().value in self.repository_node_container:
-            if node.get_unique_node_id() in self.repository_node_container[node.get_node_type().value]:
-                return True
-        return False
-
-    def relationship_exists(self, relationship: DBRelationship):
-        """
-        Returns true if a relationship already exists
-        """
-        source_node = relationship.get_source_node()
-        source_node_id = source_node.get_unique_node_id()
-        relationship_hash = relationship.hash_relationship()
-        relationship_type = relationship.get_relationship_type()
-
-        # Check if relationship dictionary for this relationship type is not existent
-        if relationship_type not in self.repository_relationship_container.keys():
-            return False
-        # Check if the relationship exists withing the relationship type container
-        relationship_type_container = self.repository_relationship_container[relationship_type]
-        if source_node_id in relationship_type_container.keys():
-            if relationship_hash in relationship_type_container[source_node_id]:
-                return True
-        return False
@@ -1,29 +1,85 @@
 import os
+import glob
+import gzip
 import hashlib
 import csv
 import src.DatabaseObjects.DatabaseNode.DBNode as DBNode
 import src.DatabaseObjects.DatabaseRelationship.DBRelationship as DBRelationship
-from typing import Union
+from typing import Union, Dict, Tuple, TextIO, Optional
 from src.DataProcessing.NodeType import NODE_TYPE
 from src.DataProcessing.RelationshipType import RELATIONSHIP_TYPE
 
 
+class _RawSizeCounter:
+    """
+    Wraps a compressed text file handle and counts the uncompressed bytes written through it
+    """
+
+    def __init__(self, file_handle: TextIO):
+        self.file_handle = file_handle
+        self.raw_bytes = 0
+
+    def write(self, text: str):
+        self.raw_bytes += len(text.encode("UTF-8"))
+        return self.file_handle.write(text)
+
+    def flush(self):
+        self.file_handle.flush()
+
+    def close(self):
+        self.file_handle.close()
+
+
 class RepositoryFileHandler:
     """
     RepositoryFileHandler manages and writes to repository CSV files. Every repository RepositoryCollector has its own
     instance.
+    In writer pool mode the handler keeps one buffered file handle and csv writer per node/relationship type open
+    until flush_files/close_files is called instead of reopening the file for every row.
+    With gzip compression the files are written as '.csv.gz' files that Neo4J LOAD CSV decompresses transparently.
+    Sealing a segment renames all current files to segment files, so they can be inserted while the collection
+    continues writing to new files.
     """
 
-    def __init__(self, repo_owner: str, repo_name: str, deploy: bool = False):
+    # Buffer size of pooled file handles in bytes
+    _POOL_BUFFER_SIZE = 1024 * 1024
+    # Gzip compression level (trades little compression for a high write throughput)
+    _GZIP_COMPRESS_LEVEL = 3
+    # Supported staging file compressions and their file extensions
+    _FILE_EXTENSIONS = {
+        "none": ".csv",
+        "gzip": ".csv.gz"
+    }
+
+    def __init__(self, repo_owner: str, repo_name: str, deploy: bool = False, writer_pool: bool = False,
+                 compression: str = "none"):
         self.deploy = deploy
         self.repo_owner = repo_owner
         self.repo_name = repo_name
+        if compression not in RepositoryFileHandler._FILE_EXTENSIONS:
+            raise Exception(f"[RepositoryFileHandler] Unknown CSV compression {compression}")
+        self.compression = compression
+        # Every reopened gzip file appends a new gzip member, therefore compressed files always use the writer pool
+        self.writer_pool = writer_pool or compression != "none"
+        # Uncompressed bytes written per node/relationship type (compressed files only)
+        self._raw_sizes: Dict[Union[NODE_TYPE, RELATIONSHIP_TYPE], int] = {}
+        # Staged bytes per node/relationship type that were already sealed into segment files
+        self._sealed_sizes: Dict[Union[NODE_TYPE, RELATIONSHIP_TYPE], int] = {}
+        # Number of data rows per node/relationship type in the current files and in every sealed segment
+        self._row_counts: Dict[str, int] = {}
+        self._segment_row_counts: Dict[int, Dict[str, int]] = {}
+        # Cached repository hash and file paths as they never change during a collection
+        self._repo_hash = None
+        self._file_names: Dict[Union[NODE_TYPE, RELATIONSHIP_TYPE], str] = {}
+        # Open file handles and csv writers per node/relationship type (writer pool mode only)
+        self._writers: Dict[Union[NODE_TYPE, RELATIONSHIP_TYPE], Tuple[Union[TextIO, _RawSizeCounter], csv.writer]] = {}
 
     def get_file_size(self):
         """
-        Retrieve the file size of all repository CSV files
+        Retrieve the file size of all repository CSV files including already sealed segment files
         :return: dict
         """
+        self.flush_files()
         file_sizes = {
             "nodes": {},
             "relationships": {}
@@ -31,76 +87,234 @@ class RepositoryFileHandler:
         for node in NODE_TYPE:
             file_path = self._get_file_name(node)
             file_exists = True if os.path.isfile(file_path) else False
-            if file_exists:
-                file_size = os.path.getsize(file_path) / (1024.0 ** 1)
-                file_sizes.get("nodes").update({node.value: file_size})
-            else:
-                file_sizes.get("nodes").update({node.value: 0.0})
+            file_size = self._sealed_sizes.get(node, 0) + (os.path.getsize(file_path) if file_exists else 0)
+            file_sizes.get("nodes").update({node.value: file_size / (1024.0 ** 1)})
         for relationship in RELATIONSHIP_TYPE:
             file_path = self._get_file_name(relationship)
             file_exists = True if os.path.isfile(file_path) else False
-            if file_exists:
-                file_size = os.path.getsize(file_path) / (1024.0 ** 1)
-                file_sizes.get("relationships").update({relationship.value: file_size})
-            else:
-                file_sizes.get("relationships").update({relationship.value: 0.0})
+            file_size = self._sealed_sizes.get(relationship, 0) + (os.path.getsize(file_path) if file_exists else 0)
+            file_sizes.get("relationships").update({relationship.value: file_size / (1024.0 ** 1)})
         return file_sizes
 
+    def get_compression_report(self):
+        """
+        Retrieve the raw (uncompressed) and the staged file size in KB of all repository CSV files that were written
+        during this collection
+        :return: {"nodes": {type: {"raw": float, "compressed": float}}, "relationships": {...}}
+        """
+        file_sizes = self.get_file_size()
+        report = {
+            "nodes": {},
+            "relationships": {}
+        }
+        for section, file_types in (("nodes", NODE_TYPE), ("relationships", RELATIONSHIP_TYPE)):
+            for file_type in file_types:
+                staged_size = file_sizes.get(section).get(file_type.value)
+                if staged_size <= 0.0:
+                    continue
+                raw_size = self._get_raw_size(file_type) / (1024.0 ** 1) if self.compression != "none" \
+                    else staged_size
+                report.get(section).update({file_type.value: {"raw": raw_size, "compressed": staged_size}})
+        return report
+
+    def _get_raw_size(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]) -> int:
+        """
+        Uncompressed bytes written to a compressed file including its still open handle
+        """
+        raw_size = self._raw_sizes.get(file_type, 0)
+        pooled_writer = self._writers.get(file_type, None)
+        if pooled_writer is not None:
+            raw_size += pooled_writer[0].raw_bytes
+        return raw_size
+
     def repo_to_hash(self):
         """
         Converts a combination of the repository owner and username into a unique hash
         """
-        repo_id = self.repo_owner + "/" + self.repo_name
-        hash_value = hashlib.sha256(repo_id.encode())
-        return hash_value.hexdigest()
+        if self._repo_hash is None:
+            repo_id = self.repo_owner + "/" + self.repo_name
+            self._repo_hash = hashlib.sha256(repo_id.encode()).hexdigest()
+        return self._repo_hash
+
+    def flush_files(self):
+        """
+        Writes the buffered content of all pooled file handles to disk
+        """
+        for file_handle, _ in self._writers.values():
+            file_handle.flush()
+
+    def close_files(self):
+        """
+        Closes all pooled file handles. Handles are reopened on the next append.
+        """
+        for file_type, (file_handle, _) in self._writers.items():
+            file_handle.close()
+            if isinstance(file_handle, _RawSizeCounter):
+                self._raw_sizes[file_type] = self._raw_sizes.get(file_type, 0) + file_handle.raw_bytes
+        self._writers.clear()
 
     def delete_files(self):
         """
-        Deletes all CSV files corresponding to the repository
+        Deletes all CSV files and segment files corresponding to the repository
         """
-        # Delete all NODE CSV files
-        for node_type in NODE_TYPE:
-            file_path = self._get_file_name(node_type)
-            file_exists = True if os.path.isfile(file_path) else False
-            if file_exists:
+        self.close_files()
+        self._raw_sizes.clear()
+        self._sealed_sizes.clear()
+        self._row_counts.clear()
+        self._segment_row_counts.clear()
+        for file_path in glob.glob(self.get_file_location() + self.repo_to_hash() + "_*"):
+            os.remove(file_path)
+
+    def seal_segment(self, segment: int):
+        """
+        Closes all files and renames every existing CSV file into a segment file. Subsequent appends start new files.
+        :param segment: consecutive segment number
+        :return: True if at least one file was sealed
+        """
+        self.close_files()
+        sealed = False
+        for file_type in list(NODE_TYPE) + list(RELATIONSHIP_TYPE):
+            file_path = self._get_file_name(file_type)
+            if not os.path.isfile(file_path):
+                continue
+            self._sealed_sizes[file_type] = self._sealed_sizes.get(file_type, 0) + os.path.getsize(file_path)
+            os.rename(file_path, self._get_file_name(file_type, segment))
+            sealed = True
+        self._segment_row_counts[segment] = self._row_counts
+        self._row_counts = {}
+        return sealed
+
+    def delete_segment(self, segment: int):
+        """
+        Deletes all files of a sealed segment
+        """
+        self._segment_row_counts.pop(segment, None)
+        for file_type in list(NODE_TYPE) + list(RELATIONSHIP_TYPE):
+            file_path = self._get_file_name(file_type, segment)
+            if os.path.isfile(file_path):
                 os.remove(file_path)
-        # Delete all RELATIONSHIP files
-        for relationship_type in RELATIONSHIP_TYPE:
-            file_path = self._get_file_name(relationship_type)
-            file_exists = True if os.path.isfile(file_path) else False
-            if file_exists:
+
+    def get_file_offsets(self) -> Dict[str, int]:
+        """
+        Closes all files and returns the size in bytes of every existing CSV file. Closing terminates gzip members, so
+        every offset is a valid truncation point.
+        :return: {type: bytes}
+        """
+        self.close_files()
+        file_offsets = {}
+        for file_type in list(NODE_TYPE) + list(RELATIONSHIP_TYPE):
+            file_path = self._get_file_name(file_type)
+            if os.path.isfile(file_path):
+                file_offsets[str(file_type)] = os.path.getsize(file_path)
+        return file_offsets
+
+    def truncate_files(self, file_offsets: Dict[str, int]):
+        """
+        Truncates every CSV file to its offset and deletes files without an offset. Removes all rows that were written
+        after the offsets were taken.
+        :param file_offsets: {type: bytes} as returned by get_file_offsets
+        """
+        self.close_files()
+        for file_type in list(NODE_TYPE) + list(RELATIONSHIP_TYPE):
+            file_path = self._get_file_name(file_type)
+            if not os.path.isfile(file_path):
+                continue
+            file_offset = file_offsets.get(str(file_type), None)
+            if file_offset is None:
                 os.remove(file_path)
+            else:
+                os.truncate(file_path, file_offset)
+
+    def get_row_counts(self) -> Dict[str, int]:
+        """
+        Returns the number of data rows per node/relationship type in the current files
+        :return: {type: rows}
+        """
+        return dict(self._row_counts)
+
+    def set_row_counts(self, row_counts: Dict[str, int]):
+        """
+        Restores the row counts of the current files (e.g., after truncating them to a checkpoint)
+        """
+        self._row_counts = dict(row_counts)
+
+    def get_row_statistics(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
+        """
+        Returns the number of data rows and the staged bytes of a node or relationship file
+        :param file_type: NODE_TYPE or RELATIONSHIP_TYPE
+        :param segment: segment number of a sealed segment file or None for the current file
+        :return: (rows or None if unknown, bytes)
+        """
+        file_path = self._get_file_name(file_type, segment)
+        file_size = os.path.getsize(file_path) if os.path.isfile(file_path) else 0
+        row_counts = self._row_counts if segment is None else self._segment_row_counts.get(segment, {})
+        return row_counts.get(str(file_type), None), file_size
 
-    def _get_file_name(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]):
+    def get_file_location(self):
+        """
+        Directory of all repository CSV files
+        """
+        return "/repo_share/" if self.deploy else "./MSRInfrastructure/dev_data/repo_json/"
+
+    def _get_file_name(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
         """
         Constructs out of a node or relationship type a unique file name.
         :param file_type: NODE_TYPE or RELATIONSHIP_TYPE
+        :param segment: segment number of a sealed segment file or None for the current file
         :return: file path
         """
-        prefix = self.repo_to_hash()
-        filename = prefix + "_" + str(file_type) + ".csv"
-        file_location = "/repo_share/" if self.deploy else "./MSRInfrastructure/dev_data/repo_json/"
-        return file_location + filename
+        if segment is not None:
+            filename = self.repo_to_hash() + "_" + str(file_type) + "_" + str(segment) + \
+                RepositoryFileHandler._FILE_EXTENSIONS[self.compression]
+            return self.get_file_location() + filename
+        if file_type not in self._file_names:
+            prefix = self.repo_to_hash()
+            filename = prefix + "_" + str(file_type) + RepositoryFileHandler._FILE_EXTENSIONS[self.compression]
+            self._file_names[file_type] = self.get_file_location() + filename
+        return self._file_names[file_type]
 
-    def get_file_name_neo4j(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]):
+    def get_file_name_neo4j(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
         """
         Constructs out of a node or relationship type a unique file name in the Neo4J database format or None if
         the file does not exist.
         :param file_type: NODE_TYPE or RELATIONSHIP_TYPE
+        :param segment: segment number of a sealed segment file or None for the current file
         :return: file path in the neo4j format 'file:///{filename}' or None if file does not exist
         """
-        prefix = self.repo_to_hash()
-        filename = prefix + "_" + str(file_type) + ".csv"
-        file_location = "/repo_share/" if self.deploy else "./MSRInfrastructure/dev_data/repo_json/"
-        file_exists = True if os.path.isfile(file_location + filename) else False
+        file_path = self._get_file_name(file_type, segment)
+        file_exists = True if os.path.isfile(file_path) else False
         if not file_exists:
             return None
-        return "file:///" + filename
+        return "file:///" + os.path.basename(file_path)
+
+    def read_rows(self, file_type: Union[NODE_TYPE, RELATIONSHIP_TYPE], segment: Optional[int] = None):
+        """
+        Generator over all rows of a node or relationship CSV file. The file must be closed (see close_files).
+        :param file_type: NODE_TYPE or RELATIONSHIP_TYPE
+        :param segment: segment number of a sealed segment file or None for the current file
+        :return: Each iteration a dictionary of CSV strings
+        """
+        file_path = self._get_file_name(file_type, segment)
+        if not os.path.isfile(file_path):
+            return
+        if self.compression == "gzip":
+            f = gzip.open(file_path, "rt", encoding="UTF-8", newline="")
+        else:
+            f = open(file_path, "r", encoding="UTF-8", newline="")
+        with f:
+            for row in csv.DictReader(f, delimiter=",", quotechar='"'):
+                yield row
 
     def _append_to_file(self, content: dict, node_or_relationship_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]):
         """
         Appends some content form a dictionary to a node or relationship CSV file.
         """
+        row_key = str(node_or_relationship_type)
+        self._row_counts[row_key] = self._row_counts.get(row_key, 0) + 1
+        if self.writer_pool:
+            repo_write = self._get_pooled_writer(content, node_or_relationship_type)
+            repo_write.writerow([str(column) for column in content.values()])
+            return
         file_path = self._get_file_name(node_or_relationship_type)
         # Check if the file already exists
         file_exists = True if os.path.isfile(file_path) else False
@@ -115,6 +329,30 @@ class RepositoryFileHandler:
             # Construct data row
             repo_write.writerow([str(column) for column in content.values()])
 
+    def _get_pooled_writer(self, content: dict, node_or_relationship_type: Union[NODE_TYPE, RELATIONSHIP_TYPE]):
+        """
+        Returns the pooled csv writer of a node or relationship type and opens the file if necessary.
+        """
+        pooled_writer = self._writers.get(node_or_relationship_type, None)
+        if pooled_writer is not None:
+            return pooled_writer[1]
+        file_path = self._get_file_name(node_or_relationship_type)
+        # Check if the file already exists
+        file_exists = True if os.path.isfile(file_path) else False
+        if self.compression == "gzip":
+            f = _RawSizeCounter(gzip.open(file_path, "at", encoding="UTF-8", newline="",
+                                          compresslevel=RepositoryFileHandler._GZIP_COMPRESS_LEVEL))
+        else:
+            f = open(file_path, "a+", encoding="UTF-8", newline="", buffering=RepositoryFileHandler._POOL_BUFFER_SIZE)
+        # Construct CSV header in case file does not exist
+        if not file_exists:
+            csv_header = ",".join([column_name for column_name in content.keys()])
+            f.write(csv_header + "\n")
+        # Construct a csv writer instance
+        repo_write = csv.writer(f, delimiter=",", quoting=csv.QUOTE_ALL, quotechar='"')
+        self._writers[node_or_relationship_type] = (f, repo_write)
+        return repo_write
+
     def append_relationship(self, relationship: DBRelationship):
         """
         Appends a DBRelationship and its content to a relationship CSV file.
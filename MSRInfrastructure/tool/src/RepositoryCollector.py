@@ -6,10 +6,15 @@ from src.Utility.Utility import dict_search
 
 from src.DataAnalysis.RepositoryAnalysis import RepositoryAnalysis
 from src.DataInsertion.RepositoryInsertion import RepositoryInsertion
+from src.DataInsertion.BoltRepositoryInsertion import BoltRepositoryInsertion
+from src.DataInsertion.InsertionPipeline import InsertionPipeline
+from src.DataInsertion.BulkImportBundle import BulkImportBundle
+from src.DataInsertion.RepositoryState import RepositoryState
 
 from src.DataAcquisition.GitHubAPIService.GitHubClientFactory import GitHubClientFactory
 from src.DataAcquisition.GitHubCollector import GraphQLCollector, RESTCollector
 from src.DataAcquisition.GitHubCollector import DATA_TREE
+from src.DataAcquisition.GitHubAPIService.GraphQLService.FollowUpQuery import IssueFollowUpRoot, PullRequestFollowUpRoot
 from src.DataProcessing.ProjectProcessor import ProjectProcessorRoot
 from src.PreprocessorStorage.PreprocessorStorageInterface import PreprocessorStorageInterface
 from src.DataProcessing.IssueProcessor import IssueProcessorRoot
@@ -26,117 +31,638 @@ from src.DataProcessing.PullRequestFileProcessor import PullRequestFileProcessor
 from src.DataProcessing.PullRequestProcessor import PullRequestProcessorRoot
 from src.DataProcessing.CommitFileProcessor import CommitFileProcessorRoot
 from src.DataAcquisition.CloningService.CloningService import CloningService
+from src.PhaseGraph import PhaseGraph
 
 
 class RepositoryCollector(threading.Thread):
     """
     RepositoryCollector is responsible for collecting all information concerning a specific repository
     """
+
+    # Number of REST API items (e.g., remaining issues) or GraphQL pages between two checkpoints. Every checkpoint
+    # closes the CSV files to record valid truncation offsets.
+    _CHECKPOINT_INTERVAL = 25
+
     def __init__(self, repository_owner, repository_name, github_client_factory, commit_data=False,
-                 pull_request_data=False, deploy=False):
+                 pull_request_data=False, deploy=False, csv_writer_pool=False, deduplication_backend="memory",
+                 deduplication_memory_budget_mb=64, csv_compression="none", pipelined_insertion=False,
+                 checkpoints=False, insertion_backend="load_csv", incremental_collection=False,
+                 graph_ql_async_engine=False, graph_ql_max_in_flight=4, graph_ql_follow_up_queries=False,
+                 phase_parallelism=False):
         super().__init__()
         self.logger = MSRLogger.get_logger(self.__class__.__name__)  # Logger
         self._repository_owner: str = repository_owner  # Repository owner
         self._repository_name: str = repository_name  # Repository name
         self._repo = self._repository_owner + "/" + self._repository_name  # Repository full name
+        if checkpoints and pipelined_insertion:
+            # Inserted segments cannot be rolled back to a checkpoint
+            self.logger.warning(f"{self._repo} Checkpoints are disabled in pipelined insertion mode")
+            checkpoints = False
+        if pipelined_insertion and insertion_backend == "bulk_import":
+            # The bulk import bundle requires the complete repository
+            self.logger.warning(f"{self._repo} Pipelined insertion is disabled with the bulk_import backend")
+            pipelined_insertion = False
+        # The client factory decides if the GraphQL and REST client run at the same time
+        concurrent_api_clients = github_client_factory.concurrent_clients
+        if concurrent_api_clients and (checkpoints or pipelined_insertion):
+            # Both require a single active phase at a time
+            self.logger.warning(f"{self._repo} Checkpoints and pipelined insertion are disabled with concurrent API "
+                                f"clients")
+            checkpoints = False
+            pipelined_insertion = False
+        if phase_parallelism and (checkpoints or pipelined_insertion):
+            # Both require a single active phase at a time
+            self.logger.warning(f"{self._repo} Checkpoints and pipelined insertion are disabled with phase parallelism")
+            checkpoints = False
+            pipelined_insertion = False
+        if incremental_collection and insertion_backend == "bulk_import":
+            # The offline import only creates new databases
+            self.logger.warning(f"{self._repo} Incremental collection is disabled with the bulk_import backend")
+            incremental_collection = False
+        self._incremental_collection: bool = incremental_collection  # If only changes since the last run are merged
+        self._graph_ql_async_engine: bool = graph_ql_async_engine  # If GraphQL phases page concurrently
+        self._graph_ql_max_in_flight: int = graph_ql_max_in_flight  # Maximum concurrent GraphQL queries
+        # If partially collected issues and pull requests are completed with batched GraphQL queries instead of REST
+        self._graph_ql_follow_up_queries: bool = graph_ql_follow_up_queries
+        # If REST phases run in a second thread next to the GraphQL phases
+        self._concurrent_api_clients: bool = concurrent_api_clients
+        self._rest_phases_thread: Optional[threading.Thread] = None  # Thread of the concurrent REST phases
+        self._rest_phases_exception: Optional[Exception] = None  # Exception that stopped the concurrent REST phases
+        # Set on the first failure of the GraphQL or REST phases to stop the concurrently running phases
+        self._stop_event = threading.Event()
+        self._phase_parallelism: bool = phase_parallelism  # If independent phases run at the same time (PhaseGraph)
+        self._checkpoints: bool = checkpoints  # If the collection progress is checkpointed
+        self._insertion_backend: str = insertion_backend  # "load_csv", "bolt" (UNWIND batches), or "bulk_import"
         self._deploy: bool = deploy  # If this execution runs in docker or the IDE
         self._commit_data: bool = commit_data  # If commit file content is collected
         self._pull_request_data: bool = pull_request_data  # If pull request file content is collected
         self._preprocessor_storage: PreprocessorStorageInterface = PreprocessorStorageInterface(
             repository_owner,
             repository_name,
-            deploy
+            deploy,
+            csv_writer_pool,
+            deduplication_backend,
+            deduplication_memory_budget_mb,
+            csv_compression,
+            checkpoints
         )  # Initialize file CSV and in memory storage
         self._github_client_factory: GitHubClientFactory = github_client_factory  # Client factory to get API wrapper
         self._graph_ql_collector: Optional[GraphQLCollector] = None  # GraphQL collector to get GitHub GraphQL API data
         self._rest_collector: Optional[RESTCollector] = None  # REST collector to get GitHub REST API data
         self._cloning_service: Optional[CloningService, None] = None  # Initialize cloning service
         self._project_id = ""  # Node ID of the current project -> Defined in the ProjectProcessor
+        self._pipelined_insertion: bool = pipelined_insertion  # If finished phases are inserted during collection
+        self._insertion_pipeline: Optional[InsertionPipeline] = None  # Insertion worker in pipelined mode
+        self._segment = 0  # Number of the next sealed CSV segment in pipelined mode
+        self._completed_phases: dict = {}  # Names and return values of all completed collection phases
+        self._active_phase: Optional[str] = None  # Name of the currently running collection phase
+        self._resume_phase: Optional[str] = None  # Name of the phase that continues from a checkpoint
+        self._resume_phase_state: Optional[dict] = None  # Checkpointed progress of the resumed phase
 
     def run(self):
         self.logger.info(f"Initializing repository {self._repo}")
-        # Delete old repository CSV files
-        self.logger.info(f"Clear repository CSV files {self._repo}")
-        self.get_preprocessor_storage().delete_all_files()
+        if self._checkpoints and self.get_preprocessor_storage().has_checkpoint():
+            # Continue the collection of a previous run
+            self.logger.info(f"Resume repository {self._repo} from checkpoint")
+            self._restore_checkpoint()
+        else:
+            # Delete old repository CSV files
+            self.logger.info(f"Clear repository CSV files {self._repo}")
+            self.get_preprocessor_storage().delete_all_files()
+        # Start the insertion worker that inserts every finished phase during the collection
+        if self._pipelined_insertion:
+            self._insertion_pipeline = InsertionPipeline(self)
+            self._insertion_pipeline.start()
         # Collect data and store it into CSV files
         self.logger.info(f"Start collecting {self._repo}")
-        self.collect()
-        # Destroy GitHub clients
-        self.logger.info(f"Destroying GitHub clients {self._repo}")
-        self._github_client_factory.destroy_client()
+        try:
+            self.collect()
+            self.logger.info(f"{self._repo} Deduplication memory "
+                             f"{self.get_preprocessor_storage().get_deduplication_memory_report()}")
+        except Exception:
+            # Stop the workers of the collector, as the pool continues with the next repository
+            self._stop_workers()
+            raise
+        finally:
+            # Return the tokens and close the files of the collector, also if the collection failed
+            self._release_resources()
+        self.logger.info(f"{self._repo} CSV file sizes (KB) "
+                         f"{self.get_preprocessor_storage().get_compression_report()}")
         # Write the data into the database
-        self.start_insertion()
-        # Delete cloned repository
+        if self._insertion_pipeline is not None:
+            # Wait until the insertion worker inserted all segments
+            self._seal_segment()
+            self._insertion_pipeline.close()
+            self._insertion_pipeline.join()
+            if self._insertion_pipeline.failed:
+                # Keep the CSV files of all segments that were not inserted
+                raise Exception(f"[RepositoryCollector] Pipelined insertion of {self._repo} failed")
+        elif self._insertion_backend == "bulk_import":
+            # Add the repository to the neo4j-admin import bundle instead of inserting it
+            BulkImportBundle.get_instance().add_repository(self)
+        else:
+            self.start_insertion()
+        # Delete cloned repository (incremental collections keep it for the next run)
         self.logger.info(f"Clear cloned repository {self._repo}")
         self._cloning_service.clean_up()
         # Delete repository CSV files
         self.logger.info(f"Clear repository CSV files {self._repo}")
         self.get_preprocessor_storage().delete_all_files()
 
+    def _stop_workers(self):
+        """
+        Stops and waits for the concurrent REST phases and stops the insertion worker after a failed collection
+        """
+        self._stop_event.set()
+        if self._rest_phases_thread is not None:
+            self._rest_phases_thread.join()
+            self._rest_phases_thread = None
+        if self._insertion_pipeline is not None:
+            self._insertion_pipeline.close()
+            self._insertion_pipeline.join()
+
+    def _release_resources(self):
+        """
+        Destroys the GitHub clients (returns their tokens), closes the deduplication store, and closes all CSV files
+        """
+        try:
+            # Destroy GitHub clients
+            self.logger.info(f"Destroying GitHub clients {self._repo}")
+            self._github_client_factory.destroy_client()
+        finally:
+            self.get_preprocessor_storage().close_deduplication_store()
+            # Close all CSV files before the database reads them
+            self.get_preprocessor_storage().close_files()
+
     def start_insertion(self):
         """
         Instantiates a new RepositoryInsertion object and starts repository insertion into the database
         """
-        insertion = RepositoryInsertion(self)
+        insertion = self.create_insertion()
         return insertion.start()
 
+    def create_insertion(self) -> RepositoryInsertion:
+        """
+        Instantiates the RepositoryInsertion of the configured insertion backend
+        """
+        if self._insertion_backend == "bolt":
+            return BoltRepositoryInsertion(self)
+        if self._insertion_backend != "load_csv":
+            raise Exception(f"[RepositoryCollector] Unknown insertion backend {self._insertion_backend}")
+        return RepositoryInsertion(self)
+
     def collect(self):
         """
         Starts the complete repository collection by cloning into the local file system, REST API, and GraphQL API
         """
         # Clone the repository
-        self._cloning_service = CloningService(self, content=self._commit_data)
+        self._cloning_service = CloningService(self, content=self._commit_data,
+                                               incremental=self._incremental_collection)
         # GraphQL Initialization
         self._graph_ql_collector = GraphQLCollector(graphql_client=self.get_client_factory().get_graphql_api())
+        if self._phase_parallelism:
+            self._create_phase_graph().run()
+            return
         # Collect and process project data
-        self.process_project()
+        self._run_phase("project", self.process_project)
+        # Load the state of the previous collection -> Database
+        if self._incremental_collection:
+            collected_state = self._run_phase("collected_state", self.load_collected_state)
+            if collected_state is not None:
+                self._cloning_service.exclude_known_commits(collected_state["head_commits"])
         # Collect and process commit data -> By cloning
-        self.process_commits()
+        self._run_phase("commits", self.process_commits)
         # Collect and process file action and file data -> By cloning
-        self.process_file_actions()
+        self._run_phase("file_actions", self.process_file_actions)
         # Collect and process branches -> By cloning
-        self.process_branches()
+        self._run_phase("branches", self.process_branches)
+        if self._concurrent_api_clients:
+            # REST API Initialization next to the running GraphQL client
+            self._rest_collector = RESTCollector(rest_client=self.get_client_factory().get_rest_api())
+            # Collect dependencies, commit metadata, pull request files, and workflows during the GraphQL phases
+            self._rest_phases_thread = threading.Thread(target=self._run_concurrent_rest_phases, daemon=True)
+            self._rest_phases_thread.start()
+        if self._graph_ql_async_engine:
+            # Collect issues, pull requests, discussions, stargazers/watchers, releases, and labels concurrently
+            self._run_graph_ql_streams()
         # Collect and process issues with graphql partially --> GraphQL
-        partially_collected_issues = self.partially_process_issues()
-        # self.logger.info(f"Partially collected issues for {self._repository_owner}/{self._repository_name}: {partially_collected_issues}")
-
+        partially_collected_issues = self._run_phase("issues", self.partially_process_issues)
         # Collect and process pull requests with graphql partially --> GraphQL
-        partially_collected_pull_requests = self.partially_process_pull_requests()
-        # self.logger.debug(f"Partially collected pull requests for {self._repository_owner}/{self._repository_name}: {partially_collected_pull_requests}")
-
+        partially_collected_pull_requests = self._run_phase("pull_requests", self.partially_process_pull_requests)
         # Collect Discussion Data -> GraphQL
-        self.process_discussions()
+        self._run_phase("discussions", self.process_discussions)
         # Collect and process stargazers and watchers -> GraphQL
-        self.process_stargazers_watchers()
+        self._run_phase("stargazers_watchers", self.process_stargazers_watchers)
         # Collect and process releases -> GraphQL
-        self.process_releases()
+        self._run_phase("releases", self.process_releases)
         # Collect and process labels -> GraphQL
-        self.process_labels()
-        # REST API Initialization
+        self._run_phase("labels", self.process_labels)
+        if self._graph_ql_follow_up_queries:
+            # Collect and process remaining issues -> GraphQL (batched follow-up queries)
+            self._run_phase("remaining_issues", self.process_remaining_issues, partially_collected_issues)
+            # Collect and process remaining pull requests -> GraphQL (batched follow-up queries)
+            self._run_phase("remaining_pull_requests", self.process_remaining_pull_requests,
+                            partially_collected_pull_requests)
+        if self._concurrent_api_clients:
+            # Wait for the REST phases, as the REST client is not shared between threads
+            self._join_concurrent_rest_phases()
+        else:
+            # REST API Initialization
+            self._rest_collector = RESTCollector(rest_client=self.get_client_factory().get_rest_api())
+        if not self._graph_ql_follow_up_queries:
+            # Collect and process remaining issues -> REST API
+            self._run_phase("remaining_issues", self.process_remaining_issues, partially_collected_issues)
+            # Collect and process remaining pull requests -> REST API
+            self._run_phase("remaining_pull_requests", self.process_remaining_pull_requests,
+                            partially_collected_pull_requests)
+        if not self._concurrent_api_clients:
+            self._run_rest_phases()
+        # Link nodes to referenced issues and pull requests (requires all issues and pull requests)
+        self._run_phase("reference_links", self.process_reference_links)
+        # Link pull request files to the files after the merge commit
+        self._run_phase("merge_file_links", self.process_merge_file_links)
+
+    def _create_phase_graph(self) -> PhaseGraph:
+        """
+        Creates the PhaseGraph of all collection phases. The phases of the cloned repository (local CPU and disk work)
+        run next to the API phases. With concurrent API clients, the GraphQL and REST phases run next to each other as
+        well, otherwise both share a lane, as the client factory keeps only one client alive.
+        """
+        graph = PhaseGraph(self._repo)
+        local_lane = "local"
+        graph_ql_lane = "graph_ql"
+        rest_lane = "rest" if self._concurrent_api_clients else graph_ql_lane
+        # Collect and process project data -> GraphQL
+        graph.add("project", graph_ql_lane, lambda: self._run_phase("project", self.process_project))
+        setup_phases = ["project"]
+        if self._incremental_collection:
+            # Load the state of the previous collection -> Database
+            graph.add("collected_state", graph_ql_lane, self._load_collected_state_phase, setup_phases)
+            setup_phases = ["project", "collected_state"]
+        # Collect and process commit, file action, file, and branch data -> By cloning
+        local_phases = ["commits", "file_actions", "branches"]
+        graph.add("commits", local_lane, lambda: self._run_phase("commits", self.process_commits), setup_phases)
+        graph.add("file_actions", local_lane, lambda: self._run_phase("file_actions", self.process_file_actions),
+                  setup_phases)
+        graph.add("branches", local_lane, lambda: self._run_phase("branches", self.process_branches), setup_phases)
+        if self._graph_ql_async_engine:
+            # Collect issues, pull requests, discussions, stargazers/watchers, releases, and labels concurrently
+            graph.add("graph_ql_streams", graph_ql_lane, self._run_graph_ql_streams, setup_phases)
+        # Collect and process issues, pull requests, discussions, stargazers/watchers, releases, labels -> GraphQL
+        graph_ql_phases = {
+            "issues": self.partially_process_issues,
+            "pull_requests": self.partially_process_pull_requests,
+            "discussions": self.process_discussions,
+            "stargazers_watchers": self.process_stargazers_watchers,
+            "releases": self.process_releases,
+            "labels": self.process_labels
+        }
+        for phase_name, phase in graph_ql_phases.items():
+            graph.add(phase_name, graph_ql_lane, self._get_phase_runner(phase_name, phase), setup_phases)
+        # Collect and process remaining issues and pull requests -> GraphQL (follow-up queries) or REST API
+        remaining_lane = graph_ql_lane if self._graph_ql_follow_up_queries else rest_lane
+        remaining_phases = {
+            "remaining_issues": lambda: self._run_phase("remaining_issues", self.process_remaining_issues,
+                                                        graph.get_result("issues")),
+            "remaining_pull_requests": lambda: self._run_phase("remaining_pull_requests",
+                                                               self.process_remaining_pull_requests,
+                                                               graph.get_result("pull_requests"))
+        }
+        if self._graph_ql_follow_up_queries:
+            graph.add("remaining_issues", remaining_lane, remaining_phases["remaining_issues"], ["issues"])
+            graph.add("remaining_pull_requests", remaining_lane, remaining_phases["remaining_pull_requests"],
+                      ["pull_requests"])
+        # REST API Initialization (destroys the GraphQL client without concurrent API clients)
+        graph.add("rest_client", rest_lane, self._initialize_rest_collector, setup_phases)
+        # Collect and process dependencies, commit metadata, pull request files, and workflows -> REST API
+        graph.add("dependencies", rest_lane, lambda: self._run_phase("dependencies", self.process_dependencies),
+                  ["rest_client"])
+        # Incremental collections read the new commits from the cloned repository, which is not thread-safe
+        graph.add("commit_meta", rest_lane, lambda: self._run_phase("commit_meta", self.process_commit_meta),
+                  ["rest_client"] + (local_phases if self._incremental_collection else []))
+        if self.isCollectPullRequestFileContent():
+            graph.add("pull_request_files", rest_lane,
+                      lambda: self._run_phase("pull_request_files", self.process_pull_request_files), ["rest_client"])
+        graph.add("workflows", rest_lane, lambda: self._run_phase("workflows", self.process_workflows),
+                  ["rest_client"])
+        if not self._graph_ql_follow_up_queries:
+            graph.add("remaining_issues", remaining_lane, remaining_phases["remaining_issues"],
+                      ["rest_client", "issues"])
+            graph.add("remaining_pull_requests", remaining_lane, remaining_phases["remaining_pull_requests"],
+                      ["rest_client", "pull_requests"])
+        # Link nodes to referenced issues/pull requests and pull request files to the files after the merge commit
+        # (requires all other phases)
+        graph.add("reference_links", local_lane, lambda: self._run_phase("reference_links",
+                                                                        self.process_reference_links),
+                  graph.get_phase_names())
+        graph.add("merge_file_links", local_lane, lambda: self._run_phase("merge_file_links",
+                                                                         self.process_merge_file_links),
+                  ["reference_links"])
+        return graph
+
+    def _get_phase_runner(self, phase_name: str, phase):
+        """
+        Returns a method without parameters that runs a phase with _run_phase
+        """
+        return lambda: self._run_phase(phase_name, phase)
+
+    def _load_collected_state_phase(self):
+        collected_state = self._run_phase("collected_state", self.load_collected_state)
+        if collected_state is not None:
+            self._cloning_service.exclude_known_commits(collected_state["head_commits"])
+        return collected_state
+
+    def _initialize_rest_collector(self):
         self._rest_collector = RESTCollector(rest_client=self.get_client_factory().get_rest_api())
-        # Collect and process remaining issues -> REST API
-        self.process_remaining_issues(partially_collected_issues)
-        # Collect and process remaining pull requests -> REST API
-        self.process_remaining_pull_requests(partially_collected_pull_requests)
+
+    def _run_rest_phases(self):
+        """
+        Runs all REST phases that do not depend on GraphQL results
+        """
         # Collect and process dependency data
-        self.process_dependencies()
+        self._run_phase("dependencies", self.process_dependencies)
         # Collect and process commit metadata (author/ committer)
-        self.process_commit_meta()
+        self._run_phase("commit_meta", self.process_commit_meta)
         # Depending on whether PR file content is needed, data is collected previously with the GraphQL or REST API
         if self.isCollectPullRequestFileContent():
             # Collect and process pull request file changes
-            self.process_pull_request_files()
+            self._run_phase("pull_request_files", self.process_pull_request_files)
         # Collect and process workflows
-        self.process_workflows()
+        self._run_phase("workflows", self.process_workflows)
+
+    def _run_concurrent_rest_phases(self):
+        """
+        Target of the REST phases thread. Exceptions are raised again in the collector thread.
+        """
+        try:
+            self._run_rest_phases()
+        except Exception as e:
+            self.logger.exception(f"{self._repo} Concurrent REST phases failed {e}")
+            self._rest_phases_exception = e
+            # Stop the GraphQL phases at their next item
+            self._stop_event.set()
+
+    def _join_concurrent_rest_phases(self):
+        self._rest_phases_thread.join()
+        self._rest_phases_thread = None
+        if self._rest_phases_exception is not None:
+            raise Exception(f"[RepositoryCollector] Concurrent REST phases failed: {self._rest_phases_exception}")
+
+    def _check_stopped(self):
+        """
+        Raises an exception if a concurrently running phase failed. Phases call it between items and pages.
+        """
+        if not self._stop_event.is_set():
+            return
+        if self._rest_phases_exception is not None:
+            raise Exception(f"[RepositoryCollector] Concurrent REST phases failed: {self._rest_phases_exception}")
+        raise Exception(f"[RepositoryCollector] Collection of {self._repo} stopped after a failed phase")
+
+    def _run_phase(self, phase_name: str, phase, *args):
+        """
+        Executes a single collection phase and finishes it afterward. Phases that a previous run completed are skipped.
+        :param phase_name: unique name of the phase
+        :param phase: method that collects and processes the phase data
+        :return: the return value of the phase method (must be JSON serializable)
+        """
+        if phase_name in self._completed_phases:
+            self.logger.info(f"{self._repo} Skipping completed phase - {phase_name}")
+            return self._completed_phases[phase_name]
+        self._check_stopped()
+        self._active_phase = phase_name
+        phase_result = phase(*args)
+        self._active_phase = None
+        self._completed_phases[phase_name] = phase_result
+        self._finish_phase(phase_name)
+        self._save_checkpoint()
+        return phase_result
+
+    def _save_checkpoint(self, phase_state: Optional[dict] = None):
+        """
+        Checkpoints the completed phases and the progress of the active phase
+        :param phase_state: JSON serializable progress of the active phase
+        """
+        if not self._checkpoints:
+            return
+        self.get_preprocessor_storage().save_checkpoint({
+            "project_id": self._project_id,
+            "completed_phases": self._completed_phases,
+            "active_phase": self._active_phase,
+            "phase_state": phase_state
+        })
+
+    def _restore_checkpoint(self):
+        """
+        Restores the collection state of the last checkpoint
+        """
+        collection_state = self.get_preprocessor_storage().load_checkpoint()
+        self._project_id = collection_state["project_id"]
+        self._completed_phases = collection_state["completed_phases"]
+        self._resume_phase = collection_state["active_phase"]
+        self._resume_phase_state = collection_state["phase_state"]
+
+    def _take_resume_state(self) -> Optional[dict]:
+        """
+        Returns the checkpointed progress of the active phase once or None if the phase starts from the beginning
+        """
+        if self._resume_phase is None or self._resume_phase != self._active_phase:
+            return None
+        phase_state = self._resume_phase_state
+        self._resume_phase = None
+        self._resume_phase_state = None
+        return phase_state
+
+    def _resumable_graph_ql_pages(self, secondary_root_nodes: [DATA_TREE], progress: dict,
+                                  since: Optional[dict] = None):
+        """
+        Generator over GraphQLCollector.get that continues at the checkpointed cursor of the active phase. After the
+        caller processed every _CHECKPOINT_INTERVAL pages, the cursor and the progress dictionary are checkpointed.
+        :param progress: JSON serializable dictionary the caller updates while processing pages (restored on resume)
+        :param since: Optional lower bounds of the update time per node (see GraphQLCollector.get)
+        :return: (query_result: dict, partially_collected_nodes: dict)
+        """
+        resume_state = self._take_resume_state()
+        cursor_state = None
+        if resume_state is not None:
+            cursor_state = resume_state["cursor"]
+            progress.update(resume_state["progress"])
+        pages = 0
+        for query_result, partially_collected_nodes in self._graph_ql_collector.get(
+                secondary_root_nodes, [], cursor_state, since
+        ):
+            self._check_stopped()
+            yield query_result, partially_collected_nodes
+            pages += 1
+            if pages % RepositoryCollector._CHECKPOINT_INTERVAL == 0:
+                self._save_checkpoint({
+                    "cursor": self._graph_ql_collector.get_root_node_state(),
+                    "progress": progress
+                })
+
+    def _run_graph_ql_streams(self):
+        """
+        Runs the GraphQL phases (issues, pull requests, discussions, stargazers/watchers, releases, labels) at the same
+        time with the async GraphQL engine. Every phase is a stream with its own cursors, and its pages are processed
+        in this thread in arrival order. A phase completes after its last page, so the sequential phase calls in
+        collect() skip it afterward. All stream cursors are checkpointed together every _CHECKPOINT_INTERVAL pages.
+        """
+        # Phase name -> (nodes, page processing method)
+        phases = {
+            "issues": ([DATA_TREE.ISSUE], self._process_issue_page),
+            "pull_requests": ([DATA_TREE.PULL_REQUEST], self._process_pull_request_page),
+            "discussions": ([DATA_TREE.DISCUSSION], self._process_discussion_page),
+            "stargazers_watchers": ([DATA_TREE.STARGAZER, DATA_TREE.WATCHER], self._process_stargazer_watcher_page),
+            "releases": ([DATA_TREE.RELEASE], self._process_release_page),
+            "labels": ([DATA_TREE.LABEL], self._process_label_page)
+        }
+        pending_phases = [phase_name for phase_name in phases if phase_name not in self._completed_phases]
+        if len(pending_phases) == 0:
+            return
+        self.logger.info(f"{self._repo} Start collecting concurrently - {', '.join(pending_phases)}")
+        self._active_phase = "graph_ql_streams"
+        resume_state = self._take_resume_state()
+        resume_state = {} if resume_state is None else resume_state
+        # Phase name -> {"cursor": cursor state, "progress": progress}
+        stream_states = {}
+        streams = {}
+        for phase_name in pending_phases:
+            stream_states[phase_name] = resume_state.get(phase_name, {
+                "cursor": None,
+                "progress": {"partially_collected": []}
+            })
+            nodes = phases[phase_name][0]
+            streams[phase_name] = {
+                "nodes": nodes,
+                "resume_state": stream_states[phase_name]["cursor"],
+                "since": self._get_graph_ql_since(nodes[0])
+            }
+        pages = 0
+        for phase_name, query_result, partially_collected_nodes, cursor_state in \
+                self._graph_ql_collector.get_concurrent(streams, self._graph_ql_max_in_flight):
+            self._check_stopped()
+            if query_result is None:
+                # Last page of the stream was processed
+                progress = stream_states.pop(phase_name)["progress"]
+                self._completed_phases[phase_name] = progress["partially_collected"].copy() \
+                    if phase_name in ["issues", "pull_requests"] else None
+                self._finish_phase(phase_name)
+            else:
+                stream_state = stream_states[phase_name]
+                phases[phase_name][1](query_result, partially_collected_nodes, stream_state["progress"])
+                stream_state["cursor"] = cursor_state
+            pages += 1
+            # Completed streams are checkpointed immediately
+            if query_result is None or pages % RepositoryCollector._CHECKPOINT_INTERVAL == 0:
+                self._save_checkpoint(stream_states)
+        self._active_phase = None
+        self._save_checkpoint()
+
+    def _get_graph_ql_since(self, node: DATA_TREE) -> Optional[dict]:
+        """
+        Returns the lower bound of the update time of issues/pull requests in incremental collections
+        :return: {DATA_TREE: 'YYYY-MM-DDTHH:MM:SSZ'} or None
+        """
+        collected_state = self.get_collected_state()
+        if collected_state is None:
+            return None
+        updated_at = None
+        if node == DATA_TREE.ISSUE:
+            updated_at = collected_state["issues_updated_at"]
+        elif node == DATA_TREE.PULL_REQUEST:
+            updated_at = collected_state["pull_requests_updated_at"]
+        return None if updated_at is None else {node: updated_at}
+
+    def _resumable_items(self, items: list):
+        """
+        Generator over a list of items (e.g., issue numbers) that skips all items processed before the checkpoint of
+        the active phase. Checkpoints every _CHECKPOINT_INTERVAL processed items.
+        """
+        resume_state = self._take_resume_state()
+        processed = 0 if resume_state is None else resume_state["processed"]
+        for item in items[processed:]:
+            self._check_stopped()
+            yield item
+            processed += 1
+            if processed % RepositoryCollector._CHECKPOINT_INTERVAL == 0:
+                self._save_checkpoint({"processed": processed})
+
+    def _resumable_batches(self, items: list, batch_size: int):
+        """
+        Generator over batches of a list of items (e.g., issue numbers) that skips all items processed before the
+        checkpoint of the active phase. Checkpoints after every processed batch.
+        """
+        resume_state = self._take_resume_state()
+        processed = 0 if resume_state is None else resume_state["processed"]
+        while processed < len(items):
+            batch = items[processed:processed + batch_size]
+            self._check_stopped()
+            yield batch
+            processed += len(batch)
+            self._save_checkpoint({"processed": processed})
+
+    def _finish_phase(self, phase_name: str):
+        """
+        Executed at every phase boundary. Writes all buffered CSV content of the phase to disk.
+        """
+        self.logger.info(f"{self._repo} Finished phase - {phase_name}")
+        if self._insertion_pipeline is not None:
+            self._seal_segment()
+        else:
+            self.get_preprocessor_storage().flush_files()
+
+    def _seal_segment(self):
+        """
+        Seals all CSV files written since the last segment and hands them to the insertion worker
+        """
+        if self.get_preprocessor_storage().seal_segment(self._segment):
+            self._insertion_pipeline.submit(self._segment)
+            self._segment += 1
+
+    def get_collected_state(self) -> Optional[dict]:
+        """
+        Returns the state of the previous collection or None if the repository is collected completely
+        """
+        return self._completed_phases.get("collected_state", None)
+
+    def load_collected_state(self):
+        self.logger.info(f"{self._repo} Start loading - Previously collected state")
+        repository_state = RepositoryState.load(self._project_id, self._deploy)
+        if repository_state is None:
+            return None
+        # Reuse the ids of branches and time aggregation nodes and resolve references to collected issues/PRs
+        self.get_preprocessor_storage().seed_collected_state(
+            self._project_id,
+            repository_state.branch_ids,
+            repository_state.time_aggregator_ids,
+            repository_state.issue_ids,
+            repository_state.pull_request_ids
+        )
+        return {
+            "head_commits": repository_state.head_commits,
+            "issues_updated_at": repository_state.issues_updated_at,
+            "pull_requests_updated_at": repository_state.pull_requests_updated_at,
+            "workflow_run_ids": sorted(repository_state.workflow_run_ids)
+        }
 
     def process_labels(self):
         self.logger.info(f"{self._repo} Start collecting - Labels")
         # Labels (Complete) -> GraphQL
-        for query_result, partially_collected_nodes in self._graph_ql_collector.get([DATA_TREE.LABEL], []):
-            labels_data = query_result.get("repository", {}).get("labels", None)
-            if labels_data is not None:
-                label_processor = LabelProcessorRoot(self, labels_data)
-                label_processor.process()
+        for query_result, partially_collected_nodes in self._resumable_graph_ql_pages([DATA_TREE.LABEL], {}):
+            self._process_label_page(query_result, partially_collected_nodes, {})
+
+    def _process_label_page(self, query_result: dict, partially_collected_nodes: dict, progress: dict):
+        labels_data = query_result.get("repository", {}).get("labels", None)
+        if labels_data is not None:
+            label_processor = LabelProcessorRoot(self, labels_data)
+            label_processor.process()
+
+    def process_reference_links(self):
+        self.logger.info(f"{self._repo} Start linking - Issue/Pull request references")
+        self.get_preprocessor_storage().add_reference_links()
+
+    def process_merge_file_links(self):
+        self.logger.info(f"{self._repo} Start linking - Pull request files to merge commit files")
+        self.get_preprocessor_storage().add_merge_file_links()
 
     def process_watchers(self, query_result):
         watcher_data = query_result.get("repository", {}).get("watchers", None)
@@ -152,50 +678,69 @@ class RepositoryCollector(threading.Thread):
 
     def process_discussions(self):
         self.logger.info(f"{self._repo} Start collecting - Discussions")
-        for query_result, partially_collected_nodes in self._graph_ql_collector.get([DATA_TREE.DISCUSSION], []):
-            # Get discussions data from graphql response
-            primary_discussions_data = query_result["repository"]["discussions"]
-            # Processing discussions (Write to CSV and in memory)
-            primary_discussion_processor = DiscussionProcessorRoot(self, primary_discussions_data)
-            primary_discussion_processor.process()
-            # Execute follow up queries to retrieve partially collected discussion
-            if "discussions" in partially_collected_nodes.keys():
-                partially_collected_discussion = partially_collected_nodes["discussions"]
-                # Loop over all partially collected discussion numbers
-                for discussion_number in partially_collected_discussion:
-                    # Retrieve all discussion data
-                    for secondary_discussion_data in self._graph_ql_collector.get_discussion(discussion_number):
-                        discussion_content = dict_search(secondary_discussion_data, ["repository", "discussion"], None)
-                        secondary_discussion_processor = DiscussionProcessorRoot(self, {
-                            "nodes": [] if discussion_content is None else [discussion_content]
-                        })
-                        secondary_discussion_processor.process()
+        for query_result, partially_collected_nodes in self._resumable_graph_ql_pages([DATA_TREE.DISCUSSION], {}):
+            self._process_discussion_page(query_result, partially_collected_nodes, {})
+
+    def _process_discussion_page(self, query_result: dict, partially_collected_nodes: dict, progress: dict):
+        # Get discussions data from graphql response
+        primary_discussions_data = query_result["repository"]["discussions"]
+        # Processing discussions (Write to CSV and in memory)
+        primary_discussion_processor = DiscussionProcessorRoot(self, primary_discussions_data)
+        primary_discussion_processor.process()
+        # Execute follow up queries to retrieve partially collected discussion
+        if "discussions" in partially_collected_nodes.keys():
+            partially_collected_discussion = partially_collected_nodes["discussions"]
+            # Loop over all partially collected discussion numbers
+            for discussion_number in partially_collected_discussion:
+                # Retrieve all discussion data
+                for secondary_discussion_data in self._graph_ql_collector.get_discussion(discussion_number):
+                    discussion_content = dict_search(secondary_discussion_data, ["repository", "discussion"], None)
+                    secondary_discussion_processor = DiscussionProcessorRoot(self, {
+                        "nodes": [] if discussion_content is None else [discussion_content]
+                    })
+                    secondary_discussion_processor.process()
 
     def process_releases(self):
         self.logger.info(f"{self._repo} Start collecting - Releases")
-        for query_result, partially_collected_nodes in self._graph_ql_collector.get([DATA_TREE.RELEASE], []):
-            release_data = query_result.get("repository", {}).get("releases", [])
-            release_processor = ReleaseProcessorRoot(self, release_data)
-            release_processor.process()
+        for query_result, partially_collected_nodes in self._resumable_graph_ql_pages([DATA_TREE.RELEASE], {}):
+            self._process_release_page(query_result, partially_collected_nodes, {})
+
+    def _process_release_page(self, query_result: dict, partially_collected_nodes: dict, progress: dict):
+        release_data = query_result.get("repository", {}).get("releases", [])
+        release_processor = ReleaseProcessorRoot(self, release_data)
+        release_processor.process()
 
     def process_commit_meta(self):
         self.logger.info(f"{self._repo} Start collecting - Commit metadata (author/committer/comments)")
+        since = None
+        if self.get_collected_state() is not None:
+            # Only the metadata of new commits is collected
+            since = self._cloning_service.get_earliest_commit_time()
+            if since is None:
+                return
         # Collect commit metadata (author, committer, commit comments) -> REST API
-        for commit in self._rest_collector.get_commits():
+        for commit in self._rest_collector.get_commits(since):
+            self._check_stopped()
             commit_processor = CommitMetaProcessorRoot(self, commit)
             commit_processor.process()
 
     def process_pull_request_files(self):
         self.logger.info(f"{self._repo} Start collecting - Pull request file")
         # Collect PullRequest file meta and patch data (EXTREMELY HIGH COSTS) -> REST API
-        for pull_request_file_action in self._rest_collector.get_repository_pull_request_file_actions():
+        collected_state = self.get_collected_state()
+        since = None if collected_state is None else collected_state["pull_requests_updated_at"]
+        for pull_request_file_action in self._rest_collector.get_repository_pull_request_file_actions(since):
+            self._check_stopped()
             pull_request_file_processor = PullRequestFileProcessorRoot(self, pull_request_file_action)
             pull_request_file_processor.process()
 
     def process_workflows(self):
         self.logger.info(f"{self._repo} Start collecting - Workflows")
         # Collect Workflow Data (Complete) -> REST API
-        for workflow in self._rest_collector.get_workflows():
+        collected_state = self.get_collected_state()
+        known_run_ids = None if collected_state is None else set(collected_state["workflow_run_ids"])
+        for workflow in self._rest_collector.get_workflows(known_run_ids):
+            self._check_stopped()
             workflow_processor = WorkflowProcessorRoot(self, workflow)
             workflow_processor.process()
 
@@ -236,11 +781,14 @@ class RepositoryCollector(threading.Thread):
     def process_stargazers_watchers(self):
         self.logger.info(f"{self._repo} Start collecting - Stargazers/Watchers")
         # Collect and process stargazers and watchers -> GraphQL
-        for query_result, partially_collected_nodes in self._graph_ql_collector.get(
-                [DATA_TREE.STARGAZER, DATA_TREE.WATCHER], []
+        for query_result, partially_collected_nodes in self._resumable_graph_ql_pages(
+                [DATA_TREE.STARGAZER, DATA_TREE.WATCHER], {}
         ):
-            self.process_stargazers(query_result)
-            self.process_watchers(query_result)
+            self._process_stargazer_watcher_page(query_result, partially_collected_nodes, {})
+
+    def _process_stargazer_watcher_page(self, query_result: dict, partially_collected_nodes: dict, progress: dict):
+        self.process_stargazers(query_result)
+        self.process_watchers(query_result)
 
     def process_project(self):
         self.logger.info(f"{self._repo} Start collecting - Project")
@@ -252,44 +800,71 @@ class RepositoryCollector(threading.Thread):
     def partially_process_issues(self):
         self.logger.info(f"{self._repo} Start collecting - Issues partial")
         # Collect Issue Data -> GraphQL
-        partially_collected_issues = []
-        for query_result, partially_collected_nodes in self._graph_ql_collector.get([DATA_TREE.ISSUE], []):
-            # Get issue data from graphql response
-            issue_data = query_result["repository"]["issues"]
-            # Processing issues (Write to CSV and in memory)
-            issue_processor = IssueProcessorRoot(self, issue_data)
-            issue_processor.process()
-            # Add partially collected node numbers to list
-            if "issues" in partially_collected_nodes.keys():
-                partially_collected_issues.extend(partially_collected_nodes["issues"])
-        return partially_collected_issues.copy()
+        progress = {"partially_collected": []}
+        for query_result, partially_collected_nodes in self._resumable_graph_ql_pages(
+                [DATA_TREE.ISSUE], progress, self._get_graph_ql_since(DATA_TREE.ISSUE)
+        ):
+            self._process_issue_page(query_result, partially_collected_nodes, progress)
+        return progress["partially_collected"].copy()
+
+    def _process_issue_page(self, query_result: dict, partially_collected_nodes: dict, progress: dict):
+        # Get issue data from graphql response
+        issue_data = query_result["repository"]["issues"]
+        # Processing issues (Write to CSV and in memory)
+        issue_processor = IssueProcessorRoot(self, issue_data)
+        issue_processor.process()
+        # Add partially collected node numbers to list
+        if "issues" in partially_collected_nodes.keys():
+            progress["partially_collected"].extend(partially_collected_nodes["issues"])
 
     def process_remaining_issues(self, partially_collected_issues: []):
         self.logger.info(f"{self._repo} Start collecting - Issues remaining")
+        if self._graph_ql_follow_up_queries:
+            # Collect Issue Data -> GraphQL
+            for numbers in self._resumable_batches(partially_collected_issues, IssueFollowUpRoot.BATCH_SIZE):
+                for query_result in self._graph_ql_collector.get_issues(numbers):
+                    issue_processor = IssueProcessorRoot(self, query_result)
+                    issue_processor.process()
+            return
         # Collect Issue Data -> REST API
-        for query_result in self._rest_collector.get_issues(partially_collected_issues):
+        for query_result in self._rest_collector.get_issues(self._resumable_items(partially_collected_issues)):
             issue_processor = IssueProcessorRoot(self, query_result)
             issue_processor.process()
 
     def partially_process_pull_requests(self):
         self.logger.info(f"{self._repo} Start collecting - Pull requests partial")
         # Collect Pull Request Data -> GraphQL
-        partially_collected_pull_requests = []
-        for query_result, partially_collected_nodes in self._graph_ql_collector.get([DATA_TREE.PULL_REQUEST], []):
-            # Get pull request data from graphql response
-            pull_request_data = query_result["repository"]["pullRequests"]
-            # Processing pull requests (Write to CSV and in memory)
-            pull_request_processor = PullRequestProcessorRoot(self, pull_request_data)
-            pull_request_processor.process()
-            # Add partially collected node numbers to list
-            if "pullRequests" in partially_collected_nodes.keys():
-                partially_collected_pull_requests.extend(partially_collected_nodes["pullRequests"])
-        return partially_collected_pull_requests.copy()
+        progress = {"partially_collected": []}
+        for query_result, partially_collected_nodes in self._resumable_graph_ql_pages(
+                [DATA_TREE.PULL_REQUEST], progress, self._get_graph_ql_since(DATA_TREE.PULL_REQUEST)
+        ):
+            self._process_pull_request_page(query_result, partially_collected_nodes, progress)
+        return progress["partially_collected"].copy()
+
+    def _process_pull_request_page(self, query_result: dict, partially_collected_nodes: dict, progress: dict):
+        # Get pull request data from graphql response
+        pull_request_data = query_result["repository"]["pullRequests"]
+        # Processing pull requests (Write to CSV and in memory)
+        pull_request_processor = PullRequestProcessorRoot(self, pull_request_data)
+        pull_request_processor.process()
+        # Add partially collected node numbers to list
+        if "pullRequests" in partially_collected_nodes.keys():
+            progress["partially_collected"].extend(partially_collected_nodes["pullRequests"])
 
     def process_remaining_pull_requests(self, partially_collected_pull_requests: []):
         self.logger.info(f"{self._repo} Start collecting - Pull requests remaining")
+        if self._graph_ql_follow_up_queries:
+            # Collect PullRequest Data -> GraphQL
+            for numbers in self._resumable_batches(partially_collected_pull_requests,
+                                                   PullRequestFollowUpRoot.BATCH_SIZE):
+                for query_result in self._graph_ql_collector.get_pull_requests(numbers):
+                    pull_request_processor = PullRequestProcessorRoot(self, query_result)
+                    pull_request_processor.process()
+            return
         # Collect PullRequest Data -> REST API
-        for query_result in self._rest_collector.get_pull_requests(partially_collected_pull_requests):
+        for query_result in self._rest_collector.get_pull_requests(
+                self._resumable_items(partially_collected_pull_requests)
+        ):
             pull_request_processor = PullRequestProcessorRoot(self, query_result)
             pull_request_processor.process()
 
@@ -314,6 +889,9 @@ class RepositoryCollector(threading.Thread):
     def set_project_id(self, project_id: str):
         self._project_id = project_id
 
+    def is_incremental_collection(self):
+        return self._incremental_collection
+
     def isCollectCommitContent(self):
         return self._commit_data
 
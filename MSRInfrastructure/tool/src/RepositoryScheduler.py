@@ -0,0 +1,171 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Dict
+
+from src.Utility.Logger import MSRLogger
+from src.Utility.Utility import dict_search
+from src.DataAcquisition.GitHubAPIService.TokenManager import TokenManager
+from src.DataAcquisition.GitHubAPIService.GitHubAPIType import GITHUB_API_TYPE
+from src.DataAcquisition.GitHubAPIService.GitHubClientFactory import GitHubClientFactory
+from src.DataAcquisition.GitHubCollector import GraphQLCollector
+
+
+class RepositoryEstimate:
+    """
+    Estimated API points and wall time of a repository collection, derived from the pre-flight sizing query
+    """
+
+    # Approximate GraphQL points per collected node (cost of a page / nodes per page of the GraphQLQueryTree)
+    GRAPH_QL_POINTS_PER_NODE = {
+        "issues": 2 / 30,
+        "pullRequests": 16 / 15,
+        "discussions": 10 / 30,
+        "stargazers": 1 / 50,
+        "watchers": 1 / 50,
+        "releases": 1 / 100
+    }
+    COMMITS_PER_REST_REQUEST = 100  # Commit metadata is listed in pages of 100 commits
+    PARTIALLY_COLLECTED_SHARE = 0.05  # Share of issues/pull requests that are collected again with the REST API
+    SECONDS_PER_GRAPH_QL_POINT = 0.5
+    SECONDS_PER_REST_POINT = 0.3
+    CLONE_KB_PER_SECOND = 5000
+
+    def __init__(self, repo_owner: str, repo_name: str, sizes: Optional[Dict[str, int]],
+                 pull_request_file_content: bool = False):
+        """
+        :param sizes: node type -> totalCount and diskUsage (KB) or None if the sizing query failed
+        :param pull_request_file_content: if pull request files are collected with the REST API
+        """
+        self.repo_owner: str = repo_owner
+        self.repo_name: str = repo_name
+        self.sizes: Optional[Dict[str, int]] = sizes
+        if sizes is None:
+            # Unknown repositories reserve a complete token budget and start last
+            self.graph_ql_points: int = RepositoryScheduler.TOKEN_BUDGET
+            self.rest_points: int = RepositoryScheduler.TOKEN_BUDGET
+            self.seconds: float = 0.0
+            return
+        self.graph_ql_points = 1 + round(sum([
+            sizes.get(node, 0) * points for node, points in RepositoryEstimate.GRAPH_QL_POINTS_PER_NODE.items()
+        ]))
+        rest_points = sizes.get("commits", 0) / RepositoryEstimate.COMMITS_PER_REST_REQUEST + \
+            (sizes.get("issues", 0) + sizes.get("pullRequests", 0)) * RepositoryEstimate.PARTIALLY_COLLECTED_SHARE
+        if pull_request_file_content:
+            rest_points += sizes.get("pullRequests", 0)
+        self.rest_points = 1 + round(rest_points)
+        self.seconds = self.graph_ql_points * RepositoryEstimate.SECONDS_PER_GRAPH_QL_POINT + \
+            self.rest_points * RepositoryEstimate.SECONDS_PER_REST_POINT + \
+            sizes.get("diskUsage", 0) / RepositoryEstimate.CLONE_KB_PER_SECOND
+
+    def get_hourly_points(self) -> Tuple[int, int]:
+        """
+        Returns the GraphQL and REST points that the collection uses within one rate limit window. A collector holds
+        one token per API at a time, so a single collection never uses more than one token budget per hour.
+        """
+        return min(self.graph_ql_points, RepositoryScheduler.TOKEN_BUDGET), \
+            min(self.rest_points, RepositoryScheduler.TOKEN_BUDGET)
+
+    def __str__(self):
+        return f"{self.repo_owner}/{self.repo_name} (GraphQL points: {self.graph_ql_points}, REST points: " \
+               f"{self.rest_points}, estimated seconds: {self.seconds:.0f})"
+
+
+class RepositoryScheduler:
+    """
+    RepositoryScheduler orders the repositories of the CollectionThreadPool by their estimated collection size instead
+    of the order of repository_list.txt. A cheap pre-flight GraphQL query sizes every repository (totalCounts and
+    disk usage). Repositories start largest first, as long as the hourly points of all running collections fit into
+    the pooled token budget of all threads. If the next large repository does not fit, the largest smaller repository
+    that fits starts instead (backfill), so one large repository cannot starve the tokens of all others.
+    """
+
+    TOKEN_BUDGET = 5000  # Points of a single token per rate limit window (GraphQL and REST)
+
+    def __init__(self, token_manager: TokenManager, repositories: List[Tuple[str, str]],
+                 pull_request_file_content: bool = False, sizing_threads: int = 4):
+        """
+        :param repositories: (repository owner, repository name) in the order of repository_list.txt
+        :param pull_request_file_content: if pull request files are collected with the REST API
+        :param sizing_threads: maximum number of concurrent sizing queries
+        """
+        self.logger = MSRLogger.get_logger(self.__class__.__name__)
+        self.token_manager: TokenManager = token_manager
+        self.repositories: List[Tuple[str, str]] = repositories
+        self.pull_request_file_content: bool = pull_request_file_content
+        self.sizing_threads: int = max(1, min(sizing_threads, token_manager.get_token_count(
+            GITHUB_API_TYPE.GRAPH_QL_API)))
+        self._pending: List[RepositoryEstimate] = []  # Not started repositories, largest first
+        self._running: Dict[Tuple[str, str], RepositoryEstimate] = {}  # Started and not finished repositories
+        self._lock = threading.Lock()
+
+    def estimate(self):
+        """
+        Runs the sizing query of all repositories and orders them largest first
+        """
+        self.logger.info(f"Estimating the size of {len(self.repositories)} repositories")
+        with ThreadPoolExecutor(max_workers=self.sizing_threads) as executor:
+            estimates = list(executor.map(lambda repository: self._estimate_repository(*repository),
+                                          self.repositories))
+        estimates.sort(key=lambda estimate: estimate.seconds, reverse=True)
+        with self._lock:
+            self._pending = estimates
+        for estimate in estimates:
+            self.logger.info(f"Estimated {estimate}")
+
+    def _estimate_repository(self, repo_owner: str, repo_name: str) -> RepositoryEstimate:
+        """
+        Executes the sizing query of a single repository
+        """
+        client_factory = GitHubClientFactory(repo_owner, repo_name, self.token_manager)
+        try:
+            query_result = GraphQLCollector(client_factory.get_graphql_api()).get_repository_size()
+            repository = query_result["repository"]
+            sizes = {
+                node: dict_search(repository, [node, "totalCount"], 0)
+                for node in ["issues", "pullRequests", "discussions", "stargazers", "watchers", "releases"]
+            }
+            sizes["commits"] = dict_search(repository, ["defaultBranchRef", "target", "history", "totalCount"], 0)
+            sizes["diskUsage"] = repository.get("diskUsage", None) or 0
+        except Exception as e:
+            self.logger.exception(f"{repo_owner}/{repo_name} Sizing query failed {e}")
+            sizes = None
+        finally:
+            client_factory.destroy_client()
+        return RepositoryEstimate(repo_owner, repo_name, sizes, self.pull_request_file_content)
+
+    def has_next(self) -> bool:
+        """
+        Returns True if at least one repository did not start yet
+        """
+        with self._lock:
+            return len(self._pending) > 0
+
+    def next_repository(self) -> Optional[Tuple[str, str]]:
+        """
+        Returns the next repository to collect and marks it as running
+        :return: (repository owner, repository name) or None if no pending repository fits into the token budget
+        """
+        with self._lock:
+            graph_ql_budget = self.token_manager.get_token_count(GITHUB_API_TYPE.GRAPH_QL_API) * \
+                RepositoryScheduler.TOKEN_BUDGET
+            rest_budget = self.token_manager.get_token_count(GITHUB_API_TYPE.REST_API) * \
+                RepositoryScheduler.TOKEN_BUDGET
+            for estimate in self._running.values():
+                graph_ql_points, rest_points = estimate.get_hourly_points()
+                graph_ql_budget -= graph_ql_points
+                rest_budget -= rest_points
+            # Largest repository first, smaller repositories fill the remaining budget
+            for estimate in self._pending:
+                graph_ql_points, rest_points = estimate.get_hourly_points()
+                if graph_ql_points <= graph_ql_budget and rest_points <= rest_budget:
+                    self._pending.remove(estimate)
+                    self._running[(estimate.repo_owner, estimate.repo_name)] = estimate
+                    return estimate.repo_owner, estimate.repo_name
+            return None
+
+    def finish(self, repo_owner: str, repo_name: str):
+        """
+        Releases the budget of a finished repository
+        """
+        with self._lock:
+            self._running.pop((repo_owner, repo_name), None)